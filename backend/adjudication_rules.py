@@ -0,0 +1,270 @@
+"""
+Auto-Adjudication Rules Engine
+==============================
+
+Deterministic decision tables evaluated before the AI reviewer. Obvious
+cases (routine low-cost in-network procedures on active coverage, clearly
+ineligible requests) are decided in microseconds with a recorded rule id;
+everything else falls through to the model.
+
+Rules live in MongoDB and are hot-reloaded: the engine polls a cheap
+version signature of the collection and recompiles when it changes.
+
+Rule document:
+{
+    "rule_id": "R-ROUTINE-LOWCOST",
+    "payer_id": "PAY001",              # optional, omit for a global rule
+    "priority": 100,                   # lower runs first
+    "enabled": true,
+    "when": {
+        "procedure": ["X-Ray", "Blood Test"],
+        "urgency": ["routine"],
+        "subscription_state": ["active"],   # active | expired | exhausted | none
+        "coverage_types": ["Medical"],      # payer must cover at least one
+        "provider_network": ["In Network"],
+        "amount_min": 0,
+        "amount_max": 1000
+    },
+    "decision": "approved",            # approved | rejected | pending
+    "reason": "Routine low-cost in-network procedure"
+}
+"""
+
+import threading
+import time
+from datetime import datetime as dtt, timezone
+
+from db_indexes import apply_indexes, index
+
+
+VALID_DECISIONS = {'approved', 'rejected', 'pending'}
+SUBSCRIPTION_STATES = {'active', 'expired', 'exhausted', 'none'}
+LIST_CONDITIONS = {'procedure', 'urgency', 'subscription_state', 'coverage_types', 'provider_network'}
+RANGE_CONDITIONS = {'amount_min', 'amount_max'}
+
+DEFAULT_RULES = [
+    {
+        'rule_id': 'R-INELIGIBLE-EXHAUSTED',
+        'priority': 10,
+        'enabled': True,
+        'when': {'subscription_state': ['exhausted']},
+        'decision': 'rejected',
+        'reason': 'Insurance coverage exhausted (no remaining balance)'
+    },
+    {
+        'rule_id': 'R-INELIGIBLE-EXPIRED',
+        'priority': 20,
+        'enabled': True,
+        'when': {'subscription_state': ['expired']},
+        'decision': 'rejected',
+        'reason': 'Insurance subscription has expired'
+    },
+    {
+        'rule_id': 'R-ROUTINE-LOWCOST-INNETWORK',
+        'priority': 100,
+        'enabled': True,
+        'when': {
+            'procedure': ['Blood Test', 'X-Ray', 'Consultation'],
+            'urgency': ['routine'],
+            'subscription_state': ['active'],
+            'provider_network': ['In Network'],
+            'amount_max': 1000
+        },
+        'decision': 'approved',
+        'reason': 'Routine low-cost procedure with an in-network provider on active coverage'
+    }
+]
+
+
+def _norm(value):
+    return ' '.join(str(value or '').lower().split())
+
+
+def subscription_state(subscription, today=None):
+    """Classify a subscription as active, expired, exhausted or none."""
+    if not subscription:
+        return 'none'
+    today = today or dtt.now(timezone.utc).strftime('%Y-%m-%d')
+    validity = subscription.get('validity_date')
+    if subscription.get('status') != 'active' or (validity and str(validity)[:10] < today):
+        return 'expired'
+    if (subscription.get('remaining_balance') or 0) <= 0:
+        return 'exhausted'
+    return 'active'
+
+
+def compile_rule(rule):
+    """
+    Validate a rule document and compile it into a predicate.
+
+    Returns:
+        (priority, rule_id, payer_id, procedures or None, predicate, decision, reason)
+
+    Raises:
+        ValueError if the rule is malformed
+    """
+    rule_id = rule.get('rule_id')
+    if not rule_id:
+        raise ValueError('rule_id is required')
+    decision = rule.get('decision')
+    if decision not in VALID_DECISIONS:
+        raise ValueError(f"{rule_id}: decision must be one of {sorted(VALID_DECISIONS)}")
+
+    when = rule.get('when') or {}
+    unknown = set(when) - LIST_CONDITIONS - RANGE_CONDITIONS
+    if unknown:
+        raise ValueError(f"{rule_id}: unknown conditions {sorted(unknown)}")
+
+    checks = []
+    procedures = None
+    for field in LIST_CONDITIONS & set(when):
+        values = when[field]
+        if not isinstance(values, list) or not values:
+            raise ValueError(f"{rule_id}: '{field}' must be a non-empty list")
+        allowed = frozenset(_norm(v) for v in values)
+        if field == 'subscription_state' and not allowed <= SUBSCRIPTION_STATES:
+            raise ValueError(f"{rule_id}: subscription_state must be within {sorted(SUBSCRIPTION_STATES)}")
+
+        if field == 'procedure':
+            # Handled by the procedure index rather than a per-request check
+            procedures = allowed
+        elif field == 'coverage_types':
+            checks.append(lambda ctx, allowed=allowed: not allowed.isdisjoint(ctx['coverage_types']))
+        else:
+            checks.append(lambda ctx, field=field, allowed=allowed: ctx[field] in allowed)
+
+    for field, compare in (('amount_min', lambda a, b: a >= b), ('amount_max', lambda a, b: a <= b)):
+        if field in when:
+            try:
+                bound = float(when[field])
+            except (TypeError, ValueError):
+                raise ValueError(f"{rule_id}: '{field}' must be a number")
+            checks.append(
+                lambda ctx, bound=bound, compare=compare: ctx['amount'] is not None and compare(ctx['amount'], bound)
+            )
+
+    checks = tuple(checks)
+
+    def predicate(ctx):
+        for check in checks:
+            if not check(ctx):
+                return False
+        return True
+
+    return (
+        int(rule.get('priority', 100)),
+        rule_id,
+        rule.get('payer_id'),
+        procedures,
+        predicate,
+        decision,
+        rule.get('reason') or f"Matched rule {rule_id}"
+    )
+
+
+def build_context(auth_request, subscription=None, payer=None, provider=None):
+    """Normalize the request facts the decision tables look at."""
+    amount = auth_request.get('auth_amount')
+    try:
+        amount = float(amount) if amount not in (None, '') else None
+    except (TypeError, ValueError):
+        amount = None
+
+    return {
+        'procedure': _norm(auth_request.get('procedure')),
+        'urgency': _norm(auth_request.get('urgency') or 'routine'),
+        'subscription_state': subscription_state(subscription),
+        'coverage_types': frozenset(_norm(c) for c in (payer or {}).get('coverage_types', [])),
+        'provider_network': _norm((provider or {}).get('network_type')),
+        'payer_id': (payer or {}).get('payer_id') or auth_request.get('payer_id'),
+        'amount': amount
+    }
+
+
+class RulesEngine:
+    """
+    Compiled, hot-reloading decision tables.
+
+    Args:
+        collection: pymongo collection holding rule documents
+        reload_interval: seconds between checks for rule changes
+    """
+
+    def __init__(self, collection, reload_interval=5.0):
+        self.collection = collection
+        self.reload_interval = reload_interval
+        self._lock = threading.Lock()
+        self._by_procedure = {}
+        self._wildcard = ()
+        self._signature = None
+        self._checked_at = 0.0
+        self.rule_count = 0
+        self.errors = []
+
+    def index_specs(self):
+        return [index('rule_id', unique=True), index('updated_at')]
+
+    def ensure_indexes(self):
+        return apply_indexes(self.collection, self.index_specs())
+
+    def seed_defaults(self):
+        """Insert the default global rules if no rules exist yet."""
+        if self.collection.estimated_document_count() == 0:
+            now = dtt.now(timezone.utc)
+            self.collection.insert_many([dict(rule, payer_id=None, updated_at=now) for rule in DEFAULT_RULES])
+
+    def _current_signature(self):
+        latest = self.collection.find_one({}, {'updated_at': 1}, sort=[('updated_at', -1)])
+        return (self.collection.count_documents({}), latest.get('updated_at') if latest else None)
+
+    def maybe_reload(self, force=False):
+        """Recompile the rules if the collection changed since the last check."""
+        now = time.monotonic()
+        if not force and now - self._checked_at < self.reload_interval:
+            return False
+        self._checked_at = now
+
+        signature = self._current_signature()
+        if not force and signature == self._signature:
+            return False
+
+        compiled, errors = [], []
+        for rule in self.collection.find({'enabled': {'$ne': False}}, {'_id': 0}):
+            try:
+                compiled.append(compile_rule(rule))
+            except ValueError as e:
+                errors.append(str(e))
+        compiled.sort(key=lambda r: (r[0], r[1]))
+
+        wildcard = tuple(r for r in compiled if r[3] is None)
+        by_procedure = {}
+        for procedure in {p for r in compiled if r[3] for p in r[3]}:
+            by_procedure[procedure] = tuple(r for r in compiled if r[3] is None or procedure in r[3])
+
+        with self._lock:
+            self._by_procedure = by_procedure
+            self._wildcard = wildcard
+            self._signature = signature
+            self.rule_count = len(compiled)
+            self.errors = errors
+
+        if errors:
+            print(f"Adjudication rules skipped: {errors}")
+        return True
+
+    def evaluate(self, ctx):
+        """
+        Return the first matching rule for a request context.
+
+        Returns:
+            {'rule_id', 'decision', 'reason'} or None
+        """
+        with self._lock:
+            candidates = self._by_procedure.get(ctx['procedure'], self._wildcard)
+
+        for _, rule_id, payer_id, _, predicate, decision, reason in candidates:
+            if payer_id and payer_id != ctx['payer_id']:
+                continue
+            if predicate(ctx):
+                return {'rule_id': rule_id, 'decision': decision, 'reason': reason}
+        return None
@@ -16,7 +16,7 @@ Author: Healthcare Prior Auth Team
 Version: 1.0.0
 """
 
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, stream_with_context, g, has_request_context
 from flask_cors import CORS
 from flask_bcrypt import Bcrypt
 from flask_pymongo import PyMongo
@@ -30,9 +30,32 @@ import random
 from faker import Faker
 import bcrypt
 from bson.objectid import ObjectId
+from pymongo.errors import DuplicateKeyError
 import json
 import re
-from openai import AzureOpenAI
+import time
+import threading
+from collections import defaultdict, deque
+from concurrent.futures import as_completed
+from openai import AsyncAzureOpenAI, AsyncOpenAI
+from review_queue import ReviewQueue, SPECULATIVE_PRIORITY
+from auth_repository import PriorAuthRepository, attach_names, merge_collections, CANONICAL_COLLECTION, LEGACY_COLLECTION
+from db_indexes import CORE_INDEXES, apply_manifest, summarize
+from decision_cache import DecisionCache, decision_fingerprint, normalize_text
+from member_features import MemberFeatures, history_digest, profile_bucket
+from precedent_index import PrecedentIndex, render_precedents
+from pagination import PageError, batches, fetch_page, parse_listing_args, stream_listing
+from prompt_budget import count_tokens, count_message_tokens, truncate_to_tokens, compact_digest, fit_sections
+from adjudication_rules import RulesEngine, compile_rule, build_context
+from directory_index import DirectoryIndex, PROVIDER_FIELDS, PAYER_FIELDS
+from autocomplete_engine import AutocompleteEngine
+from llm_metrics import LLMMetrics, percentiles
+from llm_backends import LLMBackend, LLMRouter, CircuitBreaker
+from llm_async import AsyncRuntime, make_http_client
+from token_quota import TokenQuota
+from format_cache import FormatCache
+from health_buddy_sessions import HealthBuddySessions
+from stream_json import IncrementalJSONParser
 
 
 # Load environment variables
@@ -42,18 +65,198 @@ load_dotenv()
 # Azure OpenAI Configuration working perfectly with firewall error
 
 AZURE_OPENAI_API_KEY = os.getenv("AZURE_OPENAI_API_KEY")
-AZURE_OPENAI_ENDPOINT = "https://wns-openai-genai-poc-eus-04.openai.azure.com/"
+AZURE_OPENAI_ENDPOINT = os.getenv("AZURE_OPENAI_ENDPOINT", "https://wns-openai-genai-poc-eus-04.openai.azure.com/")
 AZURE_OPENAI_DEPLOYMENT = "gpt-4o"
 
+# Gemini through its OpenAI-compatible endpoint
+GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+GEMINI_API_ENDPOINT = os.getenv("GEMINI_API_ENDPOINT", "https://generativelanguage.googleapis.com/v1beta/openai/")
+GEMINI_MODEL_NAME = os.getenv("GEMINI_MODEL_NAME", "gemini-2.0-flash")
+
+# Any OpenAI-compatible server, e.g. the local stand-in (python llm_standin.py)
+LLM_OPENAI_BASE_URL = os.getenv("LLM_OPENAI_BASE_URL", "http://127.0.0.1:8001/v1")
+LLM_OPENAI_API_KEY = os.getenv("LLM_OPENAI_API_KEY", "standin")
+LLM_OPENAI_MODEL = os.getenv("LLM_OPENAI_MODEL", "gpt-4o")
+
+# LLM backends in preference order (azure, gemini, openai); later ones are failover/hedge targets
+LLM_BACKENDS = [name.strip() for name in os.getenv("LLM_BACKENDS", "azure").split(",") if name.strip()]
+
+# Batch auto-review fan-out limits
+AI_BATCH_CONCURRENCY = int(os.getenv("AI_BATCH_CONCURRENCY", "32"))
+AI_BATCH_MAX_ITEMS = int(os.getenv("AI_BATCH_MAX_ITEMS", "500"))
+
+# Prompt template versions - bump when a review prompt changes so cached
+# decisions from the old template are no longer served
+REVIEW_PROMPT_VERSION = "auto_review_auth:v3"
+AGENT_PROMPT_VERSION = "auto_review_auth_with_agent:v3"
+
+# Similar decided cases (BM25 precedents) shown to the reviewer; 0 disables
+PRECEDENT_TOP_K = int(os.getenv("PRECEDENT_TOP_K", "3"))
+
+# Listing pages (keyset pagination): default and largest page size
+LISTING_PAGE_SIZE = int(os.getenv("LISTING_PAGE_SIZE", "100"))
+LISTING_MAX_PAGE_SIZE = int(os.getenv("LISTING_MAX_PAGE_SIZE", "500"))
+
+# Documents per MongoDB batch (and per name lookup) when a listing is streamed as NDJSON
+LISTING_STREAM_BATCH_SIZE = int(os.getenv("LISTING_STREAM_BATCH_SIZE", "500"))
+NDJSON_MIMETYPE = 'application/x-ndjson'
+
+# Bulky review internals left out of listings unless asked for with ?fields=
+LISTING_EXCLUDED_FIELDS = {'ai_agent_prompt': 0, 'ai_agent_plan': 0}
+PRIOR_AUTH_FILTERS = ('status', 'urgency', 'payer_id', 'provider_id', 'member_id')
+
+# Review replies: JSON mode, incremental parsing of the streamed reply and
+# (optionally) closing the stream once the required keys have arrived
+REVIEW_STATUSES = ('approved', 'pending', 'rejected')
+REVIEW_STRUCTURED_OUTPUT = os.getenv("REVIEW_STRUCTURED_OUTPUT", "True").lower() == "true"
+REVIEW_STREAMING = os.getenv("REVIEW_STREAMING", "True").lower() == "true"
+REVIEW_EARLY_STOP = os.getenv("REVIEW_EARLY_STOP", "False").lower() == "true"
+REVIEW_REQUIRED_KEYS = [key.strip() for key in os.getenv("REVIEW_REQUIRED_KEYS", "status,reason").split(",") if key.strip()]
+
+# Speculative reviews of member pending requests, promoted on provider approval
+# unless the provider's notes or amount materially change what was reviewed
+SPECULATIVE_REVIEW_ENABLED = os.getenv("SPECULATIVE_REVIEW_ENABLED", "True").lower() == "true"
+SPECULATIVE_NOTES_MIN_CHARS = int(os.getenv("SPECULATIVE_NOTES_MIN_CHARS", "15"))
+SPECULATIVE_AMOUNT_TOLERANCE = float(os.getenv("SPECULATIVE_AMOUNT_TOLERANCE", "0.1"))
+SPECULATIVE_AMOUNT_MIN_DELTA = float(os.getenv("SPECULATIVE_AMOUNT_MIN_DELTA", "50"))
+
+# Per-prompt token budgets for the AI helpers
+AI_PROMPT_BUDGET_REVIEW = int(os.getenv("AI_PROMPT_BUDGET_REVIEW", "2000"))
+AI_PROMPT_BUDGET_FORMAT = int(os.getenv("AI_PROMPT_BUDGET_FORMAT", "1500"))
+AI_PROMPT_BUDGET_AUTOCOMPLETE = int(os.getenv("AI_PROMPT_BUDGET_AUTOCOMPLETE", "300"))
+AI_PROMPT_BUDGET_HEALTH_BUDDY = int(os.getenv("AI_PROMPT_BUDGET_HEALTH_BUDDY", "6000"))
+AI_HISTORY_RECENT_N = int(os.getenv("AI_HISTORY_RECENT_N", "5"))
+
+# Recent health buddy time-to-first-token samples (seconds)
+health_buddy_ttft = deque(maxlen=1000)
+
+# Candidates passed to the health buddy prompt
+HEALTH_BUDDY_TOP_PROVIDERS = int(os.getenv("HEALTH_BUDDY_TOP_PROVIDERS", "5"))
+HEALTH_BUDDY_TOP_PAYERS = int(os.getenv("HEALTH_BUDDY_TOP_PAYERS", "3"))
+
+# Health buddy conversation sessions
+HEALTH_BUDDY_SYSTEM_PROMPT = "You are a helpful AI health assistant."
+HEALTH_BUDDY_FALLBACK_MESSAGE = "I'm sorry, I'm having trouble processing your request right now. Please try again later."
+HEALTH_BUDDY_SUMMARY_MAX_TOKENS = int(os.getenv("HEALTH_BUDDY_SUMMARY_MAX_TOKENS", "300"))
+
+# Local autocomplete answers below this confidence fall back to the model
+AUTOCOMPLETE_MIN_CONFIDENCE = float(os.getenv("AUTOCOMPLETE_MIN_CONFIDENCE", "0.35"))
+
+# LLM call timeouts/retries (retries are done by the router so they are counted)
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "30"))
+LLM_DEADLINE_SECONDS = float(os.getenv("LLM_DEADLINE_SECONDS", "60"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+LLM_RETRY_BASE_BACKOFF = float(os.getenv("LLM_RETRY_BASE_BACKOFF", "0.5"))
+LLM_RETRY_MAX_BACKOFF = float(os.getenv("LLM_RETRY_MAX_BACKOFF", "8"))
+LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "5"))
+LLM_BREAKER_RESET_SECONDS = float(os.getenv("LLM_BREAKER_RESET_SECONDS", "30"))
+
+# AI token quotas (estimated tokens per minute, per bucket; 0 disables a bucket)
+QUOTA_ENABLED = os.getenv("QUOTA_ENABLED", "True").lower() == "true"
+QUOTA_EMAIL_TOKENS_PER_MIN = int(os.getenv("QUOTA_EMAIL_TOKENS_PER_MIN", "20000"))
+QUOTA_USER_TYPE_TOKENS_PER_MIN = {
+    'member': int(os.getenv("QUOTA_MEMBER_TOKENS_PER_MIN", "200000")),
+    'provider': int(os.getenv("QUOTA_PROVIDER_TOKENS_PER_MIN", "150000")),
+    'payer': int(os.getenv("QUOTA_PAYER_USERS_TOKENS_PER_MIN", "200000")),
+    'admin': int(os.getenv("QUOTA_ADMIN_TOKENS_PER_MIN", "0"))
+}
+QUOTA_PAYER_TOKENS_PER_MIN = int(os.getenv("QUOTA_PAYER_TOKENS_PER_MIN", "100000"))
+
+# Pooled keep-alive HTTP transport shared by all LLM backends
+LLM_HTTP_MAX_CONNECTIONS = int(os.getenv("LLM_HTTP_MAX_CONNECTIONS", "100"))
+LLM_HTTP_MAX_KEEPALIVE = int(os.getenv("LLM_HTTP_MAX_KEEPALIVE", "20"))
+LLM_HTTP_KEEPALIVE_EXPIRY = float(os.getenv("LLM_HTTP_KEEPALIVE_EXPIRY", "30"))
+
+# Hedged review requests to the second backend after the primary's latency percentile
+LLM_HEDGE_ENABLED = os.getenv("LLM_HEDGE_ENABLED", "False").lower() == "true"
+LLM_HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "0.95"))
+LLM_HEDGE_DEFAULT_DELAY = float(os.getenv("LLM_HEDGE_DEFAULT_DELAY", "5"))
+
+
+# Per-helper latency, token, retry and parse metrics for every LLM call
+llm_metrics = LLMMetrics(
+    window=int(os.getenv("LLM_METRICS_WINDOW", "1000")),
+    prompt_cost_per_1k=float(os.getenv("LLM_PROMPT_COST_PER_1K", "0.0025")),
+    completion_cost_per_1k=float(os.getenv("LLM_COMPLETION_COST_PER_1K", "0.01")),
+    log_interval=float(os.getenv("LLM_METRICS_LOG_INTERVAL", "300"))
+)
+
 
-# Initialize Azure OpenAI client
-client = AzureOpenAI(
-    api_key=AZURE_OPENAI_API_KEY,
-    api_version="2024-02-01",
-    azure_endpoint=AZURE_OPENAI_ENDPOINT
+# Background event loop that runs every LLM request (sync helpers bridge onto it)
+llm_runtime = AsyncRuntime()
+llm_http_client = make_http_client(
+    max_connections=LLM_HTTP_MAX_CONNECTIONS,
+    max_keepalive_connections=LLM_HTTP_MAX_KEEPALIVE,
+    keepalive_expiry=LLM_HTTP_KEEPALIVE_EXPIRY,
+    timeout=LLM_TIMEOUT_SECONDS
 )
 
 
+def make_llm_backend(name):
+    """
+    Build a configured LLM backend by name.
+
+    All backends share llm_http_client. Client-level retries are disabled;
+    the router retries and fails over.
+    """
+    if name == 'azure':
+        backend_client = AsyncAzureOpenAI(
+            api_key=AZURE_OPENAI_API_KEY,
+            api_version="2024-02-01",
+            azure_endpoint=AZURE_OPENAI_ENDPOINT,
+            timeout=LLM_TIMEOUT_SECONDS,
+            max_retries=0,
+            http_client=llm_http_client
+        )
+        model = AZURE_OPENAI_DEPLOYMENT
+    elif name == 'gemini':
+        backend_client = AsyncOpenAI(
+            api_key=GEMINI_API_KEY,
+            base_url=GEMINI_API_ENDPOINT,
+            timeout=LLM_TIMEOUT_SECONDS,
+            max_retries=0,
+            http_client=llm_http_client
+        )
+        model = GEMINI_MODEL_NAME
+    elif name == 'openai':
+        backend_client = AsyncOpenAI(
+            api_key=LLM_OPENAI_API_KEY,
+            base_url=LLM_OPENAI_BASE_URL,
+            timeout=LLM_TIMEOUT_SECONDS,
+            max_retries=0,
+            http_client=llm_http_client
+        )
+        model = LLM_OPENAI_MODEL
+    else:
+        raise ValueError(f"Unknown LLM backend: {name}")
+
+    return LLMBackend(
+        name,
+        backend_client,
+        model,
+        timeout=LLM_TIMEOUT_SECONDS,
+        breaker=CircuitBreaker(LLM_BREAKER_FAILURES, LLM_BREAKER_RESET_SECONDS)
+    )
+
+
+# Every AI helper goes through the router (circuit breakers, retries, hedging)
+llm_router = LLMRouter(
+    [make_llm_backend(name) for name in LLM_BACKENDS],
+    llm_metrics,
+    llm_runtime,
+    retries=LLM_MAX_RETRIES,
+    base_backoff=LLM_RETRY_BASE_BACKOFF,
+    max_backoff=LLM_RETRY_MAX_BACKOFF,
+    default_timeout=LLM_DEADLINE_SECONDS,
+    hedge_enabled=LLM_HEDGE_ENABLED,
+    hedge_percentile=LLM_HEDGE_PERCENTILE,
+    hedge_default_delay=LLM_HEDGE_DEFAULT_DELAY
+)
+
+# Primary backend's (async) client
+client = llm_router.primary.client
+
+
 # Initialize Flask app and extensions
 app = Flask(__name__)
 CORS(app)
@@ -70,11 +273,181 @@ mongo = PyMongo(app)
 db = mongo.db
 members = db.members
 providers = db.providers
-prior_auth = db.prior_auth  # Replacing claims with prior_auth
+auth_repo = PriorAuthRepository(db[CANONICAL_COLLECTION])  # All prior authorization reads/writes
 payers = db.payers
 insurance_subscriptions = db.insurance_subscriptions  # New collection for insurance subscriptions
 pending_requests = db.pending_requests  # New collection for pending member requests
 
+# Per-member history features, kept current by every prior authorization write
+member_features = MemberFeatures(
+    db.member_features,
+    db.members,
+    auth_repo.collection,
+    db.insurance_subscriptions,
+    recent_n=AI_HISTORY_RECENT_N
+)
+auth_repo.add_listener(member_features)
+
+# BM25 index over decided requests for few-shot review precedents
+precedent_index = PrecedentIndex(
+    auth_repo.collection,
+    refresh_interval=float(os.getenv("PRECEDENT_REFRESH_SECONDS", "60"))
+)
+auth_repo.add_listener(precedent_index)
+
+
+def mark_review_failed(job):
+    """Flag the authorization request (or pending request draft) when its review job is dead-lettered."""
+    if job.get('kind') == 'speculative':
+        db.pending_requests.update_one(
+            {'request_id': job['payload'].get('request_id')},
+            {'$set': {'ai_draft.ai_review_status': 'failed'}}
+        )
+        return
+    auth_repo.update(job['auth_id'], {'ai_review_status': 'failed'})
+
+
+# Background AI review job queue (consumed by review_worker.py)
+review_queue = ReviewQueue(
+    db.review_jobs,
+    lease_seconds=int(os.getenv("REVIEW_JOB_LEASE_SECONDS", "120")),
+    max_attempts=int(os.getenv("REVIEW_JOB_MAX_ATTEMPTS", "5")),
+    base_backoff=float(os.getenv("REVIEW_JOB_BASE_BACKOFF", "5")),
+    max_backoff=float(os.getenv("REVIEW_JOB_MAX_BACKOFF", "600")),
+    on_dead_letter=mark_review_failed
+)
+
+# Shared cache of AI review decisions keyed on normalized request features
+decision_cache = DecisionCache(
+    db.ai_decision_cache,
+    max_entries=int(os.getenv("DECISION_CACHE_MAX_ENTRIES", "2048")),
+    ttl_seconds=int(os.getenv("DECISION_CACHE_TTL_SECONDS", str(7 * 24 * 3600))),
+    enabled=os.getenv("DECISION_CACHE_ENABLED", "True").lower() == "true"
+)
+
+# Payer decision tables evaluated before the AI reviewer (hot-reloaded from Mongo)
+rules_engine = RulesEngine(
+    db.adjudication_rules,
+    reload_interval=float(os.getenv("ADJUDICATION_RULES_RELOAD_SECONDS", "5"))
+)
+
+
+# Exact + near-duplicate cache of formatted descriptions
+format_cache = FormatCache(
+    db.ai_format_cache,
+    max_entries=int(os.getenv("FORMAT_CACHE_MAX_ENTRIES", "4096")),
+    threshold=float(os.getenv("FORMAT_CACHE_SIMILARITY", "0.9")),
+    ttl_seconds=int(os.getenv("FORMAT_CACHE_TTL_SECONDS", str(30 * 24 * 3600))),
+    enabled=os.getenv("FORMAT_CACHE_ENABLED", "True").lower() == "true"
+)
+
+# Server-side health buddy conversations (context block + rolling summary)
+health_buddy_sessions = HealthBuddySessions(
+    db.health_buddy_sessions,
+    ttl_seconds=int(os.getenv("HEALTH_BUDDY_SESSION_TTL_SECONDS", str(24 * 3600))),
+    keep_turns=int(os.getenv("HEALTH_BUDDY_KEEP_TURNS", "6")),
+    context_max_age=float(os.getenv("HEALTH_BUDDY_CONTEXT_MAX_AGE_SECONDS", "1800"))
+)
+
+# Shared token buckets enforced in front of the AI routes
+token_quota = TokenQuota(db.ai_token_buckets, enabled=QUOTA_ENABLED)
+
+# email -> (payer_id, looked_up_at); the payer a user's AI usage is billed to
+_quota_payer_cache = {}
+QUOTA_PAYER_CACHE_SECONDS = 300
+
+
+def index_manifest():
+    """Every collection's indexes: the core route lookups plus each component's own."""
+    manifest = {name: list(specs) for name, specs in CORE_INDEXES.items()}
+    for component in (auth_repo, review_queue, decision_cache, rules_engine, token_quota, format_cache,
+                      health_buddy_sessions, member_features):
+        manifest.setdefault(component.collection.name, []).extend(component.index_specs())
+    return manifest
+
+
+def ensure_indexes():
+    """Apply the index manifest (idempotent; only missing or changed indexes are touched)."""
+    actions = apply_manifest(db, index_manifest())
+    for action in actions:
+        if action['action'] == 'failed':
+            print(f"Index {action['collection']}.{action['index']} could not be built: {action['error']}")
+    print(f"Indexes: {summarize(actions)}")
+
+
+def ensure_ai_storage():
+    """Apply the index manifest, seed the default rules and drop cache entries from retired prompts."""
+    ensure_indexes()
+    decision_cache.invalidate_other_versions([REVIEW_PROMPT_VERSION, AGENT_PROMPT_VERSION])
+    rules_engine.seed_defaults()
+
+
+def ensure_auth_store():
+    """
+    Fold any legacy prior_auth collection into the canonical one and re-key
+    colliding auth_ids so the manifest's unique index can be built.
+    """
+    legacy = db[LEGACY_COLLECTION] if LEGACY_COLLECTION in db.list_collection_names() else None
+    stats = merge_collections(legacy, auth_repo.collection, drop_source=True)
+    if legacy is not None or stats['target_rekeyed']:
+        print(f"Merged legacy {LEGACY_COLLECTION} into {CANONICAL_COLLECTION}: {stats}")
+    if stats['failed']:
+        print(f"Left {LEGACY_COLLECTION} in place; could not insert: {stats['failed']}")
+    if legacy is not None:
+        # Merged requests bypassed the repository listeners; features rebuild lazily
+        member_features.collection.delete_many({})
+
+
+def new_unique_id(collection, field, prefix, low, high, width=0, attempts=20):
+    """Random PREFIX#### id in the existing style that the collection's unique index will accept."""
+    for _ in range(attempts):
+        value = f"{prefix}{random.randint(low, high):0{width}}"
+        if not collection.count_documents({field: value}, limit=1):
+            return value
+    raise RuntimeError(f"Could not allocate a free {prefix} {field}")
+
+
+def wants_ndjson():
+    """True when the client asked for a streamed listing (Accept: application/x-ndjson)."""
+    return request.accept_mimetypes.best_match(['application/json', NDJSON_MIMETYPE]) == NDJSON_MIMETYPE
+
+
+def _ndjson_default(value):
+    if isinstance(value, dtt):
+        return value.isoformat()
+    return str(value)  # ObjectId and other BSON types
+
+
+def ndjson_response(records, label):
+    """
+    Stream records as one JSON object per line, serializing each as it is
+    read so memory stays flat and the first line goes out immediately.
+
+    The status is already sent when the stream starts, so a failure part
+    way through ends the stream with an {"error": true, ...} line.
+    """
+    def generate():
+        try:
+            for record in records:
+                yield json.dumps(record, default=_ndjson_default) + '\n'
+        except Exception as e:
+            print(f"Error streaming {label}: {e}")
+            yield json.dumps({'error': True, 'message': f'Error streaming {label}'}) + '\n'
+
+    return Response(stream_with_context(generate()), mimetype=NDJSON_MIMETYPE)
+
+
+# In-memory provider/payer directory for top-k health buddy candidates
+directory_index = DirectoryIndex(db, refresh_interval=float(os.getenv("DIRECTORY_INDEX_REFRESH_SECONDS", "30")))
+
+# Trie + n-gram autocomplete over historical request text
+autocomplete_engine = AutocompleteEngine(
+    db,
+    collections=(CANONICAL_COLLECTION,),
+    refresh_interval=float(os.getenv("AUTOCOMPLETE_REFRESH_SECONDS", "60")),
+    min_support=int(os.getenv("AUTOCOMPLETE_MIN_SUPPORT", "5"))
+)
+
 
 # =====================================================
 # JWT Authentication Middleware
@@ -118,19 +491,336 @@ def token_required(f):
     return decorated
 
 
+def quota_payer_id(current_user):
+    """Payer a user's AI usage counts against (active subscription for members)."""
+    email = current_user['email']
+    cached = _quota_payer_cache.get(email)
+    if cached and time.monotonic() - cached[1] < QUOTA_PAYER_CACHE_SECONDS:
+        return cached[0]
+
+    payer_id = None
+    if current_user.get('user_type') == 'payer':
+        payer = db.payers.find_one({'email': email}, {'payer_id': 1})
+        payer_id = payer.get('payer_id') if payer else None
+    elif current_user.get('user_type') == 'member':
+        member = db.members.find_one({'email': email}, {'member_id': 1})
+        subscription = member and db.insurance_subscriptions.find_one(
+            {'member_id': member['member_id'], 'status': 'active'}, {'payer_id': 1}
+        )
+        payer_id = subscription.get('payer_id') if subscription else None
+
+    _quota_payer_cache[email] = (payer_id, time.monotonic())
+    return payer_id
+
+
+def ai_quota(estimate_tokens, refund_unused=False):
+    """
+    Decorator enforcing AI token quotas; goes below @token_required.
+
+    Args:
+        estimate_tokens: function(request_data) -> estimated tokens for the call
+        refund_unused: give the estimate back when the view finishes without
+            calling the model (complete_chat), e.g. local / cache / rule answers
+            or a rejected request. Only for views that call the model before
+            returning (not streamed responses).
+
+    Over-quota calls get a 429 with Retry-After before any AI work is done.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated(current_user, *args, **kwargs):
+            data = request.get_json(silent=True) if request.method != 'GET' else request.args
+            tokens = estimate_tokens(data or {})
+
+            buckets = [
+                (f"email:{current_user['email']}", QUOTA_EMAIL_TOKENS_PER_MIN),
+                (f"user_type:{current_user.get('user_type')}",
+                 QUOTA_USER_TYPE_TOKENS_PER_MIN.get(current_user.get('user_type'), 0))
+            ]
+            if QUOTA_PAYER_TOKENS_PER_MIN and token_quota.enabled:
+                payer_id = quota_payer_id(current_user)
+                if payer_id:
+                    buckets.append((f"payer:{payer_id}", QUOTA_PAYER_TOKENS_PER_MIN))
+
+            exceeded = token_quota.charge(buckets, tokens)
+            if exceeded:
+                return jsonify({
+                    'message': 'AI usage quota exceeded, please retry later',
+                    'scope': exceeded.scope.split(':', 1)[0],
+                    'retry_after': exceeded.retry_after,
+                    'requested_tokens': exceeded.requested,
+                    'available_tokens': exceeded.available
+                }), 429, {'Retry-After': str(exceeded.retry_after)}
+
+            if not refund_unused:
+                return f(current_user, *args, **kwargs)
+            g.ai_model_called = False
+            try:
+                return f(current_user, *args, **kwargs)
+            finally:
+                if not g.ai_model_called:
+                    token_quota.refund(buckets, tokens)
+        return decorated
+    return decorator
+
+
+# Estimated tokens per AI call: prompt text plus the completion budget
+def estimate_review_tokens(data):
+    return AI_PROMPT_BUDGET_REVIEW + 500
+
+
+def estimate_batch_review_tokens(data):
+    # Same checks as the route: a batch it will reject with 400 costs nothing
+    auth_ids = data.get('auth_ids')
+    count = len(set(auth_ids)) if isinstance(auth_ids, list) else 0
+    if not count or count > AI_BATCH_MAX_ITEMS:
+        return 0
+    return (AI_PROMPT_BUDGET_REVIEW + 500) * count
+
+
+def estimate_format_tokens(data):
+    return min(count_tokens(str(data.get('raw_input') or '')), AI_PROMPT_BUDGET_FORMAT) + 350
+
+
+def estimate_autocomplete_tokens(data):
+    return min(count_tokens(str(data.get('input') or '')), AI_PROMPT_BUDGET_AUTOCOMPLETE) + 150
+
+
+def estimate_health_buddy_tokens(data):
+    return AI_PROMPT_BUDGET_HEALTH_BUDDY // 2 + count_tokens(str(data.get('message') or '')) + 800
+
+
 
 # =====================================================
 # AI Processing Functions
 # =====================================================
 
 
-def auto_review_auth(auth_request, member_data, past_requests):
+def complete_chat(function, timeout=None, hedge=False, **kwargs):
+    """
+    Chat completion through the LLM router, recorded in llm_metrics under
+    the calling helper's name.
+
+    Args:
+        timeout: overall deadline in seconds (defaults to LLM_DEADLINE_SECONDS)
+        hedge: allow a hedged request to the second backend
+    """
+    if has_request_context():
+        # Tells ai_quota(refund_unused=True) the route really used the model
+        g.ai_model_called = True
+    return llm_router.complete(function, timeout=timeout, hedge=hedge, **kwargs)
+
+
+def parse_json_reply(function, result_text):
+    """
+    Parse a JSON object out of a model reply, recording which path was needed.
+
+    Returns:
+        The parsed dict, or None if no JSON object could be recovered
+    """
+    try:
+        data = json.loads(result_text.strip())
+        if isinstance(data, dict):
+            llm_metrics.record_parse(function, 'direct')
+            return data
+    except (ValueError, AttributeError):
+        pass
+
+    try:
+        json_match = re.search(r'\{.*\}', result_text or '', re.DOTALL)
+        if json_match:
+            data = json.loads(json_match.group())
+            if isinstance(data, dict):
+                llm_metrics.record_parse(function, 'fallback')
+                return data
+    except ValueError:
+        pass
+
+    llm_metrics.record_parse(function, 'failed')
+    return None
+
+
+def review_request_kwargs():
+    """Chat completion arguments shared by the review calls."""
+    kwargs = {'temperature': 0.2, 'max_tokens': 500}
+    if REVIEW_STRUCTURED_OUTPUT:
+        kwargs['response_format'] = {"type": "json_object"}
+    return kwargs
+
+
+def validate_decision(function, decision_data):
+    """
+    Check a parsed review reply has a usable status, normalizing its case.
+
+    Returns:
+        The decision dict, or None (recorded as 'invalid') if it cannot be used
+    """
+    if decision_data is None:
+        return None
+    status = decision_data.get('status')
+    if not isinstance(status, str) or status.strip().lower() not in REVIEW_STATUSES:
+        llm_metrics.record_parse(function, 'invalid')
+        return None
+    decision_data['status'] = status.strip().lower()
+    return decision_data
+
+
+def iter_stream_deltas(function, stream, messages):
+    """
+    Yield the text deltas of a streamed completion.
+
+    complete_chat only times the connection, so the full stream (with time
+    to first token) is recorded separately as '<function>:stream'. Closing
+    the generator closes the upstream stream so the model stops generating.
+    """
+    started = time.perf_counter()
+    first_token_at = None
+    parts = []
+    error = None
+    try:
+        for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                if first_token_at is None:
+                    first_token_at = time.perf_counter()
+                parts.append(chunk.choices[0].delta.content)
+                yield chunk.choices[0].delta.content
+    except Exception as e:
+        error = e
+        raise
+    finally:
+        stream.close()
+        llm_metrics.record(
+            f'{function}:stream',
+            time.perf_counter() - started,
+            prompt_tokens=count_message_tokens(messages),
+            completion_tokens=count_tokens(''.join(parts)),
+            error=error,
+            ttft=first_token_at - started if first_token_at else None
+        )
+
+
+def stream_review_decision(function, messages, on_field=None):
+    """
+    Stream a review reply, parsing the JSON object as it arrives.
+
+    Args:
+        on_field: optional callback(key, value) called as each top-level
+            field completes (status and reason usually come first)
+    Returns:
+        (result_text, decision dict or None if the reply could not be used)
+    """
+    stream = complete_chat(function, stream=True, messages=messages, **review_request_kwargs())
+    parser = IncrementalJSONParser()
+    deltas = iter_stream_deltas(function, stream, messages)
+    stopped_early = False
+    try:
+        for delta in deltas:
+            for key, value in parser.feed(delta).items():
+                if on_field:
+                    on_field(key, value)
+            if REVIEW_EARLY_STOP and all(key in parser.fields for key in REVIEW_REQUIRED_KEYS):
+                stopped_early = True
+                break
+    finally:
+        deltas.close()
+
+    result_text = parser.buffer
+    if stopped_early or (parser.complete and all(key in parser.fields for key in REVIEW_REQUIRED_KEYS)):
+        llm_metrics.record_parse(function, 'early_stop' if stopped_early else 'streamed')
+        decision_data = dict(parser.fields)
+    else:
+        # Truncated or malformed stream: try the whole-text parse paths
+        decision_data = parse_json_reply(function, result_text)
+    return result_text, validate_decision(function, decision_data)
+
+
+def store_review_fields(auth_request, fields):
+    """
+    Write AI review fields onto the request under review: the prior
+    authorization, or (speculative review, no auth_id yet) the ai_draft of
+    the member's pending request.
+    """
+    if auth_request.get('auth_id'):
+        auth_repo.update(auth_request['auth_id'], fields)
+    else:
+        db.pending_requests.update_one(
+            {'request_id': auth_request['request_id']},
+            {'$set': {f'ai_draft.{field}': value for field, value in fields.items()}}
+        )
+
+
+def adjudicate_by_rules(auth_request, member_data):
+    """
+    Decide obvious cases with the payer decision tables before calling the model.
+
+    Returns:
+        The decision dict (with rule_id) or None if the request needs an AI review
+    """
+    rules_engine.maybe_reload()
+    if not rules_engine.rule_count:
+        return None
+
+    member_id = auth_request.get('member_id') or (member_data or {}).get('member_id')
+    if auth_request.get('subscription_id'):
+        subscription = db.insurance_subscriptions.find_one({'subscription_id': auth_request['subscription_id']})
+    else:
+        subscription = (
+            db.insurance_subscriptions.find_one({'member_id': member_id, 'status': 'active'},
+                                                sort=[('subscription_date', -1)])
+            or db.insurance_subscriptions.find_one({'member_id': member_id}, sort=[('subscription_date', -1)])
+        )
+
+    payer_id = auth_request.get('payer_id') or (subscription or {}).get('payer_id')
+    payer = db.payers.find_one({'payer_id': payer_id}, {'payer_id': 1, 'coverage_types': 1}) if payer_id else None
+    provider = db.providers.find_one({'provider_id': auth_request.get('provider_id')}, {'network_type': 1})
+
+    ctx = build_context(auth_request, subscription, payer, provider)
+    started = time.perf_counter()
+    match = rules_engine.evaluate(ctx)
+    eval_us = (time.perf_counter() - started) * 1e6
+    if not match:
+        return None
+
+    decision_data = {
+        "status": match['decision'],
+        "reason": match['reason'],
+        "ai_notes": f"Auto-adjudicated by rule {match['rule_id']}",
+        "rule_id": match['rule_id']
+    }
+
+    store_review_fields(auth_request, {
+        "ai_processed": True,
+        "ai_decided_by": "rules",
+        "ai_rule_id": match['rule_id'],
+        "ai_rule_eval_us": round(eval_us, 2),
+        "ai_decision": decision_data["status"],
+        "ai_notes": decision_data["ai_notes"],
+        "ai_reason": decision_data["reason"],
+        "ai_reviewed_at": dtt.now(timezone.utc)
+    })
+
+    return decision_data
+
+
+def auto_review_auth(auth_request, member_data, raise_errors=False):
     """
     Review authorization request using Azure OpenAI Agentic AI.
+
+    member_data is the member's feature document (member_features), which
+    carries both the profile and the history digest.
+
+    With raise_errors=True failures propagate instead of returning the
+    fallback decision, so the review worker can retry the job.
     """
 
     try:
-        context_prompt = f"""
+        # Deterministic decision tables short-circuit the model
+        ruled = adjudicate_by_rules(auth_request, member_data)
+        if ruled:
+            return ruled
+
+        def render(fields, history):
+            return f"""
         You are an autonomous medical insurance review agent.
         Follow these steps:
         1. Assess procedure risk.
@@ -142,10 +832,10 @@ def auto_review_auth(auth_request, member_data, past_requests):
         Respond ONLY in JSON with keys: status, reason, ai_notes.
 
 Request Details:
-Procedure: {auth_request['procedure']}
-Diagnosis: {auth_request['diagnosis']}
-Urgency: {auth_request['urgency']}
-Additional Notes: {auth_request['additional_notes']}
+Procedure: {fields['procedure']}
+Diagnosis: {fields['diagnosis']}
+Urgency: {fields['urgency']}
+Additional Notes: {fields['additional_notes']}
 
 Member Profile:
 ID: {member_data.get('member_id')}
@@ -154,9 +844,14 @@ Gender: {member_data.get('gender')}
 Chronic Conditions: {member_data.get('diseases', [])}
 
 Historical Requests:
-{past_requests if past_requests else "No past requests found"}
+{history}
+
+Similar Past Decisions (how comparable requests were decided):
+{fields['precedents']}
         """
 
+        context_prompt = build_review_prompt(render, auth_request, member_data)
+
         plan_instructions = """
 You are an autonomous medical insurance review agent.
 Follow these steps:
@@ -169,60 +864,191 @@ Follow these steps:
 Respond ONLY in JSON with keys: status, reason, ai_notes.
         """
 
+        # Serve repeated requests from the decision cache
+        cache_key = decision_fingerprint(auth_request, profile_bucket(member_data, exclude_auth=auth_request),
+                                         REVIEW_PROMPT_VERSION)
+        cached = decision_cache.get(cache_key)
 
-        # Call Azure OpenAI Chat Completions API
-        response = client.chat.completions.create(
-            model=os.environ["AZURE_OPENAI_DEPLOYMENT"],
-            temperature=0.2,
-            max_tokens=500,
-            messages=[
+        if cached:
+            result_text = cached['result_text']
+            decision_data = cached['decision']
+        else:
+            started = time.monotonic()
+            messages = [
                 {"role": "system", "content": plan_instructions},
                 {"role": "user", "content": context_prompt}
             ]
-        )
 
-        result_text = response.choices[0].message["content"]
+            if REVIEW_STREAMING:
+                # Surface status/reason on the request while the rest is generated
+                def show_preview(key, value):
+                    if key in ('status', 'reason') and isinstance(value, str):
+                        store_review_fields(auth_request,
+                                            {f"ai_{'decision' if key == 'status' else key}_preview": value})
 
-        # Extract JSON
-        try:
-            json_match = re.search(r'\{.*\}', result_text, re.DOTALL)
-            if json_match:
-                decision_data = json.loads(json_match.group())
+                result_text, decision_data = stream_review_decision('auto_review_auth', messages,
+                                                                    on_field=show_preview)
             else:
+                response = complete_chat('auto_review_auth', hedge=True, messages=messages,
+                                         **review_request_kwargs())
+                result_text = response.choices[0].message.content or ""
+                decision_data = validate_decision('auto_review_auth',
+                                                  parse_json_reply('auto_review_auth', result_text))
+            parsed = decision_data is not None
+            if not parsed:
                 decision_data = {
                     "status": "pending",
                     "reason": "Agent completed reasoning but output unclear",
                     "ai_notes": result_text
                 }
-        except Exception:
-            decision_data = {
-                "status": "pending",
-                "reason": "Agent completed reasoning but output unclear",
-                "ai_notes": result_text
-            }
+
+            # Only cache decisions the model actually produced
+            if parsed:
+                decision_cache.put(cache_key, decision_data, result_text, REVIEW_PROMPT_VERSION,
+                                   time.monotonic() - started)
 
         # Save results to DB
-        db.prior_auths.update_one(
-            {"auth_id": auth_request["auth_id"]},
-            {
-                "$set": {
-                    "ai_processed": True,
-                    "ai_agent_plan": plan_instructions,
-                    "ai_decision_text": result_text,
-                    "ai_decision": decision_data.get("status", "pending"),
-                    "ai_notes": decision_data.get("ai_notes", ""),
-                    "ai_reason": decision_data.get("reason", ""),
-                    "ai_reviewed_at": dtt.now(timezone.utc)
-                }
-            }
-        )
+        store_review_fields(auth_request, {
+            "ai_processed": True,
+            "ai_agent_plan": plan_instructions,
+            "ai_prompt_tokens": count_tokens(context_prompt),
+            "ai_decision_text": result_text,
+            "ai_decision": decision_data.get("status", "pending"),
+            "ai_notes": decision_data.get("ai_notes", ""),
+            "ai_reason": decision_data.get("reason", ""),
+            "ai_cache_hit": cached is not None,
+            "ai_reviewed_at": dtt.now(timezone.utc)
+        })
 
         return decision_data
 
     except Exception as e:
         print(f"Agentic AI review failed: {str(e)}")
+        if raise_errors:
+            raise
         return {"status": "pending", "reason": "Fallback logic used", "ai_notes": str(e)}
-def generate_prompt_for_agent(auth_request, member_data, past_requests):
+
+
+def process_review_job(job):
+    """
+    Run the AI review for a queued job. Called by review_worker.py.
+
+    Raises on failure so the queue can retry or dead-letter the job.
+    """
+    if job.get('kind') == 'speculative':
+        return process_speculative_job(job)
+
+    auth_request = auth_repo.get(job['auth_id'], {'_id': 0})
+    if not auth_request:
+        raise ValueError(f"Authorization request {job['auth_id']} not found")
+
+    return run_queued_review(job, auth_request)
+
+
+def process_speculative_job(job):
+    """
+    Draft a review for a member's pending request before the provider approves it.
+
+    The draft is stored on the pending request (ai_draft) and promoted into
+    the prior authorization by approve_pending_request.
+    """
+    request_id = job['payload'].get('request_id')
+    pending_request = db.pending_requests.find_one({'request_id': request_id}, {'_id': 0, 'ai_draft': 0})
+    if not pending_request:
+        raise ValueError(f"Pending request {request_id} not found")
+    if pending_request.get('status') != 'pending_provider_approval':
+        # Already approved (and reviewed for real) or withdrawn
+        return {'status': None, 'reason': 'Pending request no longer awaiting provider approval'}
+
+    draft_request = {
+        field: pending_request.get(field)
+        for field in ('request_id', 'member_id', 'provider_id', 'payer_id', 'procedure', 'diagnosis',
+                      'urgency', 'additional_notes', 'provider_notes', 'auth_amount')
+    }
+    return run_queued_review(job, draft_request)
+
+
+def run_queued_review(job, auth_request):
+    """Review a prior authorization (or pending request draft), tracking the job on it."""
+    member_data = member_features.get(auth_request['member_id'])
+
+    store_review_fields(auth_request, {'ai_review_status': 'running', 'ai_review_job_id': job['job_id']})
+
+    decision = auto_review_auth(auth_request, member_data or {}, raise_errors=True)
+
+    store_review_fields(auth_request, {'ai_review_status': 'completed'})
+    return decision
+
+
+def speculative_draft_is_stale(pending_request, provider_notes, auth_amount):
+    """
+    Whether approval changed the request enough that its speculative draft
+    no longer stands: substantive provider notes that were not reviewed, or
+    an amount outside the tolerance of the one reviewed.
+    """
+    reviewed_notes = normalize_text(pending_request.get('provider_notes'))
+    notes = normalize_text(provider_notes)
+    if notes != reviewed_notes and len(notes) >= SPECULATIVE_NOTES_MIN_CHARS:
+        return True
+
+    try:
+        reviewed_amount = float(pending_request.get('auth_amount') or 0)
+        amount = float(auth_amount or 0)
+    except (TypeError, ValueError):
+        return True
+    tolerance = max(SPECULATIVE_AMOUNT_MIN_DELTA, SPECULATIVE_AMOUNT_TOLERANCE * reviewed_amount)
+    return abs(amount - reviewed_amount) > tolerance
+
+
+def build_review_prompt(render, auth_request, member_data, budget=None):
+    """
+    Render a review prompt within the review token budget.
+
+    render(fields, history) builds the prompt text; free-text request fields
+    and the similar-case precedents are capped at half the budget and the
+    member's history digest (without the request under review) fills
+    whatever budget is left.
+    """
+    budget = budget or AI_PROMPT_BUDGET_REVIEW
+    notes = str(auth_request.get('additional_notes', ''))
+    if auth_request.get('provider_notes'):
+        notes += f"\nProvider notes: {auth_request['provider_notes']}"
+    if auth_request.get('auth_amount'):
+        notes += f"\nRequested amount: {auth_request['auth_amount']}"
+
+    fields = fit_sections({
+        'procedure': str(auth_request.get('procedure', '')),
+        'diagnosis': str(auth_request.get('diagnosis', '')),
+        'additional_notes': notes,
+        'precedents': render_precedents(find_precedents(auth_request))
+    }, budget // 2)
+    fields['urgency'] = auth_request.get('urgency', 'routine')
+
+    fixed_tokens = count_tokens(render(fields, ''))
+    digest = history_digest(member_data, exclude_auth=auth_request, recent_n=AI_HISTORY_RECENT_N)
+    return render(fields, compact_digest(digest, budget - fixed_tokens))
+
+
+def find_precedents(auth_request):
+    """Top-k most similar decided requests, never failing the review over it."""
+    if PRECEDENT_TOP_K <= 0:
+        return []
+    try:
+        return precedent_index.search(auth_request, k=PRECEDENT_TOP_K, exclude_auth_id=auth_request.get('auth_id'))
+    except Exception as e:
+        print(f"Precedent lookup failed: {str(e)}")
+        return []
+
+
+def generate_prompt_for_agent(auth_request, member_data):
+    return build_review_prompt(
+        lambda fields, history: _render_agent_prompt(fields, member_data, history),
+        auth_request,
+        member_data
+    )
+
+
+def _render_agent_prompt(fields, member_data, history):
     return f"""
 You are an autonomous medical insurance review agent.
 Follow these steps:
@@ -235,10 +1061,10 @@ Follow these steps:
 Respond ONLY in JSON format with keys: status, reason, ai_notes.
 
 Request Details:
-- Procedure: {auth_request['procedure']}
-- Diagnosis: {auth_request['diagnosis']}
-- Urgency: {auth_request['urgency']}
-- Additional Notes: {auth_request['additional_notes']}
+- Procedure: {fields['procedure']}
+- Diagnosis: {fields['diagnosis']}
+- Urgency: {fields['urgency']}
+- Additional Notes: {fields['additional_notes']}
 
 Member Profile:
 - ID: {member_data.get('member_id')}
@@ -247,73 +1073,120 @@ Member Profile:
 - Chronic Conditions: {member_data.get('diseases', [])}
 
 Historical Requests:
-{past_requests if past_requests else "No past requests found"}
+{history}
+
+Similar Past Decisions (how comparable requests were decided):
+{fields['precedents']}
 """
 
-def auto_review_auth_with_agent(auth_request, member_data, past_requests):
-    try:
-        context_prompt = generate_prompt_for_agent(auth_request, member_data, past_requests)
+def prepare_agent_review(auth_request, member_data):
+    """
+    Everything before the model call for an agent review; member_data is
+    the member's feature document.
 
-        # Azure OpenAI response call
-        response = client.chat.completions.create(
-            deployment_id=AZURE_OPENAI_DEPLOYMENT,
-            messages=[
-                {"role": "system", "content": "You are an autonomous medical insurance review agent."},
-                {"role": "user", "content": context_prompt}
-            ],
-            temperature=0.2,
-            max_tokens=500
-        )
+    Returns:
+        {'decision': ...} when rules or the cache already decided, otherwise
+        {'prompt', 'cache_key', 'messages'} for the model call
+    """
+    # Deterministic decision tables short-circuit the model
+    ruled = adjudicate_by_rules(auth_request, member_data)
+    if ruled:
+        return {'decision': ruled}
+
+    context_prompt = generate_prompt_for_agent(auth_request, member_data)
+
+    # Serve repeated requests from the decision cache
+    cache_key = decision_fingerprint(auth_request, profile_bucket(member_data, exclude_auth=auth_request),
+                                     AGENT_PROMPT_VERSION)
+    cached = decision_cache.get(cache_key)
+    if cached:
+        return {
+            'decision': finish_agent_review(auth_request, context_prompt, cached['result_text'],
+                                            cached['decision'], cache_hit=True)
+        }
 
-        result_text = response.choices[0].message["content"]
+    return {
+        'prompt': context_prompt,
+        'cache_key': cache_key,
+        'messages': [
+            {"role": "system", "content": "You are an autonomous medical insurance review agent."},
+            {"role": "user", "content": context_prompt}
+        ]
+    }
 
-        try:
-            json_match = re.search(r'\{.*\}', result_text, re.DOTALL)
-            if json_match:
-                decision_data = json.loads(json_match.group())
-            else:
-                decision_data = {
-                    "status": "pending",
-                    "reason": "Agent reasoning completed but decision unclear",
-                    "ai_notes": result_text
-                }
-        except json.JSONDecodeError:
-            decision_data = {
-                "status": "pending",
-                "reason": "Agent reasoning completed but decision unclear",
-                "ai_notes": result_text
-            }
 
-        # Store results in DB
-        db.prior_auths.update_one(
-            {"auth_id": auth_request["auth_id"]},
-            {
-                "$set": {
-                    "ai_processed": True,
-                    "ai_agent_prompt": context_prompt,
-                    "ai_decision_text": result_text,
-                    "ai_decision": decision_data.get("status", "pending"),
-                    "ai_notes": decision_data.get("ai_notes", ""),
-                    "ai_reason": decision_data.get("reason", ""),
-                    "ai_reviewed_at": dtt.now(timezone.utc)
-                }
-            }
-        )
+def complete_agent_review(auth_request, plan, response, latency_seconds):
+    """Parse the model reply for a prepared agent review, cache it and store it."""
+    result_text = response.choices[0].message.content or ""
 
-        return decision_data
+    decision_data = validate_decision('auto_review_auth_with_agent',
+                                      parse_json_reply('auto_review_auth_with_agent', result_text))
+    if decision_data is None:
+        decision_data = {
+            "status": "pending",
+            "reason": "Agent reasoning completed but decision unclear",
+            "ai_notes": result_text
+        }
+    else:
+        # Only cache decisions the model actually produced
+        decision_cache.put(plan['cache_key'], decision_data, result_text, AGENT_PROMPT_VERSION, latency_seconds)
+
+    return finish_agent_review(auth_request, plan['prompt'], result_text, decision_data, cache_hit=False)
+
+
+def finish_agent_review(auth_request, context_prompt, result_text, decision_data, cache_hit):
+    """Store an agent review decision on the authorization request."""
+    store_review_fields(auth_request, {
+        "ai_processed": True,
+        "ai_agent_prompt": context_prompt,
+        "ai_prompt_tokens": count_tokens(context_prompt),
+        "ai_decision_text": result_text,
+        "ai_decision": decision_data.get("status", "pending"),
+        "ai_notes": decision_data.get("ai_notes", ""),
+        "ai_reason": decision_data.get("reason", ""),
+        "ai_cache_hit": cache_hit,
+        "ai_reviewed_at": dtt.now(timezone.utc)
+    })
+    return decision_data
+
+
+def agent_review_fallback(error):
+    print(f"Agentic AI review failed: {str(error)}")
+    return {"status": "pending", "reason": "Fallback logic used", "ai_notes": str(error)}
+
+
+def auto_review_auth_with_agent(auth_request, member_data):
+    try:
+        plan = prepare_agent_review(auth_request, member_data)
+        if 'decision' in plan:
+            return plan['decision']
+
+        started = time.monotonic()
+        response = complete_chat(
+            'auto_review_auth_with_agent',
+            hedge=True,
+            messages=plan['messages'],
+            **review_request_kwargs()
+        )
+        return complete_agent_review(auth_request, plan, response, time.monotonic() - started)
 
     except Exception as e:
-        print(f"Agentic AI review failed: {str(e)}")
-        return {"status": "pending", "reason": "Fallback logic used", "ai_notes": str(e)}
+        return agent_review_fallback(e)
 
 def format_request_description(raw_input):
     """
     Format medical request description using Azure OpenAI (Agentic AI approach).
+
+    Exact and near-duplicate inputs are served from the format cache.
     """
     try:
+        cached = format_cache.get(raw_input)
+        if cached is not None:
+            return cached
 
-        response = client.chat.completions.create(
-            model=os.getenv("AZURE_OPENAI_DEPLOYMENT"),
+        started = time.monotonic()
+        response = complete_chat(
+            'format_request_description',
             messages=[
                 {
                     "role": "system",
@@ -321,14 +1194,20 @@ def format_request_description(raw_input):
                 },
                 {
                     "role": "user",
-                    "content": f"Format this request clearly and professionally: {raw_input}"
+                    "content": f"Format this request clearly and professionally: "
+                               f"{truncate_to_tokens(raw_input, AI_PROMPT_BUDGET_FORMAT)}"
                 }
             ],
             max_tokens=300,
             temperature=0.5
         )
 
-        return response.choices[0].message["content"].strip()
+        formatted = (response.choices[0].message.content or "").strip()
+        if not formatted:
+            return raw_input
+
+        format_cache.put(raw_input, formatted, time.monotonic() - started)
+        return formatted
 
     except Exception as e:
         print(f"Error formatting description: {str(e)}")
@@ -355,28 +1234,39 @@ def get_autocomplete_suggestion(input_text):
             },
             {
                 "role": "user",
-                "content": input_text
+                # Only the text right before the cursor matters for completion
+                "content": truncate_to_tokens(input_text, AI_PROMPT_BUDGET_AUTOCOMPLETE, keep='tail')
             }
         ]
-        response = client.chat.completions.create(
-            model=AZURE_OPENAI_DEPLOYMENT,
+        response = complete_chat(
+            'get_autocomplete_suggestion',
             messages=messages,
-            reasoning={"effort": "medium"},
-            max_output_tokens=50
+            max_tokens=50
         )
 
-        return response.output_text.strip()
+        return (response.choices[0].message.content or "").strip()
     except Exception as e:
         print(f"Error getting autocomplete: {str(e)}")
         return ""
 
-def get_ai_health_buddy_response(user_message, member_doc, provider_data, payer_data, past_requests, member_provider, member_payer):
+def build_health_buddy_context(member_doc, provider_data, payer_data, history, member_provider, member_payer):
     """
-    Get AI health buddy response for member queries using Azure OpenAI (agentic style).
+    Build the health buddy session context block within the health buddy
+    token budget. It holds everything but the member's questions, so it is
+    rendered once per session and sent unchanged with every turn.
     """
-    try:
-        # Build context for the AI
-        prompt = f"""
+    # Variable-size context, trimmed to the health buddy token budget below
+    sections = {
+        'past_requests': compact_digest(history, AI_PROMPT_BUDGET_HEALTH_BUDDY // 4) if history['total'] else 'None',
+        'providers': json.dumps(provider_data, indent=2, default=str),
+        'payers': json.dumps(payer_data, indent=2, default=str),
+        'member_provider': json.dumps(member_provider, indent=2, default=str),
+        'member_payer': json.dumps(member_payer, indent=2, default=str)
+    }
+
+    # Build context for the AI
+    def render(sections):
+        return f"""
     You are a helpful AI health buddy for a member. Your role is to:
 
     1. Understand the member's current health concern and background.
@@ -394,22 +1284,22 @@ def get_ai_health_buddy_response(user_message, member_doc, provider_data, payer_
     - Co-pay: {member_doc.get('co_pay', 'Unknown')}
     - Coverage Start: {member_doc.get('coverage_start', 'Unknown')}
     - Emergency Contact: {member_doc.get('emergency_contact', 'Unknown')} ({member_doc.get('emergency_phone', 'Unknown')})
-    - Past Claims History: {past_requests if past_requests else 'None'}
+    - Past Claims History: {sections['past_requests']}
 
-    Healthcare Providers:
-    {json.dumps(provider_data, indent=2)}
+    Healthcare Providers (best matches for this member):
+    {sections['providers']}
 
-    Insurance Payers:
-    {json.dumps(payer_data, indent=2)}
+    Insurance Payers (best matches for this member):
+    {sections['payers']}
 
     Member's go-to Provider:
-    {json.dumps(member_provider, indent=2)}
+    {sections['member_provider']}
 
     Member's already subscribed Insurance Payer:
-    {json.dumps(member_payer, indent=2)}
+    {sections['member_payer']}
 
-    User's Current Question/Issue:
-    {user_message}
+    The member's questions follow as chat messages. Answer the latest one,
+    using the earlier conversation where relevant.
 
     Rules & Guidelines:
     - Do NOT provide a direct medical diagnosis.
@@ -430,7 +1320,8 @@ def get_ai_health_buddy_response(user_message, member_doc, provider_data, payer_
     - Explain clearly WHY the chosen provider and insurance plan are suitable.
     - If no perfect match, suggest closest alternatives and limitations.
     - Always encourage consulting a licensed medical professional for final advice.
-    - Provide output in the following format:
+    - For a new health concern, provide output in the following format
+      (follow-up questions can be answered directly):
 
     Output Format:
     1. Summary of the patient's situation.
@@ -450,13 +1341,24 @@ def get_ai_health_buddy_response(user_message, member_doc, provider_data, payer_
     4. Next Steps for the patient.
     """
 
+    fixed_tokens = count_tokens(render({name: '' for name in sections}))
+    return render(fit_sections(sections, AI_PROMPT_BUDGET_HEALTH_BUDDY - fixed_tokens))
+
+
+def get_ai_health_buddy_response(messages):
+    """
+    Get AI health buddy response for member queries using Azure OpenAI (agentic style).
+
+    Args:
+        messages: the session turn built by prepare_health_buddy_turn
+    Returns:
+        The answer, or None if the model call failed
+    """
+    try:
         # Call Azure OpenAI Chat Completion
-        response = client.chat.completions.create(
-            model=os.environ["AZURE_OPENAI_DEPLOYMENT"],
-            messages=[
-                {"role": "system", "content": "You are a helpful AI health assistant."},
-                {"role": "user", "content": prompt}
-            ],
+        response = complete_chat(
+            'get_ai_health_buddy_response',
+            messages=messages,
             temperature=0.7
         )
 
@@ -464,7 +1366,47 @@ def get_ai_health_buddy_response(user_message, member_doc, provider_data, payer_
     
     except Exception as e:
         print(f"Error getting health buddy response: {e}")
-        return "I'm sorry, I'm having trouble processing your request right now. Please try again later."
+        return None
+
+
+def stream_ai_health_buddy_response(messages):
+    """
+    Stream the health buddy answer as text deltas as the model produces them.
+
+    Closing the generator (e.g. when the client disconnects) closes the
+    upstream stream so the model stops generating.
+    """
+    stream = complete_chat(
+        'stream_ai_health_buddy_response',
+        messages=messages,
+        temperature=0.7,
+        stream=True
+    )
+    yield from iter_stream_deltas('stream_ai_health_buddy_response', stream, messages)
+
+
+def summarize_health_buddy_turns(summary, turns):
+    """Fold older conversation turns into the session's rolling summary."""
+    transcript = "\n".join(f"{turn['role'].capitalize()}: {turn['content']}" for turn in turns)
+    prompt = f"""
+Update the running summary of a conversation between a member and their AI health buddy.
+Keep the member's health concerns, facts they shared about themselves, and the providers,
+insurance plans and next steps that were recommended. Be concise (under
+{HEALTH_BUDDY_SUMMARY_MAX_TOKENS} tokens); return only the updated summary.
+
+Current summary:
+{summary or 'None'}
+
+New conversation turns:
+{transcript}
+"""
+    response = complete_chat(
+        'summarize_health_buddy_session',
+        messages=[{"role": "user", "content": prompt}],
+        temperature=0.2,
+        max_tokens=HEALTH_BUDDY_SUMMARY_MAX_TOKENS
+    )
+    return truncate_to_tokens((response.choices[0].message.content or "").strip(), HEALTH_BUDDY_SUMMARY_MAX_TOKENS)
 
 
 
@@ -544,7 +1486,7 @@ def subscribe_to_insurance(current_user):
             
         # Create subscription
         subscription = {
-            'subscription_id': f"SUB{random.randint(100000, 999999)}",
+            'subscription_id': new_unique_id(db.insurance_subscriptions, 'subscription_id', 'SUB', 100000, 999999),
             'member_id': member['member_id'],
             'member_name': member['name'],
             'payer_id': payer_id,
@@ -564,7 +1506,14 @@ def subscribe_to_insurance(current_user):
         }
         
         # Insert subscription
-        db.insurance_subscriptions.insert_one(subscription)
+        try:
+            db.insurance_subscriptions.insert_one(subscription)
+        except DuplicateKeyError:
+            # A concurrent subscribe took the same id between the check and the insert
+            subscription.pop('_id', None)
+            subscription['subscription_id'] = new_unique_id(db.insurance_subscriptions, 'subscription_id',
+                                                            'SUB', 100000, 999999)
+            db.insurance_subscriptions.insert_one(subscription)
         
         # Update payer's member list
         db.payers.update_one(
@@ -583,6 +1532,7 @@ def subscribe_to_insurance(current_user):
                 '$inc': {'amount_reimbursed': 0}
             }
         )
+        member_features.on_subscription_changed(member['member_id'])
         
         return jsonify({
             'success': True,
@@ -609,22 +1559,26 @@ def get_member_insurance_subscriptions(current_user):
         if not member:
             return jsonify({'message': 'Member not found'}), 404
             
-        # Get all subscriptions for this member
-        subscriptions = list(db.insurance_subscriptions.find({
-            'member_id': member['member_id']
-        }))
+        # This member's subscriptions, newest first, one page at a time
+        page = parse_listing_args(request.args, 'subscription_date', ('status', 'payer_id'), LISTING_PAGE_SIZE,
+                                  LISTING_MAX_PAGE_SIZE, date_param='subscribed')
+        page['query']['member_id'] = member['member_id']
+        subscriptions, next_cursor = fetch_page(db.insurance_subscriptions, 'subscription_date', **page)
         
         # Convert ObjectId to string
         for sub in subscriptions:
             sub['_id'] = str(sub['_id'])
-            if 'subscription_date' in sub:
+            if isinstance(sub.get('subscription_date'), dtt):
                 sub['subscription_date'] = sub['subscription_date'].strftime('%Y-%m-%d')
         
         return jsonify({
             'success': True,
-            'data': subscriptions
+            'data': subscriptions,
+            'next_cursor': next_cursor
         }), 200
         
+    except PageError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
     except Exception as e:
         return jsonify({
             'success': False,
@@ -716,10 +1670,10 @@ def register():
     # Determine collection based on user type
     if user_type == 'member':
         collection = db.members
-        user_id = f"M{random.randint(100, 999):03}"
+        user_id = new_unique_id(collection, 'member_id', 'M', 100, 999, width=3)
     elif user_type == 'provider':
         collection = db.providers
-        user_id = f"P{random.randint(100, 999):03}"
+        user_id = new_unique_id(collection, 'provider_id', 'P', 100, 999, width=3)
     else:
         return jsonify({'message': 'Invalid user type'}), 400
 
@@ -756,7 +1710,13 @@ def register():
             'claim_history': []
         })
 
-    user_id = collection.insert_one(user_data).inserted_id
+    try:
+        user_id = collection.insert_one(user_data).inserted_id
+    except DuplicateKeyError:
+        # Lost a race with a concurrent registration (unique email / id index)
+        return jsonify({'message': 'User already exists'}), 409
+    if user_type == 'provider':
+        directory_index.mark_dirty()
 
     return jsonify({
         'message': 'User registered successfully', 
@@ -789,24 +1749,28 @@ def register_payer():
         return jsonify({'message': 'Payer already exists'}), 409
 
     hashed_pw = bcrypt_flask.generate_password_hash(password).decode('utf-8')
-    payer_id = f"PAYER{random.randint(1000, 9999)}"
+    payer_id = new_unique_id(db.payers, 'payer_id', 'PAYER', 1000, 9999)
 
-    db.payers.insert_one({
-        'payer_id': payer_id,
-        'payer_name': name,
-        'name': name,
-        'email': email,
-        'password': hashed_pw,
-        'limit': int(limit),
-        'balance_left': int(limit),
-        'collection_amount': 0,
-        'member_ids': [],
-        'provider_ids': [],
-        'pending_cases': [],
-        'approved_cases': [],
-        'total_amount_paid': 0,
-        'coverage_category': []  # New field for coverage categories
-    })
+    try:
+        db.payers.insert_one({
+            'payer_id': payer_id,
+            'payer_name': name,
+            'name': name,
+            'email': email,
+            'password': hashed_pw,
+            'limit': int(limit),
+            'balance_left': int(limit),
+            'collection_amount': 0,
+            'member_ids': [],
+            'provider_ids': [],
+            'pending_cases': [],
+            'approved_cases': [],
+            'total_amount_paid': 0,
+            'coverage_category': []  # New field for coverage categories
+        })
+    except DuplicateKeyError:
+        return jsonify({'message': 'Payer already exists'}), 409
+    directory_index.mark_dirty()
 
     return jsonify({
         'message': 'Payer registered successfully', 
@@ -1028,6 +1992,25 @@ def get_provider_profile(current_user):
     except Exception as e:
         return jsonify({'message': f'Error fetching provider profile: {str(e)}'}), 500
 
+def public_member_features(features):
+    """The member feature document as shown on profile screens (no bookkeeping fields)."""
+    if not features:
+        return None
+    return {
+        'age_band': features.get('age_band'),
+        'conditions': features.get('diseases', []),
+        'total_requests': features.get('total', 0),
+        'by_status': features.get('by_status', {}),
+        'total_reimbursed': features.get('total_reimbursed', 0),
+        'recurring_procedures': history_digest(features)['recurring_procedures'],
+        'recent': [
+            dict(item, date=item['date'].isoformat() if isinstance(item.get('date'), dtt) else item.get('date'))
+            for item in features.get('recent', [])
+        ],
+        'active_subscription': features.get('active_subscription'),
+        'updated_at': features['updated_at'].isoformat() if features.get('updated_at') else None
+    }
+
 @app.route('/member/profile/<member_id>', methods=['GET'])
 @token_required
 def get_member_by_id(current_user, member_id):
@@ -1052,7 +2035,8 @@ def get_member_by_id(current_user, member_id):
                 'coverage_start': member.get('coverage_start', '2024-01-01'),
                 'deductible': member.get('deductible', 1000),
                 'co_pay': member.get('co_pay', 25)
-            }
+            },
+            'features': public_member_features(member_features.get(member_id))
         }
         
         return jsonify(profile_data), 200
@@ -1094,7 +2078,8 @@ def get_member_profile(current_user):
                 'phone': member.get('phone', ''),
                 'diseases': member.get('diseases', []),
                 'claim_history': member.get('claim_history', [])
-            }
+            },
+            'features': public_member_features(member_features.get(member['member_id']))
         }
 
         return jsonify({'data': profile_data}), 200
@@ -1120,17 +2105,65 @@ def get_member_claims(current_user):
             return jsonify({'message': 'Member not found'}), 404
             
         # Get all claims for this member
-        member_claims = list(db.prior_auth.find({'member_id': member['member_id']}))
+        member_claims = list(auth_repo.for_member(member['member_id']))
         
         # Convert ObjectId to string for JSON serialization
         for claim in member_claims:
-            prior_auth['_id'] = str(prior_auth['_id'])
+            claim['_id'] = str(claim['_id'])
             
         return jsonify({'data': member_claims}), 200
         
     except Exception as e:
         return jsonify({'message': f'Error fetching claims: {str(e)}'}), 500
 
+def member_plans_pipeline(member_id, member_object_id):
+    """
+    Aggregation (run on the prior authorization collection) returning one
+    document per payer the member has claims with, a subscription to, or is
+    listed under (payers.member_ids), with claim count and amount reimbursed.
+
+    The $match/$group prefix is covered by the (member_id, payer_id,
+    amount_reimbursed) index.
+    """
+    return [
+        {'$match': {'member_id': member_id}},
+        {'$group': {
+            '_id': '$payer_id',
+            'total_claims_made': {'$sum': 1},
+            'amount_paid': {'$sum': {'$ifNull': ['$amount_reimbursed', 0]}}
+        }},
+        {'$unionWith': {'coll': 'insurance_subscriptions', 'pipeline': [
+            {'$match': {'member_id': member_id}},
+            {'$group': {'_id': '$payer_id'}}
+        ]}},
+        {'$unionWith': {'coll': 'payers', 'pipeline': [
+            {'$match': {'member_ids': member_object_id}},
+            {'$project': {'_id': '$payer_id'}}
+        ]}},
+        {'$match': {'_id': {'$ne': None}}},
+        {'$group': {
+            '_id': '$_id',
+            'total_claims_made': {'$sum': {'$ifNull': ['$total_claims_made', 0]}},
+            'amount_paid': {'$sum': {'$ifNull': ['$amount_paid', 0]}}
+        }},
+        {'$lookup': {
+            'from': 'payers',
+            'localField': '_id',
+            'foreignField': 'payer_id',
+            'pipeline': [{'$project': {
+                '_id': 0, 'payer_name': {'$ifNull': ['$payer_name', '$name']},
+                'unit_price': 1, 'payer_limit': 1, 'payer_balance_left': 1
+            }}],
+            'as': 'payer'
+        }},
+        {'$unwind': '$payer'},
+        {'$replaceWith': {'$mergeObjects': [
+            '$payer',
+            {'payer_id': '$_id', 'total_claims_made': '$total_claims_made', 'amount_paid': '$amount_paid'}
+        ]}},
+        {'$sort': {'payer_name': 1}}
+    ]
+
 @app.route('/member/insurance-plans', methods=['GET'])
 @token_required
 def get_member_insurance_plans(current_user):
@@ -1148,27 +2181,20 @@ def get_member_insurance_plans(current_user):
 
         member_id = member.get('member_id')
 
-        # Find payers associated with this member
-        payers = list(db.payers.find({'member_ids': member_id}))
-        
+        # One aggregation: claims grouped by payer, plus subscribed / linked
+        # payers without claims, joined with the payer financials
+        plans = auth_repo.collection.aggregate(member_plans_pipeline(member_id, member['_id']))
+
         insurance_plans = []
-        for payer in payers:
-            # Get member's claims under this payer
-            member_claims = list(db.prior_auth.find({
-                'member_id': member_id,
-                'payer_id': payer['_id']
-            }))
-            
-            total_claims_amount = sum(claim.get('amount_reimbursed', 0) for claim in member_claims)
-            
+        for plan in plans:
             plan_data = {
-                "payer_name": payer.get("payer_name"),
-                "payer_id": str(payer.get("_id")),
-                "unit_subscription_price": payer.get("unit_price", 3000),
-                "maximum_covered_amount": payer.get("payer_limit"),
-                "total_claims_made": len(member_claims),
-                "amount_paid": total_claims_amount,
-                "balance_left": payer.get("payer_balance_left"),
+                "payer_name": plan.get("payer_name"),
+                "payer_id": plan["payer_id"],
+                "unit_subscription_price": plan.get("unit_price", 3000),
+                "maximum_covered_amount": plan.get("payer_limit"),
+                "total_claims_made": plan["total_claims_made"],
+                "amount_paid": plan["amount_paid"],
+                "balance_left": plan.get("payer_balance_left"),
                 "insurance_category": member.get("insurance_plan", "Standard"),
                 "coverage_start": member.get("coverage_start", "2024-01-01"),
                 "deductible": member.get("deductible", 1000),
@@ -1223,7 +2249,7 @@ def submit_prior_auth(current_user):
 
         # Build the prior authorization request
         auth_request = {
-            'auth_id': f"AUTH{random.randint(1000, 9999)}",
+            'auth_id': auth_repo.new_auth_id(),
             'member_id': member_id,
             'provider_id': provider_id,
             'procedure': data.get('procedure'),
@@ -1240,20 +2266,21 @@ def submit_prior_auth(current_user):
             }
         }
 
-        member_data = list(db.members.find({'member_id': member_id}, {'_id': 0}))
-
-        past_requests = list(db.prior_auths.find({'member_id': member_id}, {'_id': 0}))
+        auth_request['ai_review_status'] = 'queued'
 
         # Insert into database
-        result = db.prior_auths.insert_one(auth_request)
+        auth_repo.insert(auth_request)
 
-        # Trigger AI processing
-        auto_review_auth(auth_request, member_data, past_requests)
+        # Queue AI processing instead of running it in the request
+        job = review_queue.enqueue(auth_request['auth_id'], urgency=auth_request['urgency'])
+        auth_repo.update(auth_request['auth_id'], {'ai_review_job_id': job['job_id']})
 
         return jsonify({
             'message': 'Prior authorization request submitted successfully',
-            'auth_id': auth_request['auth_id']
-        }), 201
+            'auth_id': auth_request['auth_id'],
+            'review_job_id': job['job_id'],
+            'review_status_url': f"/ai/review-jobs/{job['job_id']}"
+        }), 202
 
     except Exception as e:
         return jsonify({'message': f'Error submitting request: {str(e)}'}), 500
@@ -1270,25 +2297,37 @@ def get_all_prior_auths(current_user):
         if current_user['user_type'] not in ['payer', 'admin']:
             return jsonify({'message': 'Unauthorized'}), 403
 
-        # Get all auth requests
-        auths = list(db.prior_auths.find({}, {'_id': 0}))
+        # One page, newest first, narrowed by the dashboard's filters
+        page = parse_listing_args(request.args, 'submitted_at', PRIOR_AUTH_FILTERS, LISTING_PAGE_SIZE,
+                                  LISTING_MAX_PAGE_SIZE, date_param='submitted',
+                                  default_projection=LISTING_EXCLUDED_FIELDS)
+        if wants_ndjson():
+            # Export: every matching request (from the cursor on), not just one page
+            page.pop('limit')
+            docs = stream_listing(auth_repo.collection, 'submitted_at', batch_size=LISTING_STREAM_BATCH_SIZE, **page)
+            return ndjson_response(({field: value for field, value in auth.items() if field != '_id'}
+                                    for auth in docs), 'prior auths')
+        auths, next_cursor = fetch_page(auth_repo.collection, 'submitted_at', **page)
         
         # Format dates for JSON serialization
         for auth in auths:
-            if 'submitted_at' in auth:
+            auth.pop('_id', None)
+            if isinstance(auth.get('submitted_at'), dtt):
                 auth['submitted_at'] = auth['submitted_at'].isoformat()
-            if 'ai_reviewed_at' in auth:
+            if isinstance(auth.get('ai_reviewed_at'), dtt):
                 auth['ai_reviewed_at'] = auth['ai_reviewed_at'].isoformat()
                 
-        return jsonify({'prior_auths': auths}), 200
+        return jsonify({'prior_auths': auths, 'next_cursor': next_cursor}), 200
 
+    except PageError as e:
+        return jsonify({'message': str(e)}), 400
     except Exception as e:
         return jsonify({'message': f'Error fetching requests: {str(e)}'}), 500
 
 @app.route('/prior-auth/decision', methods=['POST'])
 def handle_prior_auth_decision():
     """
-    Approve or reject a pending request and move it to the prior_auth database.
+    Approve or reject a pending request and move it to the prior authorization store.
     """
     data = request.json
     request_id = data.get('request_id')
@@ -1306,12 +2345,13 @@ def handle_prior_auth_decision():
             return jsonify({"message": "Pending request not found"}), 404
 
         # Add decision details to the request
+        pending_request['auth_id'] = auth_repo.new_auth_id()
         pending_request['status'] = decision
         pending_request['decision_notes'] = notes
         pending_request['decision_date'] = dtt.now(timezone.utc)
 
-        # Move the request to the prior_auth database
-        mongo.db.prior_auth.insert_one(pending_request)
+        # Move the request to the prior authorization store
+        auth_repo.insert(pending_request)
 
         # Remove the request from the pending_requests database
         mongo.db.pending_requests.delete_one({"_id": ObjectId(request_id)})
@@ -1326,13 +2366,24 @@ def handle_prior_auth_decision():
 @app.route('/prior-auth', methods=['GET'])
 def fetch_prior_auths():
     """
-    Fetch all prior authorization records from the prior_auth database.
+    Fetch prior authorization records, one page at a time (see pagination.py).
     """
     try:
-        prior_auths = list(mongo.db.prior_auth.find())
+        page = parse_listing_args(request.args, 'submitted_at', PRIOR_AUTH_FILTERS, LISTING_PAGE_SIZE,
+                                  LISTING_MAX_PAGE_SIZE, date_param='submitted',
+                                  default_projection=LISTING_EXCLUDED_FIELDS)
+        if wants_ndjson():
+            page.pop('limit')
+            return ndjson_response(
+                stream_listing(auth_repo.collection, 'submitted_at', batch_size=LISTING_STREAM_BATCH_SIZE, **page),
+                'prior auths'
+            )
+        prior_auths, next_cursor = fetch_page(auth_repo.collection, 'submitted_at', **page)
         for auth in prior_auths:
             auth['_id'] = str(auth['_id'])  # Convert ObjectId to string for JSON serialization
-        return jsonify({"prior_auths": prior_auths}), 200
+        return jsonify({"prior_auths": prior_auths, "next_cursor": next_cursor}), 200
+    except PageError as e:
+        return jsonify({"message": str(e)}), 400
     except Exception as e:
         print(f"Error fetching prior auths: {e}")
         return jsonify({"message": "Internal server error"}), 500
@@ -1341,13 +2392,18 @@ def fetch_prior_auths():
 @app.route('/pending-requests', methods=['GET'])
 def fetch_pending_requests():
     """
-    Fetch all pending requests from the pending_requests database.
+    Fetch pending requests from the pending_requests database, one page at a time.
     """
     try:
-        pending_requests = list(mongo.db.pending_requests.find())
-        for request in pending_requests:
-            request['_id'] = str(request['_id'])  # Convert ObjectId to string for JSON serialization
-        return jsonify({"pending_requests": pending_requests}), 200
+        page = parse_listing_args(request.args, 'submitted_at', PRIOR_AUTH_FILTERS, LISTING_PAGE_SIZE,
+                                  LISTING_MAX_PAGE_SIZE, date_param='submitted',
+                                  default_projection={'ai_draft': 0})
+        pending_requests, next_cursor = fetch_page(mongo.db.pending_requests, 'submitted_at', **page)
+        for pending_request in pending_requests:
+            pending_request['_id'] = str(pending_request['_id'])  # Convert ObjectId to string for JSON serialization
+        return jsonify({"pending_requests": pending_requests, "next_cursor": next_cursor}), 200
+    except PageError as e:
+        return jsonify({"message": str(e)}), 400
     except Exception as e:
         print(f"Error fetching pending requests: {e}")
         return jsonify({"message": "Internal server error"}), 500
@@ -1357,6 +2413,7 @@ def fetch_pending_requests():
 
 @app.route('/ai/auto-review', methods=['POST'])
 @token_required
+@ai_quota(estimate_review_tokens, refund_unused=True)
 def auto_review_prior_auth(current_user):
     """
     Auto-review a prior authorization request using AI.
@@ -1369,20 +2426,17 @@ def auto_review_prior_auth(current_user):
             return jsonify({'message': 'Auth ID is required'}), 400
             
         # Find the authorization request
-        auth_request = db.prior_auths.find_one({'auth_id': auth_id})
+        auth_request = auth_repo.get(auth_id)
         if not auth_request:
             return jsonify({'message': 'Authorization request not found'}), 404
             
-        # Get member data
-        member = db.members.find_one({'member_id': auth_request['member_id']})
+        # Get member profile and history features
+        member = member_features.get(auth_request['member_id'])
         if not member:
             return jsonify({'message': 'Member not found'}), 404
-            
-        # Get past requests for this member
-        past_requests = list(db.prior_auths.find({'member_id': auth_request['member_id']}))
         
         # Perform AI review
-        decision = auto_review_auth_with_agent(auth_request, member, past_requests)
+        decision = auto_review_auth_with_agent(auth_request, member)
         
         return jsonify({
             'message': 'Auto-review completed successfully',
@@ -1393,8 +2447,308 @@ def auto_review_prior_auth(current_user):
     except Exception as e:
         return jsonify({'message': f'Error in auto-review: {str(e)}'}), 500
 
+@app.route('/ai/auto-review/batch', methods=['POST'])
+@token_required
+@ai_quota(estimate_batch_review_tokens)
+def auto_review_batch(current_user):
+    """
+    Auto-review many prior authorization requests in one call.
+
+    Expected JSON payload:
+    {
+        "auth_ids": ["AUTH1234", "AUTH5678", ...],
+        "concurrency": 8            # optional, capped at AI_BATCH_CONCURRENCY
+    }
+
+    Responds with newline-delimited JSON: one line per auth_id as soon as its
+    review finishes, followed by a summary line.
+    """
+    try:
+        if current_user['user_type'] not in ['payer', 'admin']:
+            return jsonify({'message': 'Unauthorized'}), 403
+
+        data = request.get_json() or {}
+        auth_ids = list(dict.fromkeys(data.get('auth_ids') or []))
+
+        if not auth_ids:
+            return jsonify({'message': 'auth_ids is required'}), 400
+        if len(auth_ids) > AI_BATCH_MAX_ITEMS:
+            return jsonify({'message': f'At most {AI_BATCH_MAX_ITEMS} auth_ids per batch'}), 400
+
+        concurrency = max(1, min(int(data.get('concurrency', AI_BATCH_CONCURRENCY)), AI_BATCH_CONCURRENCY))
+
+        # Load everything the reviews need with a handful of $in queries
+        auth_requests = {
+            auth['auth_id']: auth
+            for auth in auth_repo.by_ids(auth_ids, {'_id': 0})
+        }
+        members_by_id = member_features.get_many({auth['member_id'] for auth in auth_requests.values()})
+
+    except Exception as e:
+        return jsonify({'message': f'Error in batch auto-review: {str(e)}'}), 500
+
+    def generate():
+        counts = defaultdict(int)
+        # Model calls run concurrently on the shared LLM event loop, bounded
+        # by an asyncio semaphore; Mongo reads/writes stay on this thread
+        semaphore = llm_runtime.semaphore(concurrency)
+        futures = {}
+        try:
+            for auth_id in auth_ids:
+                auth_request = auth_requests.get(auth_id)
+                member = members_by_id.get(auth_request['member_id']) if auth_request else None
+
+                if not auth_request:
+                    counts['error'] += 1
+                    yield json.dumps({'auth_id': auth_id, 'ok': False, 'message': 'Authorization request not found'}) + '\n'
+                    continue
+                if not member:
+                    counts['error'] += 1
+                    yield json.dumps({'auth_id': auth_id, 'ok': False, 'message': 'Member not found'}) + '\n'
+                    continue
+
+                try:
+                    plan = prepare_agent_review(auth_request, member)
+                except Exception as e:
+                    plan = {'decision': agent_review_fallback(e)}
+
+                if 'decision' in plan:
+                    counts[plan['decision'].get('status', 'pending')] += 1
+                    yield json.dumps({'auth_id': auth_id, 'ok': True, 'decision': plan['decision']}) + '\n'
+                    continue
+
+                future = llm_router.submit(
+                    'auto_review_auth_with_agent',
+                    semaphore=semaphore,
+                    hedge=True,
+                    messages=plan['messages'],
+                    **review_request_kwargs()
+                )
+                futures[future] = (auth_id, auth_request, plan, time.monotonic())
+
+            for future in as_completed(futures):
+                auth_id, auth_request, plan, started = futures[future]
+                try:
+                    decision = complete_agent_review(auth_request, plan, future.result(), time.monotonic() - started)
+                except Exception as e:
+                    decision = agent_review_fallback(e)
+                counts[decision.get('status', 'pending')] += 1
+                yield json.dumps({'auth_id': auth_id, 'ok': True, 'decision': decision}) + '\n'
+
+            yield json.dumps({'summary': True, 'total': len(auth_ids), 'counts': dict(counts)}) + '\n'
+        finally:
+            # Client went away or we are done: cancel anything still in flight
+            for future in futures:
+                future.cancel()
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+def review_job_status(job):
+    """Status payload of a review job, with the decision (or streamed preview) it produced."""
+    fields = ['ai_decision', 'ai_reason', 'ai_notes', 'ai_reviewed_at', 'ai_decision_preview', 'ai_reason_preview']
+    if job.get('kind') == 'speculative':
+        # Draft stored on the member's pending request
+        pending_request = db.pending_requests.find_one(
+            {'request_id': job['payload'].get('request_id')}, {'_id': 0, 'ai_draft': 1}
+        ) or {}
+        auth = {field: value for field, value in (pending_request.get('ai_draft') or {}).items() if field in fields}
+    else:
+        auth = auth_repo.get(job['auth_id'], dict({'_id': 0}, **dict.fromkeys(fields, 1))) or {}
+
+    for field in ['available_at', 'enqueued_at', 'leased_at', 'lease_expires_at', 'completed_at', 'dead_at']:
+        if job.get(field):
+            job[field] = job[field].isoformat()
+    if auth.get('ai_reviewed_at'):
+        auth['ai_reviewed_at'] = auth['ai_reviewed_at'].isoformat()
+    # Fields parsed from the streamed reply before the review finished
+    preview = {
+        'status': auth.pop('ai_decision_preview', None),
+        'reason': auth.pop('ai_reason_preview', None)
+    }
+
+    return {
+        'job_id': job['job_id'],
+        'kind': job.get('kind', 'review'),
+        'auth_id': job['auth_id'],
+        'request_id': job.get('payload', {}).get('request_id'),
+        'status': job['status'],
+        'priority': job['priority'],
+        'attempts': job['attempts'],
+        'max_attempts': job['max_attempts'],
+        'available_at': job.get('available_at'),
+        'enqueued_at': job.get('enqueued_at'),
+        'completed_at': job.get('completed_at'),
+        'last_error': job.get('last_error'),
+        'decision': auth if job['status'] == 'succeeded' else None,
+        'preview': preview if job['status'] != 'succeeded' and preview['status'] else None
+    }
+
+@app.route('/ai/review-jobs/<job_id>', methods=['GET'])
+@token_required
+def get_review_job_status(current_user, job_id):
+    """
+    Get the status of a queued AI review job.
+    """
+    try:
+        job = review_queue.get(job_id)
+        if not job:
+            return jsonify({'message': 'Review job not found'}), 404
+        return jsonify(review_job_status(job)), 200
+
+    except Exception as e:
+        return jsonify({'message': f'Error fetching review job: {str(e)}'}), 500
+
+@app.route('/prior-auth/<auth_id>/review-job', methods=['GET'])
+@token_required
+def get_latest_review_job(current_user, auth_id):
+    """
+    Status of the most recent AI review job of a prior authorization request.
+    """
+    try:
+        job = review_queue.latest_for_auth(auth_id)
+        if not job:
+            return jsonify({'message': 'No review job for this request'}), 404
+        return jsonify(review_job_status(job)), 200
+
+    except Exception as e:
+        return jsonify({'message': f'Error fetching review job: {str(e)}'}), 500
+
+@app.route('/ai/review-jobs/<job_id>/requeue', methods=['POST'])
+@token_required
+def requeue_review_job(current_user, job_id):
+    """
+    Put a dead-lettered review job back on the queue (payers/admins only).
+    """
+    try:
+        if current_user['user_type'] not in ['payer', 'admin']:
+            return jsonify({'message': 'Unauthorized'}), 403
+
+        if not review_queue.requeue(job_id):
+            return jsonify({'message': 'Dead-lettered review job not found'}), 404
+
+        return jsonify({'message': 'Review job requeued', 'job_id': job_id}), 200
+
+    except Exception as e:
+        return jsonify({'message': f'Error requeueing review job: {str(e)}'}), 500
+
+@app.route('/ai/metrics/decision-cache', methods=['GET'])
+@token_required
+def get_decision_cache_metrics(current_user):
+    """
+    Decision cache hit ratio and model latency saved (payers/admins only).
+    """
+    if current_user['user_type'] not in ['payer', 'admin']:
+        return jsonify({'message': 'Unauthorized'}), 403
+
+    return jsonify({
+        'prompt_versions': [REVIEW_PROMPT_VERSION, AGENT_PROMPT_VERSION],
+        'stats': decision_cache.stats()
+    }), 200
+
+@app.route('/payer/adjudication-rules', methods=['GET'])
+@token_required
+def get_adjudication_rules(current_user):
+    """
+    List the auto-adjudication rules that apply to the payer (own + global).
+    """
+    try:
+        if current_user['user_type'] != 'payer':
+            return jsonify({'message': 'Unauthorized'}), 403
+
+        payer = db.payers.find_one({'email': current_user['email']})
+        if not payer:
+            return jsonify({'message': 'Payer not found'}), 404
+
+        rules = list(db.adjudication_rules.find(
+            {'payer_id': {'$in': [payer['payer_id'], None]}},
+            {'_id': 0}
+        ).sort('priority', 1))
+        for rule in rules:
+            if rule.get('updated_at'):
+                rule['updated_at'] = rule['updated_at'].isoformat()
+
+        return jsonify({'data': rules, 'errors': rules_engine.errors}), 200
+
+    except Exception as e:
+        return jsonify({'message': f'Error fetching rules: {str(e)}'}), 500
+
+@app.route('/payer/adjudication-rules', methods=['POST'])
+@token_required
+def save_adjudication_rule(current_user):
+    """
+    Create or replace one of the payer's auto-adjudication rules.
+
+    Expected JSON payload:
+    {
+        "rule_id": "R-PAY001-PT",
+        "priority": 50,
+        "when": {"procedure": ["Physical Therapy"], "urgency": ["routine"], "amount_max": 800},
+        "decision": "approved",
+        "reason": "Routine physical therapy under plan limit"
+    }
+    """
+    try:
+        if current_user['user_type'] != 'payer':
+            return jsonify({'message': 'Unauthorized'}), 403
+
+        payer = db.payers.find_one({'email': current_user['email']})
+        if not payer:
+            return jsonify({'message': 'Payer not found'}), 404
+
+        data = request.get_json() or {}
+        rule = {
+            'rule_id': data.get('rule_id'),
+            'payer_id': payer['payer_id'],
+            'priority': data.get('priority', 100),
+            'enabled': data.get('enabled', True),
+            'when': data.get('when', {}),
+            'decision': data.get('decision'),
+            'reason': data.get('reason', '')
+        }
+
+        try:
+            compile_rule(rule)
+        except ValueError as e:
+            return jsonify({'message': f'Invalid rule: {str(e)}'}), 400
+
+        existing = db.adjudication_rules.find_one({'rule_id': rule['rule_id']}, {'payer_id': 1})
+        if existing and existing.get('payer_id') != payer['payer_id']:
+            return jsonify({'message': 'Rule ID belongs to another payer'}), 409
+
+        rule['updated_at'] = dtt.now(timezone.utc)
+        db.adjudication_rules.replace_one({'rule_id': rule['rule_id']}, rule, upsert=True)
+
+        return jsonify({'message': 'Rule saved', 'rule_id': rule['rule_id']}), 200
+
+    except Exception as e:
+        return jsonify({'message': f'Error saving rule: {str(e)}'}), 500
+
+@app.route('/payer/adjudication-rules/<rule_id>', methods=['DELETE'])
+@token_required
+def delete_adjudication_rule(current_user, rule_id):
+    """
+    Delete one of the payer's auto-adjudication rules.
+    """
+    try:
+        if current_user['user_type'] != 'payer':
+            return jsonify({'message': 'Unauthorized'}), 403
+
+        payer = db.payers.find_one({'email': current_user['email']})
+        if not payer:
+            return jsonify({'message': 'Payer not found'}), 404
+
+        result = db.adjudication_rules.delete_one({'rule_id': rule_id, 'payer_id': payer['payer_id']})
+        if result.deleted_count == 0:
+            return jsonify({'message': 'Rule not found'}), 404
+
+        return jsonify({'message': 'Rule deleted'}), 200
+
+    except Exception as e:
+        return jsonify({'message': f'Error deleting rule: {str(e)}'}), 500
+
 @app.route('/ai/format-description', methods=['POST'])
 @token_required
+@ai_quota(estimate_format_tokens, refund_unused=True)
 def format_description(current_user):
     """
     Format medical request description using AI.
@@ -1417,30 +2771,169 @@ def format_description(current_user):
 
 @app.route('/ai/autocomplete', methods=['GET'])
 @token_required
+@ai_quota(estimate_autocomplete_tokens, refund_unused=True)
 def get_autocomplete(current_user):
     """
-    Get autocomplete suggestions using AI.
+    Get autocomplete suggestions.
+
+    Served from the local trie/n-gram engine; the model is only called
+    when the local suggestion's confidence is below AUTOCOMPLETE_MIN_CONFIDENCE.
+    Optional query param 'field' (procedure, diagnosis, additional_notes)
+    narrows the local lookup.
     """
     try:
         input_text = request.args.get('input', '')
+        field = request.args.get('field')
         
         if not input_text:
             return jsonify({'suggestion': ''}), 200
-            
-        suggestion = get_autocomplete_suggestion(input_text)
-        
+
+        started = time.perf_counter()
+        suggestion, confidence = autocomplete_engine.complete(input_text, field)
+        source = 'local'
+
+        if not suggestion or confidence < AUTOCOMPLETE_MIN_CONFIDENCE:
+            model_suggestion = get_autocomplete_suggestion(input_text)
+            if model_suggestion:
+                suggestion, source = model_suggestion, 'model'
+
         return jsonify({
-            'suggestion': suggestion
-        }, 200)
+            'suggestion': suggestion or '',
+            'source': source,
+            'confidence': confidence,
+            'latency_ms': round((time.perf_counter() - started) * 1000, 2)
+        }), 200
         
     except Exception as e:
         return jsonify({'message': f'Error getting autocomplete: {str(e)}'}), 500
 
+def load_health_buddy_context(member, user_message):
+    """
+    Gather the data the health buddy prompt is built from.
+
+    Providers and payers are the top-k candidates for the member's question
+    and conditions from the directory index, not the whole directory.
+
+    Returns:
+        (provider_data, payer_data, history, member_provider, member_payer)
+        where history is the member's history digest
+    """
+    features = member_features.get(member['member_id']) or {}
+    history = history_digest(features, recent_n=AI_HISTORY_RECENT_N)
+
+    subscription = features.get('active_subscription') or {}
+    member_payer_id = member.get('payer_id') or subscription.get('payer_id')
+
+    conditions = member.get('diseases', [])
+    provider_data = directory_index.top_providers(user_message, conditions, k=HEALTH_BUDDY_TOP_PROVIDERS)
+    payer_data = directory_index.top_payers(user_message, conditions, k=HEALTH_BUDDY_TOP_PAYERS,
+                                            current_payer_id=member_payer_id)
+
+    member_payer = db.payers.find_one(
+        {'payer_id': member_payer_id},
+        {'_id': 0, **{field: 1 for field in PAYER_FIELDS}}
+    ) if member_payer_id else None
+
+    member_provider = db.providers.find_one(
+        {'provider_id': member.get('provider_id')},
+        {'_id': 0, **{field: 1 for field in PROVIDER_FIELDS}}
+    ) if member.get('provider_id') else None
+
+    return provider_data, payer_data, history, member_provider, member_payer
+
+
+def prepare_health_buddy_turn(member, user_message, session_id=None):
+    """
+    Resolve the member's health buddy session and build this turn's messages.
+
+    An unknown or expired session_id starts a new session whose context
+    block is built around the first question; a session whose context block
+    is older than its max age gets it rebuilt. Otherwise only the question
+    is added, plus any top-k providers/payers for it that the context block
+    does not list yet.
+
+    Returns:
+        (session, user_content, messages, extras) where extras holds the
+        candidate ids this turn added
+    """
+    session = health_buddy_sessions.get(session_id, member['member_id'])
+    extras = {'provider_ids': [], 'payer_ids': []}
+    user_content = user_message
+
+    if session is None or not health_buddy_sessions.context_is_fresh(session):
+        provider_data, payer_data, history, member_provider, member_payer = load_health_buddy_context(member, user_message)
+        context = build_health_buddy_context(member, provider_data, payer_data, history,
+                                             member_provider, member_payer)
+        provider_ids = [provider.get('provider_id') for provider in provider_data]
+        payer_ids = [payer.get('payer_id') for payer in payer_data]
+        if session is None:
+            session = health_buddy_sessions.start(member['member_id'], context, count_tokens(context),
+                                                  provider_ids, payer_ids)
+        else:
+            health_buddy_sessions.replace_context(session, context, count_tokens(context), provider_ids, payer_ids)
+    else:
+        health_buddy_sessions.note_reuse()
+        conditions = member.get('diseases', [])
+        new_providers = [
+            provider for provider in directory_index.top_providers(user_message, conditions, k=HEALTH_BUDDY_TOP_PROVIDERS)
+            if provider.get('provider_id') not in session['provider_ids']
+        ]
+        new_payers = [
+            payer for payer in directory_index.top_payers(user_message, conditions, k=HEALTH_BUDDY_TOP_PAYERS)
+            if payer.get('payer_id') not in session['payer_ids']
+        ]
+        if new_providers:
+            user_content += ("\n\nAdditional providers matching this question:\n"
+                             + json.dumps(new_providers, indent=2, default=str))
+            extras['provider_ids'] = [provider.get('provider_id') for provider in new_providers]
+        if new_payers:
+            user_content += ("\n\nAdditional insurance payers matching this question:\n"
+                             + json.dumps(new_payers, indent=2, default=str))
+            extras['payer_ids'] = [payer.get('payer_id') for payer in new_payers]
+
+    messages = health_buddy_sessions.messages(session, user_content, HEALTH_BUDDY_SYSTEM_PROMPT)
+    return session, user_content, messages, extras
+
+
+def finish_health_buddy_turn(session, user_content, answer, extras):
+    """Store the exchange and, once the recent window is full, summarize older turns in the background."""
+    updated = health_buddy_sessions.record_turn(session, user_content, answer,
+                                                extras['provider_ids'], extras['payer_ids'])
+    fold = health_buddy_sessions.fold_candidates(updated) if updated else None
+    if fold:
+        through_n, turns = fold
+        threading.Thread(
+            target=fold_health_buddy_session,
+            args=(updated['_id'], updated.get('summary', ''), updated.get('summarized_through', 0), through_n, turns),
+            daemon=True
+        ).start()
+
+
+def fold_health_buddy_session(session_id, summary, previous_through, through_n, turns):
+    try:
+        new_summary = summarize_health_buddy_turns(summary, turns)
+        if new_summary:
+            health_buddy_sessions.apply_summary(session_id, previous_through, through_n, new_summary)
+    except Exception as e:
+        # The turns stay in the session; the next turn tries again
+        health_buddy_sessions.record_summary_error()
+        print(f"Error summarizing health buddy session {session_id}: {e}")
+
+
+def sse_event(event, data):
+    """Format a Server-Sent Event."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
 @app.route('/ai/health-buddy', methods=['POST'])
 @token_required
+@ai_quota(estimate_health_buddy_tokens)
 def health_buddy_chat(current_user):
     """
     AI health buddy chat for members.
+
+    Pass the returned session_id with follow-up messages to continue the
+    conversation; omit it to start a new one.
     """
     try:
         data = request.get_json()
@@ -1453,29 +2946,152 @@ def health_buddy_chat(current_user):
         member = db.members.find_one({'email': current_user['email']})
         if not member:
             return jsonify({'message': 'Member not found'}), 404
-            
-        # Get past requests
-        past_requests = list(db.prior_auths.find({'member_id': member['member_id']}))
-
-        # Get provider data
-        provider_data = db.providers.find()
-        # Get payer data
-        payer_data = db.payers.find_one()
-
-        member_payer = db.payers.find_one({'payer_id': member['payer_id']})
 
-        member_provider = db.providers.find_one({'provider_id': member['provider_id']})
+        session, user_content, messages, extras = prepare_health_buddy_turn(member, user_message, data.get('session_id'))
 
         # Get AI response
-        ai_response = get_ai_health_buddy_response(user_message, member, provider_data, payer_data, past_requests, member_provider, member_payer)
+        ai_response = get_ai_health_buddy_response(messages)
+        if ai_response is None:
+            ai_response = HEALTH_BUDDY_FALLBACK_MESSAGE
+        else:
+            finish_health_buddy_turn(session, user_content, ai_response, extras)
 
         return jsonify({
-            'response': ai_response
+            'response': ai_response,
+            'session_id': session['_id'],
+            'prompt_tokens': count_message_tokens(messages)
         }), 200
         
     except Exception as e:
         return jsonify({'message': f'Error in health buddy: {str(e)}'}), 500
 
+@app.route('/ai/health-buddy/stream', methods=['POST'])
+@token_required
+@ai_quota(estimate_health_buddy_tokens)
+def health_buddy_chat_stream(current_user):
+    """
+    AI health buddy chat streamed as Server-Sent Events.
+
+    Events:
+        session - {"session_id": "...", "prompt_tokens": ...} before the answer
+        token   - {"delta": "..."} for each chunk of the answer as it arrives
+        done    - {"ttft_ms": ..., "total_ms": ...}
+        error   - {"message": "..."}
+    """
+    request_started = time.monotonic()
+    try:
+        data = request.get_json()
+        user_message = data.get('message')
+
+        if not user_message:
+            return jsonify({'message': 'User message is required'}), 400
+
+        member = db.members.find_one({'email': current_user['email']})
+        if not member:
+            return jsonify({'message': 'Member not found'}), 404
+
+        session, user_content, messages, extras = prepare_health_buddy_turn(member, user_message, data.get('session_id'))
+
+    except Exception as e:
+        return jsonify({'message': f'Error in health buddy: {str(e)}'}), 500
+
+    def generate():
+        first_token_at = None
+        parts = []
+        yield sse_event('session', {'session_id': session['_id'], 'prompt_tokens': count_message_tokens(messages)})
+        deltas = stream_ai_health_buddy_response(messages)
+        try:
+            for delta in deltas:
+                if first_token_at is None:
+                    first_token_at = time.monotonic()
+                    health_buddy_ttft.append(first_token_at - request_started)
+                parts.append(delta)
+                yield sse_event('token', {'delta': delta})
+
+            finish_health_buddy_turn(session, user_content, ''.join(parts), extras)
+            yield sse_event('done', {
+                'ttft_ms': round((first_token_at - request_started) * 1000, 1) if first_token_at else None,
+                'total_ms': round((time.monotonic() - request_started) * 1000, 1)
+            })
+        except Exception as e:
+            print(f"Error streaming health buddy response: {e}")
+            yield sse_event('error', {'message': HEALTH_BUDDY_FALLBACK_MESSAGE})
+        finally:
+            # Runs on client disconnect too: cancels the upstream completion
+            deltas.close()
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@app.route('/ai/metrics/health-buddy', methods=['GET'])
+@token_required
+def get_health_buddy_metrics(current_user):
+    """
+    Time-to-first-token percentiles for streamed health buddy answers.
+    """
+    samples = list(health_buddy_ttft)
+
+    return jsonify({
+        'samples': len(samples),
+        'ttft_ms': percentiles(samples, points=(0.50, 0.95, 0.99))
+    }), 200
+
+@app.route('/ai/quota', methods=['GET'])
+@token_required
+def get_ai_quota(current_user):
+    """
+    Remaining AI token quota for the current user's buckets.
+    """
+    try:
+        keys = [f"email:{current_user['email']}", f"user_type:{current_user.get('user_type')}"]
+        payer_id = quota_payer_id(current_user)
+        if payer_id:
+            keys.append(f"payer:{payer_id}")
+
+        return jsonify({
+            'enabled': token_quota.enabled,
+            'buckets': token_quota.levels(keys)
+        }), 200
+
+    except Exception as e:
+        return jsonify({'message': f'Error getting AI quota: {str(e)}'}), 500
+
+@app.route('/ai/metrics', methods=['GET'])
+@token_required
+def get_ai_metrics(current_user):
+    """
+    Rolling summary of every LLM call by helper (payers/admins only).
+
+    Includes latency percentiles and histograms, token counts and estimated
+    cost, retries, timeouts and JSON parse outcomes, plus the decision and
+    format caches, health buddy time-to-first-token and sessions, member
+    features, the precedent index (size and query latency), local
+    autocomplete and quota stats, and review jobs per status.
+    """
+    if current_user['user_type'] not in ['payer', 'admin']:
+        return jsonify({'message': 'Unauthorized'}), 403
+
+    health_buddy_samples = list(health_buddy_ttft)
+    return jsonify({
+        'llm': llm_metrics.summary(),
+        'llm_backends': llm_router.status(),
+        'decision_cache': decision_cache.stats(),
+        'format_cache': format_cache.stats(),
+        'health_buddy': {
+            'samples': len(health_buddy_samples),
+            'ttft_ms': percentiles(health_buddy_samples, points=(0.50, 0.95, 0.99))
+        },
+        'health_buddy_sessions': health_buddy_sessions.stats(),
+        'member_features': member_features.stats(),
+        'precedents': precedent_index.stats(),
+        'autocomplete': autocomplete_engine.stats(),
+        'quota': token_quota.stats(),
+        'review_queue': review_queue.counts()
+    }), 200
+
 # =====================================================
 # Member-Provider Interaction Endpoints
 # =====================================================
@@ -1514,7 +3130,7 @@ def submit_pending_request(current_user):
 
         # Create pending request
         pending_request = {
-            'request_id': f"PEND{random.randint(1000, 9999)}",
+            'request_id': new_unique_id(db.pending_requests, 'request_id', 'PEND', 1000, 9999),
             'member_id': member['member_id'],
             'member_name': member['name'],
             'member_email': member['email'],
@@ -1536,9 +3152,26 @@ def submit_pending_request(current_user):
         # Insert into pending requests collection
         db.pending_requests.insert_one(pending_request)
 
+        # Draft the AI review in the background, behind every real review
+        speculative_job_id = None
+        if SPECULATIVE_REVIEW_ENABLED:
+            job = review_queue.enqueue(
+                None,
+                urgency=pending_request['urgency'],
+                kind='speculative',
+                payload={'request_id': pending_request['request_id']},
+                priority=SPECULATIVE_PRIORITY
+            )
+            speculative_job_id = job['job_id']
+            db.pending_requests.update_one(
+                {'request_id': pending_request['request_id']},
+                {'$set': {'ai_draft': {'ai_review_status': 'queued', 'ai_review_job_id': speculative_job_id}}}
+            )
+
         return jsonify({
             'message': 'Request submitted successfully',
-            'request_id': pending_request['request_id']
+            'request_id': pending_request['request_id'],
+            'review_job_id': speculative_job_id
         }), 201
 
     except Exception as e:
@@ -1603,12 +3236,13 @@ def approve_pending_request(current_user):
             
         # Create the final authorization request
         auth_request = {
-            'auth_id': f"AUTH{random.randint(1000, 9999)}",
+            'auth_id': auth_repo.new_auth_id(),
             'member_id': pending_request['member_id'],
             'procedure': pending_request['procedure'],
             'diagnosis': pending_request['diagnosis'],
             'provider': pending_request['provider_name'],
             'provider_id': pending_request['provider_id'],
+            'payer_id': pending_request.get('payer_id'),
             'urgency': pending_request['urgency'],
             'additional_notes': pending_request['additional_notes'],
             'provider_notes': provider_notes,
@@ -1619,10 +3253,32 @@ def approve_pending_request(current_user):
             'source': 'provider_approved',
             'auth_amount': auth_amount
         }
-        
-        # Insert into prior_auths collection
-        db.prior_auths.insert_one(auth_request)
-        
+
+        # Promote the speculative draft if it still describes this request,
+        # otherwise queue a normal review
+        draft = pending_request.get('ai_draft') or {}
+        job = None
+        if draft.get('ai_processed') and not speculative_draft_is_stale(pending_request, provider_notes, auth_amount):
+            auth_request.update({
+                field: value for field, value in draft.items()
+                if field not in ('ai_review_job_id', 'ai_decision_preview', 'ai_reason_preview')
+            })
+            auth_request.update({
+                'ai_review_status': 'completed',
+                'ai_speculative': True,
+                'ai_draft_job_id': draft.get('ai_review_job_id'),
+                'ai_promoted_at': dtt.now(timezone.utc)
+            })
+        else:
+            auth_request['ai_review_status'] = 'queued'
+
+        # Insert into the prior authorization store
+        auth_repo.insert(auth_request)
+
+        if not auth_request.get('ai_processed'):
+            job = review_queue.enqueue(auth_request['auth_id'], urgency=auth_request['urgency'])
+            auth_repo.update(auth_request['auth_id'], {'ai_review_job_id': job['job_id']})
+
         # Update pending request status
         db.pending_requests.update_one(
             {'request_id': request_id},
@@ -1638,7 +3294,11 @@ def approve_pending_request(current_user):
         
         return jsonify({
             'message': 'Request approved and submitted to insurance',
-            'auth_id': auth_request['auth_id']
+            'auth_id': auth_request['auth_id'],
+            'ai_decision': auth_request.get('ai_decision'),
+            'ai_speculative': auth_request.get('ai_speculative', False),
+            'review_job_id': job['job_id'] if job else None,
+            'review_status_url': f"/ai/review-jobs/{job['job_id']}" if job else None
         }), 200
         
     except Exception as e:
@@ -1769,7 +3429,7 @@ def submit_claim(current_user):
 
         # Create claim document
         new_prior_auth = {
-            "auth_id": f"C{random.randint(100000, 999999)}",
+            "auth_id": auth_repo.new_auth_id('C', 100000, 999999),
             "member_id": data["member_id"],
             "member_name": member["name"],
             "provider_id": data["provider_id"],
@@ -1781,14 +3441,16 @@ def submit_claim(current_user):
             "diagnosis": data["diagnosis"],
             "urgency": data["urgency"],
             "additional_notes": data.get("additionalNotes", ""),
+            "auth_amount": auth_amount,
+            "amount_reimbursed": auth_amount,
+            "submitted_at": dtt.now(timezone.utc),
                 "email": current_user['email'],
                 "user_type": current_user['user_type']
             }
         
 
         # Insert claim into database
-        inserted = db.prior_auth.insert_one(new_prior_auth)
-        db.commit()
+        auth_repo.insert(new_prior_auth)
 
         # Update subscription with claim
         db.insurance_subscriptions.update_one(
@@ -1808,6 +3470,7 @@ def submit_claim(current_user):
                 "$inc": {"amount_reimbursed": auth_amount}
             }
         )
+        member_features.on_subscription_changed(data["member_id"])
         db.providers.update_one(
             {"provider_id": data["provider_id"]}, 
             {"$push": {"claim_history": new_prior_auth["auth_id"]}}
@@ -1834,6 +3497,36 @@ def submit_claim(current_user):
     except Exception as e:
         return jsonify({"message": f"Error submitting claim: {str(e)}"}), 500
 
+def provider_claim_record(prior_auth):
+    """One row of a provider's claims listing (member_name already attached)."""
+    return {
+        "auth_id": prior_auth["auth_id"],
+        "member_id": prior_auth["member_id"],
+        "member_name": prior_auth["member_name"],
+        "procedure": prior_auth.get("procedure"),
+        "diagnosis": prior_auth.get("diagnosis"),
+        "urgency": prior_auth.get("urgency", "routine"),
+        "status": prior_auth.get("status", "pending"),
+        "submitted_at": prior_auth.get("submitted_at").isoformat() if prior_auth.get("submitted_at") else None,
+        "additional_notes": prior_auth.get("additional_notes", "")
+    }
+
+
+def member_claim_record(claim):
+    """One row of a member's claims listing (provider_name already attached)."""
+    return {
+        "auth_id": claim["auth_id"],
+        "provider_id": claim.get("provider_id"),
+        "provider_name": claim["provider_name"],
+        "procedure": claim.get("procedure"),
+        "diagnosis": claim.get("diagnosis"),
+        "urgency": claim.get("urgency", "routine"),
+        "status": claim.get("status", "pending"),
+        "submitted_at": claim.get("submitted_at").isoformat() if claim.get("submitted_at") else None,
+        "amount_reimbursed": claim.get("amount_reimbursed", 0)
+    }
+
+
 @app.route('/claims/provider/<provider_id>', methods=['GET'])
 @token_required
 def get_provider_claims(current_user, provider_id):
@@ -1852,25 +3545,19 @@ def get_provider_claims(current_user, provider_id):
             if not provider or provider['provider_id'] != provider_id:
                 return jsonify({"message": "Unauthorized"}), 403
 
-        # Get claims for the provider
-        priorauths = list(db.prior_auth.find({"provider_id": provider_id}))
+        if wants_ndjson():
+            # Streamed: member names looked up once per cursor batch
+            docs = auth_repo.for_provider(provider_id).batch_size(LISTING_STREAM_BATCH_SIZE)
+            return ndjson_response((
+                provider_claim_record(prior_auth)
+                for batch in batches(docs, LISTING_STREAM_BATCH_SIZE)
+                for prior_auth in attach_names(batch, members=db.members)
+            ), 'provider claims')
 
-        results = []
-        for prior_auth in priorauths:
-            # Get member details
-            member = db.members.find_one({"member_id": prior_auth["member_id"]})
-            
-            results.append({
-                "auth_id": str(prior_auth["_id"]),
-                "member_id": prior_auth["member_id"],
-                "member_name": member["name"] if member else "Unknown",
-                "procedure": prior_auth["procedure"],
-                "diagnosis": prior_auth["diagnosis"],
-                "urgency": prior_auth["urgency"],
-                "status": prior_auth.get("status", "pending"),
-                "submitted_at": prior_auth.get("submitted_at").isoformat() if prior_auth.get("submitted_at") else None,
-                "additional_notes": prior_auth.get("additional_notes", "")
-            })
+        # Get claims for the provider, with member names from one batched lookup
+        priorauths = attach_names(list(auth_repo.for_provider(provider_id)), members=db.members)
+
+        results = [provider_claim_record(prior_auth) for prior_auth in priorauths]
 
         return jsonify({"claims": results}), 200
 
@@ -1895,28 +3582,19 @@ def get_member_claims_by_id(current_user, member_id):
             if not member or member['member_id'] != member_id:
                 return jsonify({"message": "Unauthorized"}), 403
 
-        # Get claims for the member
-        claims = list(db.prior_auth.find({"member_id": member_id}))
+        if wants_ndjson():
+            # Streamed: provider names looked up once per cursor batch
+            docs = auth_repo.for_member(member_id).batch_size(LISTING_STREAM_BATCH_SIZE)
+            return ndjson_response((
+                member_claim_record(claim)
+                for batch in batches(docs, LISTING_STREAM_BATCH_SIZE)
+                for claim in attach_names(batch, providers=db.providers)
+            ), 'member claims')
 
-        results = []
-        for claim in claims:
-            # Get provider details
-            provider = db.providers.find_one({"provider_id": prior_auth["provider_id"]})
-            
-            # Ensure submitted_at is properly formatted
-            prior_auth['submitted_at'] = claim.get('submitted_at').isoformat() if claim.get('submitted_at') else None
-            
-            results.append({
-                "auth_id": str(prior_auth["_id"]),
-                "provider_id": prior_auth["provider_id"],
-                "provider_name": provider["name"] if provider else "Unknown",
-                "procedure": prior_auth["procedure"],
-                "diagnosis": prior_auth["diagnosis"],
-                "urgency": prior_auth["urgency"],
-                "status": claim.get("status", "pending"),
-                "submitted_at": claim.get("submitted_at").isoformat() if claim.get("submitted_at") else None,
-                "amount_reimbursed": claim.get("amount_reimbursed", 0)
-            })
+        # Get claims for the member, with provider names from one batched lookup
+        claims = attach_names(list(auth_repo.for_member(member_id)), providers=db.providers)
+
+        results = [member_claim_record(claim) for claim in claims]
 
         return jsonify({"claims": results}), 200
 
@@ -1942,22 +3620,19 @@ def update_claim_status(current_user, auth_id):
         if new_status not in ['approved', 'rejected', 'pending_provider_approval', 'under_review']:
             return jsonify({"message": "Invalid status"}), 400
 
-        # Update claim status
-        result = db.prior_auth.update_one(
-            {"_id": ObjectId(auth_id)},
-            {
-                "$set": {
-                    "status": new_status,
-                    "review_notes": notes,
-                    "reviewed_at": dtt.now(timezone.utc),
-                    "reviewed_by": current_user['email']
-                }
-            }
-        )
-
-        if result.modified_count == 0:
+        # Accepts the auth_id or the ObjectId string older screens pass
+        claim = auth_repo.get_by_ref(auth_id, {'auth_id': 1})
+        if not claim:
             return jsonify({"message": "Claim not found"}), 404
 
+        # Update claim status
+        auth_repo.update(claim['auth_id'], {
+            "status": new_status,
+            "review_notes": notes,
+            "reviewed_at": dtt.now(timezone.utc),
+            "reviewed_by": current_user['email']
+        })
+
         return jsonify({"message": f"Claim status updated to {new_status}"}), 200
 
     except Exception as e:
@@ -1974,9 +3649,11 @@ def populate_sample_data():
     db.members.drop()
     db.providers.drop()
     db.payers.drop()
-    db.prior_auth.drop()
+    auth_repo.drop()
+    db[LEGACY_COLLECTION].drop()
     db.insurance_subscriptions.drop()
     db.pending_requests.drop()
+    db.member_features.drop()
 
     insurance_types = ["Medicare", "Medicaid", "Private"]
     roles = ["Doctor", "Nurse", "Technician", "Lab"]
@@ -2188,7 +3865,7 @@ def populate_sample_data():
             "remarks": fake.sentence()
         }
 
-        db.prior_auth.insert_one(prior_auth_doc)
+        auth_repo.insert(prior_auth_doc)
         auth_ids.append(auth_id)
 
         # Update histories using ObjectIds
@@ -2226,15 +3903,26 @@ def populate_sample_data():
         f.write("Generated User Credentials:\n\n")
         f.write("\n".join(credentials_log))
 
+    directory_index.mark_dirty()
+    # Subscriptions were written directly above; settle every member's features once
+    member_features.rebuild_all()
     print("✅ Sample data created with ObjectId relationships.")
 
 # =====================================================
 # Application Entry Point
 # =====================================================
 
-if __name__ == '__main__':
-    # Initialize sample data on startup
+def run_server():
+    """Initialize sample data and AI storage, then start the development server."""
     populate_sample_data()
+    ensure_auth_store()
+    ensure_ai_storage()
+    autocomplete_engine.refresh(force=True)
+    precedent_index.refresh(force=True)
     
     # Start the Flask development server
     app.run(debug=True, port=5000)
+
+
+if __name__ == '__main__':
+    run_server()
@@ -0,0 +1,316 @@
+"""
+Prior Authorization Repository
+==============================
+
+Every read and write of prior authorization documents goes through
+PriorAuthRepository, backed by the one canonical collection (prior_auths).
+
+Older deployments also wrote to a second collection (prior_auth: claims,
+payer decisions, sample data). merge_collections() folds such a collection
+into the canonical one, deduplicating by auth_id. Distinct requests that
+share an auth_id (the random ids collided), in either collection, are
+re-keyed rather than merged, so the unique index can be built without
+losing a request.
+
+Indexes follow the listings that read the collection:
+- auth_id (unique): single-request lookups and updates
+- member_id / provider_id / payer_id + submitted_at: per-party listings,
+  newest first
+- status + submitted_at: payer queues
+- submitted_at: the all-requests listing
+- reviewed_at (sparse): polling for newly decided requests
+- member_id + payer_id + amount_reimbursed: per-payer claim totals of a
+  member, covered
+
+The listing indexes end in _id so the (submitted_at, _id) order used by
+NEWEST_FIRST and the keyset pages (pagination.py) is read straight from
+the index, without an in-memory sort.
+
+Listeners (e.g. the member feature profiles) registered on the repository
+are told about every insert and update, with the document as it was
+before the update.
+
+Usage:
+    python auth_repository.py merge [--source prior_auth] [--dry-run] [--drop-source]
+"""
+
+import argparse
+import os
+import random
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo import MongoClient, ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from db_indexes import NEWEST_FIRST, apply_indexes, index
+
+
+CANONICAL_COLLECTION = 'prior_auths'
+LEGACY_COLLECTION = 'prior_auth'
+
+
+class PriorAuthRepository:
+    """
+    Prior authorization documents, keyed by auth_id.
+
+    Args:
+        collection: the canonical pymongo collection
+        listeners: objects with on_auth_inserted(doc) / on_auth_updated(before, fields)
+    """
+
+    def __init__(self, collection, listeners=()):
+        self.collection = collection
+        self.listeners = list(listeners)
+
+    def add_listener(self, listener):
+        self.listeners.append(listener)
+
+    def index_specs(self):
+        return [
+            index('auth_id', unique=True),
+            index('member_id', *NEWEST_FIRST),
+            index('provider_id', *NEWEST_FIRST),
+            index('payer_id', 'status', *NEWEST_FIRST),
+            index('status', *NEWEST_FIRST),
+            index(*NEWEST_FIRST),
+            index('reviewed_at', sparse=True),
+            index('member_id', 'payer_id', 'amount_reimbursed')
+        ]
+
+    def ensure_indexes(self):
+        return apply_indexes(self.collection, self.index_specs())
+
+    def new_auth_id(self, prefix='AUTH', low=1000, high=9999, attempts=20):
+        """Random auth_id in the existing PREFIX#### style that is not taken yet."""
+        for _ in range(attempts):
+            auth_id = f"{prefix}{random.randint(low, high)}"
+            if not self.collection.count_documents({'auth_id': auth_id}, limit=1):
+                return auth_id
+        raise RuntimeError(f"Could not allocate a free {prefix} auth_id")
+
+    def insert(self, doc):
+        """Insert a new request; doc must carry a unique auth_id."""
+        if not doc.get('auth_id'):
+            raise ValueError('auth_id is required')
+        result = self.collection.insert_one(doc)
+        self._notify('on_auth_inserted', doc)
+        return result
+
+    def get(self, auth_id, projection=None):
+        return self.collection.find_one({'auth_id': auth_id}, projection)
+
+    def get_by_ref(self, ref, projection=None):
+        """Look up by auth_id, or by the ObjectId string some older screens still pass."""
+        doc = self.get(ref, projection)
+        if doc is None:
+            try:
+                doc = self.collection.find_one({'_id': ObjectId(ref)}, projection)
+            except (InvalidId, TypeError):
+                doc = None
+        return doc
+
+    def update(self, auth_id, fields):
+        """
+        $set fields on one request.
+
+        Returns:
+            The document as it was before the update, or None if not found
+        """
+        before = self.collection.find_one_and_update(
+            {'auth_id': auth_id}, {'$set': fields}, return_document=ReturnDocument.BEFORE
+        )
+        if before is not None:
+            self._notify('on_auth_updated', before, fields)
+        return before
+
+    def _notify(self, event, *args):
+        for listener in self.listeners:
+            try:
+                getattr(listener, event)(*args)
+            except Exception as e:
+                # Derived data must never fail the write itself
+                print(f"Prior auth listener {type(listener).__name__}.{event} failed: {e}")
+
+    def find(self, query=None, projection=None, sort=None, limit=0):
+        """Query the collection, newest first by default."""
+        cursor = self.collection.find(query or {}, projection).sort(sort or NEWEST_FIRST)
+        return cursor.limit(limit) if limit else cursor
+
+    def for_member(self, member_id, projection=None, exclude_auth_id=None, limit=0):
+        query = {'member_id': member_id}
+        if exclude_auth_id:
+            query['auth_id'] = {'$ne': exclude_auth_id}
+        return self.find(query, projection, limit=limit)
+
+    def for_members(self, member_ids, projection=None):
+        return self.find({'member_id': {'$in': list(member_ids)}}, projection)
+
+    def for_provider(self, provider_id, projection=None, limit=0):
+        return self.find({'provider_id': provider_id}, projection, limit=limit)
+
+    def by_ids(self, auth_ids, projection=None):
+        return self.find({'auth_id': {'$in': list(auth_ids)}}, projection)
+
+    def drop(self):
+        self.collection.drop()
+
+
+def attach_names(auths, members=None, providers=None, unknown='Unknown'):
+    """
+    Set member_name / provider_name on a list of auth documents.
+
+    One $in query per directory collection plus an in-request dict, instead
+    of a find_one per document. Pass only the collections whose names are
+    needed.
+
+    Returns:
+        The same list, for chaining
+    """
+    for collection, id_field, name_field in ((members, 'member_id', 'member_name'),
+                                              (providers, 'provider_id', 'provider_name')):
+        if collection is None:
+            continue
+        ids = {auth.get(id_field) for auth in auths if auth.get(id_field)}
+        names = {
+            doc[id_field]: doc.get('name')
+            for doc in collection.find({id_field: {'$in': list(ids)}}, {'_id': 0, id_field: 1, 'name': 1})
+        } if ids else {}
+        for auth in auths:
+            auth[name_field] = names.get(auth.get(id_field)) or unknown
+    return auths
+
+
+def _merge_into(target, keep, other):
+    """Fill fields missing on keep from other; returns the $set applied."""
+    missing = {field: value for field, value in other.items() if field != '_id' and field not in keep}
+    if missing:
+        target.update_one({'_id': keep['_id']}, {'$set': missing})
+    return missing
+
+
+# Fields that identify a request; documents sharing an auth_id but not these are different requests
+IDENTITY_FIELDS = ('member_id', 'provider_id', 'procedure', 'diagnosis')
+
+
+def _same_request(a, b):
+    """True when two documents with the same auth_id describe the same request (e.g. a dual write)."""
+    return all(a.get(field) == b.get(field) for field in IDENTITY_FIELDS
+               if a.get(field) is not None and b.get(field) is not None)
+
+
+def _rekey(target, doc, stats, dry_run):
+    """Give doc a fresh auth_id, keeping the colliding one as previous_auth_id."""
+    new_id = PriorAuthRepository(target).new_auth_id() if not dry_run else None
+    stats['rekeyed'].append({'_id': str(doc['_id']), 'auth_id': doc['auth_id'], 'new_auth_id': new_id})
+    return new_id
+
+
+def _insert(target, doc, stats):
+    """
+    Insert a source document. An _id already taken gets a new _id; an
+    auth_id taken meanwhile gets a new auth_id. Anything else is reported.
+    """
+    for _ in range(3):
+        try:
+            target.insert_one(doc)
+            return True
+        except DuplicateKeyError:
+            if target.count_documents({'_id': doc['_id']}, limit=1):
+                doc = {field: value for field, value in doc.items() if field != '_id'}
+            elif target.count_documents({'auth_id': doc['auth_id']}, limit=1):
+                new_id = PriorAuthRepository(target).new_auth_id()
+                stats['rekeyed'].append({'_id': str(doc.get('_id')), 'auth_id': doc['auth_id'],
+                                         'new_auth_id': new_id})
+                doc = dict(doc, auth_id=new_id, previous_auth_id=doc['auth_id'])
+            else:
+                break
+    stats['failed'].append(doc.get('auth_id'))
+    return False
+
+
+def merge_collections(source, target, dry_run=False, drop_source=False):
+    """
+    Merge source into target, deduplicating by auth_id.
+
+    Documents without an auth_id (payer decisions on pending requests) get
+    their request_id, or their ObjectId string, as auth_id. When an auth_id
+    exists on both sides and both documents describe the same request
+    (IDENTITY_FIELDS), the target document is kept and only fields it is
+    missing are copied over, so AI review results are never overwritten.
+
+    auth_ids were drawn at random (AUTH1000-AUTH9999), so documents that
+    share one but differ in IDENTITY_FIELDS are distinct requests whose ids
+    collided. They are never merged or deleted: the later one (by _id) gets
+    a fresh auth_id and keeps the old one as previous_auth_id, and each
+    such re-key is listed in the result.
+
+    Returns:
+        Counts of what was (or, with dry_run, would be) done, plus the
+        re-keyed documents and any that could not be inserted
+    """
+    stats = {'scanned': 0, 'inserted': 0, 'merged': 0, 'target_rekeyed': 0, 'rekeyed': [], 'failed': []}
+
+    # auth_ids already shared inside the target: the oldest document keeps the id
+    duplicates = target.aggregate([
+        {'$match': {'auth_id': {'$exists': True}}},
+        {'$group': {'_id': '$auth_id', 'ids': {'$push': '$_id'}, 'count': {'$sum': 1}}},
+        {'$match': {'count': {'$gt': 1}}}
+    ])
+    for group in duplicates:
+        for _id in sorted(group['ids'])[1:]:
+            doc = {'_id': _id, 'auth_id': group['_id']}
+            new_id = _rekey(target, doc, stats, dry_run)
+            if not dry_run:
+                target.update_one({'_id': _id}, {'$set': {'auth_id': new_id, 'previous_auth_id': group['_id']}})
+            stats['target_rekeyed'] += 1
+
+    if source is not None:
+        for doc in source.find():
+            stats['scanned'] += 1
+            doc.setdefault('auth_id', doc.get('request_id') or str(doc['_id']))
+            existing = target.find_one({'auth_id': doc['auth_id']})
+            if existing is not None and _same_request(existing, doc):
+                if not dry_run:
+                    _merge_into(target, existing, doc)
+                stats['merged'] += 1
+                continue
+
+            if existing is not None:
+                # A different request that drew the same random id
+                new_id = _rekey(target, doc, stats, dry_run)
+                doc.update({'auth_id': new_id, 'previous_auth_id': doc['auth_id']})
+            # Keep the _id so ObjectId-based references still resolve
+            if dry_run or _insert(target, doc, stats):
+                stats['inserted'] += 1
+
+        if drop_source and not dry_run and not stats['failed']:
+            source.drop()
+
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Prior authorization store maintenance')
+    subcommands = parser.add_subparsers(dest='command', required=True)
+
+    merge = subcommands.add_parser('merge', help=f'merge a legacy collection into {CANONICAL_COLLECTION}')
+    merge.add_argument('--mongo-uri', default=os.getenv('MONGO_URI', 'mongodb://localhost:27017/prior_authdb'))
+    merge.add_argument('--source', default=LEGACY_COLLECTION)
+    merge.add_argument('--target', default=CANONICAL_COLLECTION)
+    merge.add_argument('--dry-run', action='store_true', help='report counts without writing')
+    merge.add_argument('--drop-source', action='store_true', help='drop the source collection afterwards')
+
+    args = parser.parse_args()
+    db = MongoClient(args.mongo_uri).get_default_database()
+    source = db[args.source] if args.source in db.list_collection_names() else None
+
+    stats = merge_collections(source, db[args.target], dry_run=args.dry_run, drop_source=args.drop_source)
+    print(f"{'Would merge' if args.dry_run else 'Merged'} {args.source} -> {args.target}: {stats}")
+    if not args.dry_run:
+        PriorAuthRepository(db[args.target]).ensure_indexes()
+        print('Indexes ensured')
+
+
+if __name__ == '__main__':
+    main()
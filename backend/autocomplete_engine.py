@@ -0,0 +1,321 @@
+"""
+Local Autocomplete Engine
+=========================
+
+Keystroke autocomplete served from historical request text instead of the
+LLM. Two models are built from past prior authorizations:
+
+- A prefix trie over whole procedure and diagnosis values. Every node
+  keeps the IDs of its top-k most frequent phrases, so a lookup is one
+  walk down the trie.
+- A word n-gram model (unigram/bigram/trigram counts) over procedure,
+  diagnosis and additional_notes that completes the current word and
+  predicts the next few words mid-sentence.
+
+The text is other members' health information, so nothing is suggested
+until it has been seen for at least min_support distinct members: a
+phrase or n-gram is counted only once enough members have used it.
+Free-text notes never go into the phrase trie, so a note is never echoed
+back whole.
+
+Both return a confidence; callers fall back to the model when it is low.
+The engine is rebuilt incrementally by ingesting documents with an _id
+greater than the last one seen in each source collection.
+"""
+
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+
+
+FIELDS = ('procedure', 'diagnosis', 'additional_notes')
+PHRASE_FIELDS = ('procedure', 'diagnosis')
+TOP_K = 3
+MIN_SUPPORT = 5
+MAX_PHRASE_CHARS = 120
+
+_WORD = re.compile(r"[a-z0-9][a-z0-9'\-]*")
+
+
+def _normalize(text):
+    return ' '.join(str(text or '').lower().split())
+
+
+def _display(text):
+    return ' '.join(str(text or '').split())
+
+
+class _Support:
+    """
+    Holds back occurrences of a key until min_support distinct members have
+    used it; only the member sets of keys still below the threshold are kept.
+    """
+
+    def __init__(self, min_support=MIN_SUPPORT):
+        self.min_support = min_support
+        self.pending = {}
+        self.supported = set()
+
+    def observe(self, key, member):
+        """
+        Returns:
+            Occurrences to publish now: 0 while the key lacks support, all the
+            held-back occurrences when it reaches it, then 1 per occurrence
+        """
+        if key in self.supported:
+            return 1
+        entry = self.pending.setdefault(key, [set(), 0])
+        entry[0].add(member)
+        entry[1] += 1
+        if len(entry[0]) < self.min_support:
+            return 0
+        del self.pending[key]
+        self.supported.add(key)
+        return entry[1]
+
+
+class _TrieNode:
+    __slots__ = ('children', 'top', 'total')
+
+    def __init__(self):
+        self.children = {}
+        self.top = []
+        self.total = 0
+
+
+class PhraseTrie:
+    """Character trie over whole phrases with per-node top-k phrase IDs."""
+
+    def __init__(self, top_k=TOP_K, min_support=MIN_SUPPORT):
+        self.top_k = top_k
+        self.root = _TrieNode()
+        self.phrase_ids = {}
+        self.phrases = []
+        self.counts = []
+        self.support = _Support(min_support)
+
+    def add(self, text, member=None):
+        key = _normalize(text)[:MAX_PHRASE_CHARS]
+        if not key:
+            return
+        pid = self.phrase_ids.get(key)
+        if pid is None:
+            pid = len(self.phrases)
+            self.phrase_ids[key] = pid
+            self.phrases.append(_display(text)[:MAX_PHRASE_CHARS])
+            self.counts.append(0)
+        # Unsupported occurrences still count towards node totals (lower confidence)
+        published = self.support.observe(pid, member)
+        self.counts[pid] += published
+
+        node = self.root
+        self._update(node, pid, published)
+        for char in key:
+            child = node.children.get(char)
+            if child is None:
+                child = node.children[char] = _TrieNode()
+            node = child
+            self._update(node, pid, published)
+
+    def _update(self, node, pid, published):
+        node.total += 1
+        if not published:
+            return
+        counts = self.counts
+        if pid not in node.top:
+            if len(node.top) < self.top_k:
+                node.top.append(pid)
+            elif counts[pid] > counts[node.top[-1]]:
+                node.top[-1] = pid
+            else:
+                return
+        node.top.sort(key=lambda p: counts[p], reverse=True)
+
+    def complete(self, prefix):
+        """
+        Returns:
+            (phrase, confidence) for the most frequent phrase starting with prefix, or (None, 0.0)
+        """
+        key = _normalize(prefix)
+        if not key:
+            return None, 0.0
+        node = self.root
+        for char in key:
+            node = node.children.get(char)
+            if node is None:
+                return None, 0.0
+        for pid in node.top:
+            if len(self.phrases[pid]) > len(key):
+                # Support-weighted share of the subtree this phrase accounts for
+                confidence = self.counts[pid] / (node.total + 1)
+                return self.phrases[pid], confidence
+        return None, 0.0
+
+
+class NGramModel:
+    """Word-level unigram/bigram/trigram counts for mid-sentence completion."""
+
+    def __init__(self, min_support=MIN_SUPPORT):
+        self.unigrams = Counter()
+        self.bigrams = defaultdict(Counter)
+        self.trigrams = defaultdict(Counter)
+        self.support = _Support(min_support)
+
+    def add(self, text, member=None):
+        words = _WORD.findall(_normalize(text))
+        observe = self.support.observe
+        for index, word in enumerate(words):
+            published = observe((word,), member)
+            if published:
+                self.unigrams[word] += published
+            if index >= 1:
+                published = observe((words[index - 1], word), member)
+                if published:
+                    self.bigrams[words[index - 1]][word] += published
+            if index >= 2:
+                published = observe((words[index - 2], words[index - 1], word), member)
+                if published:
+                    self.trigrams[(words[index - 2], words[index - 1])][word] += published
+
+    def _candidates(self, context):
+        if len(context) >= 2 and (context[-2], context[-1]) in self.trigrams:
+            return self.trigrams[(context[-2], context[-1])]
+        if context and context[-1] in self.bigrams:
+            return self.bigrams[context[-1]]
+        return self.unigrams
+
+    def _best(self, counts, partial):
+        matches = [(count, word) for word, count in counts.items() if word.startswith(partial) and word != partial]
+        if not matches:
+            return None, 0.0
+        total = sum(count for count, _ in matches)
+        count, word = max(matches)
+        return word, count / (total + 1)
+
+    def complete(self, text, max_extra_words=2, extend_confidence=0.5):
+        """
+        Returns:
+            (completion_suffix, confidence) to append to text, or (None, 0.0)
+        """
+        normalized = _normalize(text)
+        words = _WORD.findall(normalized)
+        if not words:
+            return None, 0.0
+
+        ends_word = str(text)[-1:].isspace()
+        partial = '' if ends_word else words[-1]
+        context = words if ends_word else words[:-1]
+
+        word, confidence = self._best(self._candidates(context), partial)
+        if word is None and partial and context:
+            word, confidence = self._best(self.unigrams, partial)
+        if word is None:
+            return None, 0.0
+
+        suffix = word[len(partial):]
+        context = context + [word]
+        for _ in range(max_extra_words):
+            next_word, next_confidence = self._best(self._candidates(context), '')
+            if next_word is None or next_confidence < extend_confidence:
+                break
+            suffix += ' ' + next_word
+            context.append(next_word)
+        return suffix, confidence
+
+
+class AutocompleteEngine:
+    """
+    Local autocomplete over historical request text.
+
+    Args:
+        db: pymongo database
+        collections: source collection names
+        refresh_interval: seconds between incremental ingests
+        min_support: distinct members a phrase / n-gram needs before it is suggested
+    """
+
+    def __init__(self, db, collections=('prior_auths',), refresh_interval=60.0, min_support=MIN_SUPPORT):
+        self.db = db
+        self.collections = collections
+        self.refresh_interval = refresh_interval
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._last_ids = {}
+        self._refreshed_at = 0.0
+        self.tries = {field: PhraseTrie(min_support=min_support) for field in PHRASE_FIELDS}
+        self.ngrams = NGramModel(min_support=min_support)
+        self.documents = 0
+
+    def add_document(self, doc):
+        """Ingest the text fields of one request document."""
+        member = doc.get('member_id')
+        with self._lock:
+            for field in FIELDS:
+                value = doc.get(field)
+                if value:
+                    if field in self.tries:
+                        self.tries[field].add(value, member)
+                    self.ngrams.add(value, member)
+            self.documents += 1
+
+    def refresh(self, force=False):
+        """Ingest documents added since the last refresh."""
+        now = time.monotonic()
+        if not force and now - self._refreshed_at < self.refresh_interval:
+            return 0
+        # One ingest at a time; concurrent callers keep serving the current model
+        if not self._refresh_lock.acquire(blocking=False):
+            return 0
+        try:
+            self._refreshed_at = now
+            ingested = 0
+            projection = {field: 1 for field in (*FIELDS, 'member_id')}
+            for name in self.collections:
+                query = {'_id': {'$gt': self._last_ids[name]}} if name in self._last_ids else {}
+                for doc in self.db[name].find(query, projection).sort('_id', 1):
+                    self.add_document(doc)
+                    self._last_ids[name] = doc['_id']
+                    ingested += 1
+            return ingested
+        finally:
+            self._refresh_lock.release()
+
+    def complete(self, text, field=None):
+        """
+        Suggest a completion for text.
+
+        Returns:
+            (full_suggestion, confidence); full_suggestion is None when nothing matched
+        """
+        self.refresh()
+        text = str(text or '')
+        # Notes have no phrase trie; they complete from the n-gram model only
+        if field in FIELDS:
+            fields = [field] if field in self.tries else []
+        else:
+            fields = list(self.tries)
+
+        best, best_confidence = None, 0.0
+        with self._lock:
+            for name in fields:
+                phrase, confidence = self.tries[name].complete(text)
+                if phrase and confidence > best_confidence:
+                    # Keep what the user typed, append the rest of the phrase
+                    rest = phrase[len(_normalize(text)):]
+                    if text[-1:].isspace():
+                        rest = rest.lstrip()
+                    best, best_confidence = text + rest, confidence
+
+            suffix, confidence = self.ngrams.complete(text)
+            if suffix and confidence > best_confidence:
+                best, best_confidence = text + suffix, confidence
+
+        return best, round(best_confidence, 4)
+
+    def stats(self):
+        return {
+            'documents': self.documents,
+            'phrases': {field: len(trie.phrases) for field, trie in self.tries.items()},
+            'vocabulary': len(self.ngrams.unigrams)
+        }
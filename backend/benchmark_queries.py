@@ -0,0 +1,168 @@
+"""
+Query Count Benchmark
+=====================
+
+Counts the MongoDB commands each claims listing issues per request, using
+a pymongo CommandListener, so N+1 lookups show up as a query count that
+grows with the number of claims.
+
+The listener is registered before app is imported so the app's client
+reports to it. Requests go through the Flask test client with a token
+minted for the provider / member, exactly as the portals call them.
+
+Usage:
+    python benchmark_queries.py [--synthetic 2000] [--repeat 5] [--max-queries 4]
+
+--synthetic adds that many claims for a scratch provider and member (and
+removes them afterwards) to show the count stays flat as the list grows.
+"""
+
+import argparse
+import time
+from collections import Counter
+from datetime import datetime as dtt, timedelta, timezone
+
+import jwt
+from pymongo import monitoring
+
+
+# Driver housekeeping, not queries issued by the route
+IGNORED_COMMANDS = {'hello', 'ismaster', 'isMaster', 'ping', 'endSessions', 'saslStart', 'saslContinue', 'buildInfo'}
+
+
+class CommandCounter(monitoring.CommandListener):
+    """Counts started commands by name while recording is on."""
+
+    def __init__(self):
+        self.counts = Counter()
+        self.recording = False
+
+    def started(self, event):
+        if self.recording and event.command_name not in IGNORED_COMMANDS:
+            self.counts[event.command_name] += 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+counter = CommandCounter()
+monitoring.register(counter)
+
+import app as server  # noqa: E402  (after registering the listener)
+
+
+SCRATCH_PROVIDER = 'PBENCH'
+SCRATCH_MEMBER = 'MBENCH'
+
+
+def mint_token(email, user_type, name='Benchmark'):
+    return jwt.encode({
+        'email': email,
+        'user_type': user_type,
+        'name': name,
+        'exp': dtt.now(timezone.utc) + timedelta(hours=1)
+    }, server.app.config['SECRET_KEY'], algorithm='HS256')
+
+
+def seed_synthetic(count):
+    """Scratch provider/member with count claims (written directly, bypassing repository listeners)."""
+    db = server.db
+    db.providers.insert_one({'provider_id': SCRATCH_PROVIDER, 'name': 'Benchmark Provider',
+                             'email': 'bench-provider@example.invalid'})
+    db.members.insert_one({'member_id': SCRATCH_MEMBER, 'name': 'Benchmark Member',
+                           'email': 'bench-member@example.invalid'})
+    now = dtt.now(timezone.utc)
+    server.auth_repo.collection.insert_many([
+        {
+            'auth_id': f"BENCH{index:06}",
+            'member_id': SCRATCH_MEMBER,
+            'provider_id': SCRATCH_PROVIDER,
+            'procedure': 'MRI Scan',
+            'diagnosis': 'Benchmark',
+            'status': 'pending',
+            'submitted_at': now - timedelta(minutes=index)
+        }
+        for index in range(count)
+    ])
+
+
+def drop_synthetic():
+    db = server.db
+    server.auth_repo.collection.delete_many({'auth_id': {'$regex': '^BENCH'}})
+    db.providers.delete_one({'provider_id': SCRATCH_PROVIDER})
+    db.members.delete_one({'member_id': SCRATCH_MEMBER})
+
+
+def busiest(field):
+    """The id with the most claims, and its claim count."""
+    top = list(server.auth_repo.collection.aggregate([
+        {'$group': {'_id': f"${field}", 'claims': {'$sum': 1}}},
+        {'$sort': {'claims': -1}},
+        {'$limit': 1}
+    ]))
+    return (top[0]['_id'], top[0]['claims']) if top else (None, 0)
+
+
+def measure(client, label, path, token, repeat):
+    """Issue the request repeat times; returns the queries (excluding getMore) per request."""
+    headers = {'Authorization': f"Bearer {token}"}
+    counter.counts.clear()
+    counter.recording = True
+    started = time.perf_counter()
+    try:
+        for _ in range(repeat):
+            response = client.get(path, headers=headers)
+            if response.status_code != 200:
+                raise SystemExit(f"{label}: HTTP {response.status_code} {response.get_json()}")
+    finally:
+        counter.recording = False
+    elapsed_ms = (time.perf_counter() - started) * 1000 / repeat
+    claims = len(response.get_json().get('claims', []))
+    # getMore only pages through a cursor already opened; it does not grow per claim
+    per_request = sum(count for name, count in counter.counts.items() if name != 'getMore') / repeat
+    breakdown = {name: count / repeat for name, count in counter.counts.items()}
+    print(f"{label}: {claims} claims, {per_request:.1f} queries/request {breakdown}, {elapsed_ms:.1f} ms")
+    return per_request
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Count MongoDB queries per claims listing request')
+    parser.add_argument('--synthetic', type=int, default=0, help='claims to add for a scratch provider/member')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--max-queries', type=float, default=4,
+                        help='fail if any listing needs more queries per request than this')
+    args = parser.parse_args()
+
+    if args.synthetic:
+        seed_synthetic(args.synthetic)
+    try:
+        db = server.db
+        client = server.app.test_client()
+        results = []
+
+        provider_id, _ = (SCRATCH_PROVIDER, args.synthetic) if args.synthetic else busiest('provider_id')
+        provider = db.providers.find_one({'provider_id': provider_id}, {'email': 1, 'name': 1})
+        if provider:
+            results.append(measure(client, f"GET /claims/provider/{provider_id}", f"/claims/provider/{provider_id}",
+                                   mint_token(provider['email'], 'provider'), args.repeat))
+
+        member_id, _ = (SCRATCH_MEMBER, args.synthetic) if args.synthetic else busiest('member_id')
+        member = db.members.find_one({'member_id': member_id}, {'email': 1, 'name': 1})
+        if member:
+            results.append(measure(client, f"GET /claims/member/{member_id}", f"/claims/member/{member_id}",
+                                   mint_token(member['email'], 'member'), args.repeat))
+
+        if not results:
+            raise SystemExit('No claims to benchmark; run the app once to load sample data or pass --synthetic')
+        if max(results) > args.max_queries:
+            raise SystemExit(f"Query budget exceeded: {max(results):.1f} > {args.max_queries} per request")
+    finally:
+        if args.synthetic:
+            drop_synthetic()
+
+
+if __name__ == '__main__':
+    main()
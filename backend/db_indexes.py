@@ -0,0 +1,312 @@
+"""
+Database Index Manifest
+=======================
+
+Every index the application relies on, declared in one place and applied
+idempotently (at startup, or from the command line):
+
+- CORE_INDEXES covers the user, directory, subscription and pending
+  request collections queried by the routes in app.py
+- components with their own collection (review queue, caches, sessions,
+  prior authorization repository, ...) declare theirs in index_specs()
+
+app.index_manifest() merges the two. apply_manifest() compares each
+declared index with what already exists (by key pattern): matching
+indexes are left alone, a changed TTL is updated in place with collMod,
+other option changes drop and recreate the index. A unique index that
+cannot be built because of existing duplicates is reported, not fatal.
+
+report() shows how indexes are used ($indexStats) and explains the query
+shape of each hot route lookup (ROUTE_QUERIES), flagging any that would
+run as a collection scan (COLLSCAN) or need an in-memory sort.
+
+Usage:
+    python db_indexes.py apply [--dry-run]
+    python db_indexes.py report
+"""
+
+import argparse
+
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import OperationFailure
+
+
+# Index options compared when deciding whether an existing index matches
+MANAGED_OPTIONS = ('unique', 'sparse', 'expireAfterSeconds', 'partialFilterExpression')
+
+
+def index(*keys, **options):
+    """
+    One manifest entry.
+
+        index('email', unique=True)
+        index(('member_id', ASCENDING), ('submitted_at', DESCENDING))
+    """
+    return {
+        'keys': [(key, ASCENDING) if isinstance(key, str) else tuple(key) for key in keys],
+        'options': options
+    }
+
+
+def index_name(keys):
+    """The name MongoDB gives an index by default, e.g. member_id_1_submitted_at_-1."""
+    return '_'.join(f"{field}_{direction}" for field, direction in keys)
+
+
+# Listing order of the prior authorization and pending request pages
+NEWEST_FIRST = [('submitted_at', DESCENDING), ('_id', DESCENDING)]
+
+
+CORE_INDEXES = {
+    'members': [
+        index('email', unique=True),          # login, token_required consumers
+        index('member_id', unique=True)
+    ],
+    'providers': [
+        index('email', unique=True),
+        index('provider_id', unique=True)
+    ],
+    'payers': [
+        index('email', unique=True),
+        index('payer_id', unique=True),
+        index('member_ids')                   # payers a member is listed under
+    ],
+    'insurance_subscriptions': [
+        index('subscription_id', unique=True),
+        index('member_id', 'payer_id', 'status'),  # subscribe_to_insurance duplicate check
+        index(('member_id', ASCENDING), ('status', ASCENDING), ('subscription_date', DESCENDING)),
+        # GET /member/insurance-subscriptions pages
+        index('member_id', ('subscription_date', DESCENDING), ('_id', DESCENDING))
+    ],
+    'pending_requests': [
+        index('request_id', unique=True),
+        index('provider_id', 'status'),       # get_provider_pending_requests
+        index('member_id', *NEWEST_FIRST),
+        index(*NEWEST_FIRST)                  # GET /pending-requests pages
+    ]
+}
+
+
+# Representative lookups of the hot routes: (route, collection, filter, sort)
+ROUTE_QUERIES = [
+    ('login / token_required (member)', 'members', {'email': 'x'}, None),
+    ('login / token_required (provider)', 'providers', {'email': 'x'}, None),
+    ('login / token_required (payer)', 'payers', {'email': 'x'}, None),
+    ('GET /member/profile/<member_id>', 'members', {'member_id': 'x'}, None),
+    ('POST /claims (provider)', 'providers', {'provider_id': 'x'}, None),
+    ('POST /member/subscribe-insurance (payer)', 'payers', {'payer_id': 'x'}, None),
+    ('POST /member/subscribe-insurance', 'insurance_subscriptions',
+     {'member_id': 'x', 'payer_id': 'x', 'status': 'active'}, None),
+    ('POST /claims', 'insurance_subscriptions',
+     {'subscription_id': 'x', 'member_id': 'x', 'status': 'active'}, None),
+    ('GET /member/insurance-subscriptions', 'insurance_subscriptions', {'member_id': 'x'},
+     [('subscription_date', DESCENDING), ('_id', DESCENDING)]),
+    ('review rules context', 'insurance_subscriptions', {'member_id': 'x', 'status': 'active'},
+     [('subscription_date', DESCENDING)]),
+    ('GET /provider/pending_requests', 'pending_requests',
+     {'provider_id': 'x', 'status': 'pending_provider_approval'}, None),
+    ('POST /provider/approve-pending-request', 'pending_requests', {'request_id': 'x', 'provider_id': 'x'}, None),
+    ('GET /member/pending-requests', 'pending_requests', {'member_id': 'x'}, None),
+    ('GET /pending-requests', 'pending_requests', {}, NEWEST_FIRST),
+    ('PUT /claims/<auth_id>/status', 'prior_auths', {'auth_id': 'x'}, None),
+    ('GET /member/claims', 'prior_auths', {'member_id': 'x'}, NEWEST_FIRST),
+    ('GET /claims/provider/<provider_id>', 'prior_auths', {'provider_id': 'x'}, NEWEST_FIRST),
+    ('payer queue', 'prior_auths', {'payer_id': 'x', 'status': 'pending'}, NEWEST_FIRST),
+    ('GET /prior-auths', 'prior_auths', {}, NEWEST_FIRST),
+    ('GET /prior-auth?status=', 'prior_auths', {'status': 'x'}, NEWEST_FIRST),
+    ('GET /member/insurance-plans', 'prior_auths', {'member_id': 'x'}, None),
+    ('GET /member/insurance-plans (linked payers)', 'payers', {'member_ids': 'x'}, None),
+    ('GET /ai/review-jobs/<job_id>', 'review_jobs', {'job_id': 'x'}, None),
+    ('GET /prior-auth/<auth_id>/review-job', 'review_jobs', {'auth_id': 'x'}, [('enqueued_at', DESCENDING)])
+]
+
+
+def _normalized_keys(keys):
+    return [(field, int(direction) if isinstance(direction, (int, float)) else direction)
+            for field, direction in keys]
+
+
+def _managed(options):
+    return {name: options[name] for name in MANAGED_OPTIONS if name in options}
+
+
+def apply_indexes(collection, specs, dry_run=False):
+    """
+    Make a collection's indexes match specs.
+
+    Returns:
+        [{'collection', 'index', 'action', ...}] with action one of
+        unchanged / created / ttl_updated / recreated / failed
+    """
+    existing = {
+        tuple(_normalized_keys(info['key'])): (name, info)
+        for name, info in collection.index_information().items()
+    }
+    actions = []
+    for spec in specs:
+        keys = _normalized_keys(spec['keys'])
+        wanted = _managed(spec['options'])
+        name, info = existing.get(tuple(keys), (spec['options'].get('name') or index_name(keys), None))
+        action = {'collection': collection.name, 'index': name}
+
+        current = _managed(info) if info is not None else {}
+        differs = {option for option in set(wanted) | set(current) if wanted.get(option) != current.get(option)}
+        try:
+            if info is not None and not differs:
+                action['action'] = 'unchanged'
+            elif info is not None and differs == {'expireAfterSeconds'} and 'expireAfterSeconds' in current \
+                    and 'expireAfterSeconds' in wanted:
+                action['action'] = 'ttl_updated'
+                if not dry_run:
+                    collection.database.command('collMod', collection.name, index={
+                        'keyPattern': dict(keys), 'expireAfterSeconds': wanted['expireAfterSeconds']
+                    })
+            elif info is not None:
+                action['action'] = 'recreated'
+                if not dry_run:
+                    collection.drop_index(name)
+                    collection.create_index(keys, **spec['options'])
+            else:
+                action['action'] = 'created'
+                if not dry_run:
+                    collection.create_index(keys, **spec['options'])
+        except OperationFailure as e:
+            # Typically duplicates blocking a unique index; keep going with the rest
+            action.update({'action': 'failed', 'error': str(e)})
+        actions.append(action)
+    return actions
+
+
+def apply_manifest(db, manifest, dry_run=False):
+    """Apply {collection_name: specs} to a database; returns every action taken."""
+    actions = []
+    for name, specs in manifest.items():
+        actions.extend(apply_indexes(db[name], specs, dry_run=dry_run))
+    return actions
+
+
+def summarize(actions):
+    counts = {}
+    for action in actions:
+        counts[action['action']] = counts.get(action['action'], 0) + 1
+    return counts
+
+
+def _plan_stages(plan):
+    """Stage names of an explain plan tree, depth first."""
+    stages = [plan.get('stage')] if plan.get('stage') else []
+    for child_key in ('inputStage', 'queryPlan'):
+        if isinstance(plan.get(child_key), dict):
+            stages.extend(_plan_stages(plan[child_key]))
+    for child in plan.get('inputStages', []):
+        stages.extend(_plan_stages(child))
+    return stages
+
+
+def explain_route_queries(db, queries=ROUTE_QUERIES):
+    """
+    Winning plan of each route query shape.
+
+    Returns:
+        [{'route', 'collection', 'filter', 'stages', 'index', 'collscan', 'in_memory_sort'}]
+    """
+    results = []
+    for route, name, query, sort in queries:
+        command = {'find': name, 'filter': query}
+        if sort:
+            command['sort'] = dict(sort)
+        explained = db.command('explain', command, verbosity='queryPlanner')
+        stages = _plan_stages(explained['queryPlanner']['winningPlan'])
+        index_names = _plan_index_names(explained['queryPlanner']['winningPlan'])
+        results.append({
+            'route': route,
+            'collection': name,
+            'filter': query,
+            'stages': stages,
+            'index': index_names[0] if index_names else None,
+            'collscan': 'COLLSCAN' in stages,
+            'in_memory_sort': 'SORT' in stages
+        })
+    return results
+
+
+def _plan_index_names(plan):
+    names = [plan['indexName']] if plan.get('indexName') else []
+    for child_key in ('inputStage', 'queryPlan'):
+        if isinstance(plan.get(child_key), dict):
+            names.extend(_plan_index_names(plan[child_key]))
+    for child in plan.get('inputStages', []):
+        names.extend(_plan_index_names(child))
+    return names
+
+
+def index_usage(db, manifest):
+    """
+    $indexStats for every manifest collection, with indexes not declared in
+    the manifest marked unmanaged.
+
+    Returns:
+        [{'collection', 'index', 'ops', 'since', 'managed'}]
+    """
+    usage = []
+    for name, specs in manifest.items():
+        declared = {tuple(_normalized_keys(spec['keys'])) for spec in specs}
+        for stat in db[name].aggregate([{'$indexStats': {}}]):
+            keys = tuple(_normalized_keys(stat['key'].items()))
+            usage.append({
+                'collection': name,
+                'index': stat['name'],
+                'ops': stat['accesses']['ops'],
+                'since': stat['accesses']['since'],
+                'managed': stat['name'] == '_id_' or keys in declared
+            })
+    return usage
+
+
+def report(db, manifest, queries=ROUTE_QUERIES):
+    """Index usage plus route query plans; 'collscans' lists the offending routes."""
+    plans = explain_route_queries(db, queries)
+    return {
+        'usage': index_usage(db, manifest),
+        'queries': plans,
+        'collscans': [plan['route'] for plan in plans if plan['collscan']]
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Apply the index manifest or report index usage')
+    subcommands = parser.add_subparsers(dest='command', required=True)
+    apply = subcommands.add_parser('apply', help='create/update indexes to match the manifest')
+    apply.add_argument('--dry-run', action='store_true', help='show what would change without writing')
+    subcommands.add_parser('report', help='index usage and COLLSCAN check of route queries')
+    args = parser.parse_args()
+
+    # The manifest includes the app components' indexes (TTL settings come from the environment)
+    from app import db, index_manifest
+    manifest = index_manifest()
+
+    if args.command == 'apply':
+        actions = apply_manifest(db, manifest, dry_run=args.dry_run)
+        for action in actions:
+            if action['action'] != 'unchanged':
+                print(f"{action['action']:>12}  {action['collection']}.{action['index']}  {action.get('error', '')}")
+        print(f"{'Would apply' if args.dry_run else 'Applied'}: {summarize(actions)}")
+        return
+
+    result = report(db, manifest)
+    print("Index usage ($indexStats):")
+    for item in result['usage']:
+        flag = '' if item['managed'] else '  (not in manifest)'
+        print(f"  {item['collection']}.{item['index']}: {item['ops']} ops since {item['since']}{flag}")
+    print("\nRoute queries:")
+    for plan in result['queries']:
+        flag = 'COLLSCAN' if plan['collscan'] else ('SORT' if plan['in_memory_sort'] else 'ok')
+        print(f"  [{flag:>8}] {plan['route']}: {plan['collection']} via {plan['index'] or '-'} "
+              f"({' <- '.join(plan['stages'])})")
+    if result['collscans']:
+        print(f"\n{len(result['collscans'])} route queries run as collection scans")
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,243 @@
+"""
+AI Decision Cache
+=================
+
+Two-level cache for AI review decisions.
+
+Requests are keyed on a canonical fingerprint of the normalized request
+fields plus a bucketed member profile (age band, condition set, prior
+decision counts) and the prompt template version, so a template change
+never serves decisions produced by an older prompt.
+
+- Hot layer: in-process LRU
+- Shared layer: MongoDB collection with a TTL index, shared by all workers
+"""
+
+import hashlib
+import json
+import re
+import threading
+from collections import OrderedDict, Counter
+from datetime import datetime as dtt, timezone
+
+from db_indexes import apply_indexes, index
+
+
+_PUNCTUATION = re.compile(r'[^\w\s]')
+_WHITESPACE = re.compile(r'\s+')
+
+
+def normalize_text(value):
+    """Lowercase, strip punctuation and collapse whitespace."""
+    text = _PUNCTUATION.sub(' ', str(value or '').lower())
+    return _WHITESPACE.sub(' ', text).strip()
+
+
+def age_band(age):
+    """Bucket an age into a 10-year band, e.g. 47 -> '40-49'."""
+    try:
+        age = int(age)
+    except (TypeError, ValueError):
+        return 'unknown'
+    low = (age // 10) * 10
+    return f"{low}-{low + 9}"
+
+
+def count_bucket(count):
+    """Bucket a count so small differences in history share a cache entry."""
+    if count <= 1:
+        return str(count)
+    if count <= 3:
+        return '2-3'
+    if count <= 7:
+        return '4-7'
+    return '8+'
+
+
+def member_profile_bucket(member_data, past_requests):
+    """Reduce a member and their history to the coarse profile used in the key."""
+    member_data = member_data or {}
+    statuses = Counter(
+        normalize_text(past.get('ai_decision') or past.get('status') or 'unknown')
+        for past in (past_requests or [])
+    )
+    return {
+        'age_band': age_band(member_data.get('age')),
+        'conditions': sorted({normalize_text(d) for d in member_data.get('diseases', []) if d}),
+        'prior_decisions': {status: count_bucket(count) for status, count in sorted(statuses.items())}
+    }
+
+
+def decision_fingerprint(auth_request, member_profile, prompt_version):
+    """
+    Canonical cache key for a review request.
+
+    Args:
+        member_profile: member_profile_bucket() of the member and their
+            history (or the same bucket read from the member features)
+
+    Returns:
+        Hex SHA-256 digest of the canonical request features
+    """
+    features = {
+        'prompt_version': prompt_version,
+        'procedure': normalize_text(auth_request.get('procedure')),
+        'diagnosis': normalize_text(auth_request.get('diagnosis')),
+        'urgency': normalize_text(auth_request.get('urgency') or 'routine'),
+        'additional_notes': normalize_text(auth_request.get('additional_notes')),
+        'member': member_profile
+    }
+    # Only present on provider-approved requests; omitted otherwise so older keys stay valid
+    for field in ('provider_notes', 'auth_amount'):
+        if auth_request.get(field):
+            features[field] = normalize_text(str(auth_request[field]))
+    canonical = json.dumps(features, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+class LRUCache:
+    """Small thread-safe LRU mapping."""
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._data:
+                return None
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class DecisionCache:
+    """
+    LRU + MongoDB cache of AI review decisions.
+
+    Args:
+        collection: pymongo collection for the shared layer
+        max_entries: size of the in-process LRU
+        ttl_seconds: lifetime of shared entries (enforced by a TTL index)
+        enabled: set False to bypass the cache entirely
+    """
+
+    def __init__(self, collection, max_entries=2048, ttl_seconds=7 * 24 * 3600, enabled=True):
+        self.collection = collection
+        self.ttl_seconds = ttl_seconds
+        self.enabled = enabled
+        self.lru = LRUCache(max_entries)
+        self._lock = threading.Lock()
+        self._stats = {
+            'lookups': 0,
+            'lru_hits': 0,
+            'mongo_hits': 0,
+            'misses': 0,
+            'stores': 0,
+            'saved_latency_seconds': 0.0,
+            'miss_latency_seconds': 0.0
+        }
+
+    def index_specs(self):
+        """TTL index for expiry plus a version index for invalidation."""
+        return [index('created_at', expireAfterSeconds=int(self.ttl_seconds)), index('prompt_version')]
+
+    def ensure_indexes(self):
+        return apply_indexes(self.collection, self.index_specs())
+
+    def invalidate_other_versions(self, prompt_versions):
+        """Drop shared entries produced by any prompt template not in prompt_versions."""
+        self.lru.clear()
+        result = self.collection.delete_many({'prompt_version': {'$nin': list(prompt_versions)}})
+        return result.deleted_count
+
+    def get(self, key):
+        """
+        Look up a cached decision.
+
+        Returns:
+            The cached entry ({'decision', 'result_text', 'latency_seconds', ...}) or None
+        """
+        if not self.enabled:
+            return None
+
+        self._bump('lookups')
+        entry = self.lru.get(key)
+        if entry is not None:
+            self._record_hit('lru_hits', entry)
+            return entry
+
+        doc = self.collection.find_one({'_id': key})
+        if doc:
+            entry = {
+                'decision': doc['decision'],
+                'result_text': doc.get('result_text', ''),
+                'prompt_version': doc.get('prompt_version'),
+                'latency_seconds': doc.get('latency_seconds', 0.0)
+            }
+            self.lru.put(key, entry)
+            self._record_hit('mongo_hits', entry)
+            return entry
+
+        self._bump('misses')
+        return None
+
+    def put(self, key, decision, result_text, prompt_version, latency_seconds):
+        """Store a decision in both layers."""
+        if not self.enabled:
+            return
+
+        entry = {
+            'decision': decision,
+            'result_text': result_text,
+            'prompt_version': prompt_version,
+            'latency_seconds': latency_seconds
+        }
+        self.lru.put(key, entry)
+        self.collection.replace_one(
+            {'_id': key},
+            dict(entry, created_at=dtt.now(timezone.utc)),
+            upsert=True
+        )
+        with self._lock:
+            self._stats['stores'] += 1
+            self._stats['miss_latency_seconds'] += latency_seconds
+
+    def stats(self):
+        """Hit ratio and latency saved since process start."""
+        with self._lock:
+            stats = dict(self._stats)
+        hits = stats['lru_hits'] + stats['mongo_hits']
+        stats['hits'] = hits
+        stats['hit_ratio'] = round(hits / stats['lookups'], 4) if stats['lookups'] else 0.0
+        stats['avg_model_latency_seconds'] = (
+            round(stats['miss_latency_seconds'] / stats['stores'], 4) if stats['stores'] else 0.0
+        )
+        stats['saved_latency_seconds'] = round(stats['saved_latency_seconds'], 4)
+        stats['miss_latency_seconds'] = round(stats['miss_latency_seconds'], 4)
+        stats['lru_entries'] = len(self.lru)
+        return stats
+
+    def _bump(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def _record_hit(self, layer, entry):
+        with self._lock:
+            self._stats[layer] += 1
+            self._stats['saved_latency_seconds'] += entry.get('latency_seconds') or 0.0
+
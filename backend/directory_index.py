@@ -0,0 +1,215 @@
+"""
+Provider / Payer Directory Index
+================================
+
+In-memory index of the provider and payer directories used to pick a
+handful of relevant candidates for the health buddy prompt instead of
+serializing every provider and payer document.
+
+Records are reduced to the compact fields the prompt needs (no password
+hashes or contact details). The index rebuilds itself when the underlying
+collections change: writes can call mark_dirty(), and a cheap signature
+(document count + newest ObjectId) is polled as a safety net.
+"""
+
+import re
+import threading
+import time
+from collections import defaultdict
+
+
+PROVIDER_FIELDS = [
+    'provider_id', 'name', 'role', 'expertise', 'network_type',
+    'years_experience', 'board_certified', 'languages', 'practice_name'
+]
+PAYER_FIELDS = [
+    'payer_id', 'name', 'coverage_types', 'unit_price', 'deductible_amounts',
+    'copay_amounts', 'max_out_of_pocket', 'approval_rate', 'avg_processing_time'
+]
+
+# Words in a question or condition list that point at a specialty
+SPECIALTY_KEYWORDS = {
+    'cardiology': [
+        'heart', 'cardiac', 'chest', 'cardio', 'hypertension', 'blood pressure', 'arrhythmia',
+        'palpitation', 'cholesterol', 'angina', 'stroke'
+    ],
+    'pediatrics': [
+        'child', 'children', 'kid', 'kids', 'baby', 'infant', 'toddler', 'son', 'daughter',
+        'pediatric', 'newborn', 'vaccination'
+    ],
+    'surgery': [
+        'surgery', 'surgical', 'operation', 'fracture', 'hernia', 'appendix', 'injury',
+        'knee', 'hip', 'transplant', 'tumor'
+    ],
+    'medicine': [
+        'fever', 'cold', 'flu', 'cough', 'diabetes', 'infection', 'fatigue', 'headache',
+        'checkup', 'check-up', 'general', 'thyroid', 'asthma', 'allergy'
+    ],
+    'general practice': ['checkup', 'check-up', 'general', 'primary care', 'routine']
+}
+
+COVERAGE_KEYWORDS = {
+    'dental': ['tooth', 'teeth', 'dental', 'dentist', 'gum', 'cavity'],
+    'vision': ['eye', 'eyes', 'vision', 'glasses', 'lens', 'sight'],
+    'prescription': ['medication', 'medicine', 'prescription', 'drug', 'pharmacy', 'pill'],
+    'medical': ['doctor', 'hospital', 'surgery', 'treatment', 'scan', 'test', 'therapy']
+}
+
+LANGUAGES = ['english', 'spanish', 'french', 'german', 'mandarin', 'hindi', 'arabic', 'portuguese']
+
+_WORD = re.compile(r"[a-z][a-z\-]+")
+
+
+def _compact(doc, fields):
+    return {field: doc.get(field) for field in fields if doc.get(field) is not None}
+
+
+def _text_terms(text):
+    """Lowercased words plus the raw lowercased text for phrase matching."""
+    text = str(text or '').lower()
+    return set(_WORD.findall(text)), text
+
+
+def _matched_keys(keyword_map, words, text):
+    matched = set()
+    for key, keywords in keyword_map.items():
+        for keyword in keywords:
+            if (' ' in keyword and keyword in text) or keyword in words:
+                matched.add(key)
+                break
+    return matched
+
+
+class DirectoryIndex:
+    """
+    Top-k provider and payer retrieval for a member question.
+
+    Args:
+        db: pymongo database with providers and payers collections
+        refresh_interval: seconds between change-signature checks
+    """
+
+    def __init__(self, db, refresh_interval=30.0):
+        self.db = db
+        self.refresh_interval = refresh_interval
+        self._lock = threading.Lock()
+        self._dirty = True
+        self._checked_at = 0.0
+        self._signature = None
+        self.providers = []
+        self.payers = []
+        self._providers_by_specialty = defaultdict(list)
+        self.built_at = None
+
+    def mark_dirty(self):
+        """Force a rebuild on the next lookup (call after directory writes)."""
+        self._dirty = True
+
+    def _collection_signature(self):
+        signature = []
+        for collection in (self.db.providers, self.db.payers):
+            newest = collection.find_one({}, {'_id': 1}, sort=[('_id', -1)])
+            signature.append((collection.estimated_document_count(), newest['_id'] if newest else None))
+        return tuple(signature)
+
+    def refresh(self, force=False):
+        """Rebuild the index if the directories changed."""
+        now = time.monotonic()
+        if not (force or self._dirty) and now - self._checked_at < self.refresh_interval:
+            return False
+        self._checked_at = now
+
+        signature = self._collection_signature()
+        if not (force or self._dirty) and signature == self._signature:
+            return False
+
+        providers = [
+            _compact(doc, PROVIDER_FIELDS)
+            for doc in self.db.providers.find({}, {field: 1 for field in PROVIDER_FIELDS})
+        ]
+        payers = [
+            _compact(doc, PAYER_FIELDS)
+            for doc in self.db.payers.find({}, {field: 1 for field in PAYER_FIELDS})
+        ]
+
+        by_specialty = defaultdict(list)
+        for position, provider in enumerate(providers):
+            by_specialty[str(provider.get('expertise', '')).lower()].append(position)
+
+        with self._lock:
+            self.providers = providers
+            self.payers = payers
+            self._providers_by_specialty = by_specialty
+            self._signature = signature
+            self._dirty = False
+            self.built_at = time.time()
+        return True
+
+    def top_providers(self, question, conditions=(), k=5, preferred_language=None):
+        """
+        Rank providers for a member question and condition list.
+
+        Returns:
+            Up to k compact provider records, best first
+        """
+        self.refresh()
+        words, text = _text_terms(' '.join([question or ''] + [str(c) for c in conditions or []]))
+        specialties = _matched_keys(SPECIALTY_KEYWORDS, words, text)
+        languages = {lang for lang in LANGUAGES if lang in words}
+        if preferred_language:
+            languages.add(str(preferred_language).lower())
+
+        with self._lock:
+            providers = self.providers
+            by_specialty = self._providers_by_specialty
+
+        matched_positions = {pos for specialty in specialties for pos in by_specialty.get(specialty, [])}
+
+        def score(position):
+            provider = providers[position]
+            value = 5.0 if position in matched_positions else 0.0
+            if str(provider.get('network_type', '')).lower() == 'in network':
+                value += 1.5
+            if provider.get('board_certified'):
+                value += 1.0
+            value += min(provider.get('years_experience') or 0, 30) / 15.0
+            if languages and languages & {str(lang).lower() for lang in provider.get('languages', [])}:
+                value += 1.0
+            return value
+
+        ranked = sorted(range(len(providers)), key=score, reverse=True)[:k]
+        return [providers[position] for position in ranked]
+
+    def top_payers(self, question, conditions=(), k=3, current_payer_id=None):
+        """
+        Rank payers by coverage fit, approval rate and out-of-pocket exposure.
+
+        Returns:
+            Up to k compact payer records, best first
+        """
+        self.refresh()
+        words, text = _text_terms(' '.join([question or ''] + [str(c) for c in conditions or []]))
+        needed = _matched_keys(COVERAGE_KEYWORDS, words, text) or {'medical'}
+
+        with self._lock:
+            payers = self.payers
+
+        def score(payer):
+            covered = {str(c).lower() for c in payer.get('coverage_types', [])}
+            value = 2.0 * len(needed & covered)
+            value += (payer.get('approval_rate') or 0) / 50.0
+            max_oop = payer.get('max_out_of_pocket')
+            if max_oop:
+                value += 1.0 - min(max_oop, 20000) / 20000.0
+            if current_payer_id and payer.get('payer_id') == current_payer_id:
+                value += 0.5
+            return value
+
+        return sorted(payers, key=score, reverse=True)[:k]
+
+    def stats(self):
+        return {
+            'providers': len(self.providers),
+            'payers': len(self.payers),
+            'built_at': self.built_at
+        }
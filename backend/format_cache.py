@@ -0,0 +1,291 @@
+"""
+Format Description Cache
+========================
+
+Cache for format_request_description results that also matches
+near-identical inputs (same text with whitespace, casing or punctuation
+differences, or filler words such as "please" / "the" added or dropped).
+
+- Exact layer: SHA-256 of the normalized text
+- Near-duplicate layer: character-shingle MinHash signatures banded for LSH;
+  candidates sharing a band are accepted when their estimated Jaccard
+  similarity is above the threshold and a word diff of the two inputs
+  changes nothing but FILLER_WORDS. Any other substituted, added or
+  removed word (laterality, spelled-out numbers, negation, a different
+  procedure, ...) is a miss, so "left knee" never reuses a result written
+  for "right knee" and "six weeks" never one for "ten weeks"
+
+Entries are kept in an in-process LRU (with its own LSH buckets) and in a
+MongoDB collection whose multikey index on the band keys serves
+near-duplicate lookups across workers.
+"""
+
+import hashlib
+import re
+import struct
+import threading
+from collections import OrderedDict, defaultdict
+from difflib import SequenceMatcher
+from datetime import datetime as dtt, timezone
+
+from db_indexes import apply_indexes, index
+from decision_cache import normalize_text
+
+
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+SHINGLE_SIZE = 5
+MIN_SHINGLES = 20
+
+# The only words a near-duplicate may add, drop or swap; they never change clinical meaning
+FILLER_WORDS = frozenset('a an the please kindly thanks thank you also just'.split())
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_NUMBER = re.compile(r'\d+(?:\.\d+)?')
+
+
+def _permutations(seed=1, count=NUM_PERM):
+    """Fixed (a, b) pairs for the MinHash hash family; identical across processes."""
+    pairs = []
+    for position in range(count):
+        digest = hashlib.blake2b(f"{seed}:{position}".encode(), digest_size=16).digest()
+        a, b = struct.unpack('<QQ', digest)
+        pairs.append(((a % (_MERSENNE_PRIME - 1)) + 1, b % _MERSENNE_PRIME))
+    return pairs
+
+
+_PERMUTATIONS = _permutations()
+
+
+def shingles(normalized):
+    """Character n-grams of normalized text (robust to small word edits)."""
+    if len(normalized) < SHINGLE_SIZE:
+        return {normalized} if normalized else set()
+    return {normalized[i:i + SHINGLE_SIZE] for i in range(len(normalized) - SHINGLE_SIZE + 1)}
+
+
+def minhash(shingle_set):
+    """MinHash signature (NUM_PERM ints) of a shingle set."""
+    hashes = [
+        struct.unpack('<Q', hashlib.blake2b(shingle.encode(), digest_size=8).digest())[0]
+        for shingle in shingle_set
+    ]
+    return [
+        min(((a * h + b) % _MERSENNE_PRIME) for h in hashes)
+        for a, b in _PERMUTATIONS
+    ]
+
+
+def band_keys(signature):
+    """LSH band keys: one short hash per band of ROWS signature rows."""
+    keys = []
+    for band in range(BANDS):
+        rows = signature[band * ROWS:(band + 1) * ROWS]
+        digest = hashlib.blake2b(struct.pack(f'<{ROWS}Q', *rows), digest_size=8).hexdigest()
+        keys.append(f"{band}:{digest}")
+    return keys
+
+
+def only_filler_changes(words_a, words_b):
+    """True when the word sequences differ only by FILLER_WORDS."""
+    matcher = SequenceMatcher(None, words_a, words_b, autojunk=False)
+    for tag, a_start, a_end, b_start, b_end in matcher.get_opcodes():
+        if tag != 'equal' and not FILLER_WORDS.issuperset(words_a[a_start:a_end] + words_b[b_start:b_end]):
+            return False
+    return True
+
+
+def similarity(sig_a, sig_b):
+    """Estimated Jaccard similarity of two MinHash signatures."""
+    return sum(1 for x, y in zip(sig_a, sig_b) if x == y) / float(NUM_PERM)
+
+
+class _Fingerprint:
+    __slots__ = ('key', 'signature', 'bands', 'numbers', 'words')
+
+    def __init__(self, text):
+        normalized = normalize_text(text)
+        self.key = hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+        self.numbers = sorted(set(_NUMBER.findall(normalized)))
+        self.words = normalized.split()
+        shingle_set = shingles(normalized)
+        if len(shingle_set) >= MIN_SHINGLES:
+            self.signature = minhash(shingle_set)
+            self.bands = band_keys(self.signature)
+        else:
+            # Too short for a meaningful similarity estimate: exact matches only
+            self.signature = None
+            self.bands = []
+
+
+class FormatCache:
+    """
+    Exact + near-duplicate cache of formatted descriptions.
+
+    Args:
+        collection: pymongo collection for the shared layer
+        max_entries: size of the in-process LRU
+        threshold: minimum estimated Jaccard similarity for a near-duplicate hit
+        ttl_seconds: lifetime of shared entries (enforced by a TTL index)
+        enabled: set False to bypass the cache entirely
+    """
+
+    def __init__(self, collection, max_entries=4096, threshold=0.9, ttl_seconds=30 * 24 * 3600, enabled=True):
+        self.collection = collection
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._band_index = defaultdict(set)
+        self._stats = {
+            'lookups': 0,
+            'exact_hits': 0,
+            'near_hits': 0,
+            'misses': 0,
+            'stores': 0,
+            'saved_latency_seconds': 0.0,
+            'miss_latency_seconds': 0.0
+        }
+
+    def index_specs(self):
+        return [index('created_at', expireAfterSeconds=int(self.ttl_seconds)), index('bands')]
+
+    def ensure_indexes(self):
+        return apply_indexes(self.collection, self.index_specs())
+
+    def get(self, raw_input):
+        """
+        Look up a formatted result for raw_input.
+
+        Returns:
+            The cached formatted text, or None
+        """
+        if not self.enabled:
+            return None
+
+        fingerprint = _Fingerprint(raw_input)
+        self._bump('lookups')
+
+        entry = self._lru_get(fingerprint.key)
+        if entry is None:
+            doc = self.collection.find_one({'_id': fingerprint.key})
+            entry = self._remember(doc) if doc else None
+        if entry is not None:
+            self._record_hit('exact_hits', entry)
+            return entry['formatted']
+
+        if fingerprint.signature is not None:
+            entry = self._near_lru(fingerprint) or self._near_mongo(fingerprint)
+            if entry is not None:
+                self._record_hit('near_hits', entry)
+                return entry['formatted']
+
+        self._bump('misses')
+        return None
+
+    def put(self, raw_input, formatted, latency_seconds):
+        """Store a formatted result in both layers."""
+        if not self.enabled:
+            return
+
+        fingerprint = _Fingerprint(raw_input)
+        doc = {
+            '_id': fingerprint.key,
+            'formatted': formatted,
+            'signature': fingerprint.signature,
+            'bands': fingerprint.bands,
+            'numbers': fingerprint.numbers,
+            'words': fingerprint.words,
+            'latency_seconds': latency_seconds,
+            'created_at': dtt.now(timezone.utc)
+        }
+        self._remember(doc)
+        self.collection.replace_one({'_id': fingerprint.key}, doc, upsert=True)
+        with self._lock:
+            self._stats['stores'] += 1
+            self._stats['miss_latency_seconds'] += latency_seconds
+
+    def _accepts(self, fingerprint, entry):
+        return (
+            entry.get('signature') is not None
+            and entry.get('numbers', []) == fingerprint.numbers
+            and similarity(fingerprint.signature, entry['signature']) >= self.threshold
+            # Entries stored before the word check have no words: never reused
+            and entry.get('words') is not None
+            and only_filler_changes(fingerprint.words, entry['words'])
+        )
+
+    def _near_lru(self, fingerprint):
+        with self._lock:
+            candidates = set()
+            for band in fingerprint.bands:
+                candidates |= self._band_index.get(band, set())
+            best, best_score = None, 0.0
+            for key in candidates:
+                entry = self._entries[key]
+                if self._accepts(fingerprint, entry):
+                    score = similarity(fingerprint.signature, entry['signature'])
+                    if score > best_score:
+                        best, best_score = entry, score
+            if best is not None:
+                self._entries.move_to_end(best['_id'])
+            return best
+
+    def _near_mongo(self, fingerprint):
+        best, best_score = None, 0.0
+        for doc in self.collection.find({'bands': {'$in': fingerprint.bands}}).limit(50):
+            if self._accepts(fingerprint, doc):
+                score = similarity(fingerprint.signature, doc['signature'])
+                if score > best_score:
+                    best, best_score = doc, score
+        return self._remember(best) if best else None
+
+    def _lru_get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def _remember(self, doc):
+        """Add a document to the LRU and its LSH buckets, evicting the oldest entries."""
+        entry = {field: doc.get(field) for field in ('_id', 'formatted', 'signature', 'bands', 'numbers', 'words',
+                                                 'latency_seconds')}
+        with self._lock:
+            self._entries[entry['_id']] = entry
+            self._entries.move_to_end(entry['_id'])
+            for band in entry['bands'] or []:
+                self._band_index[band].add(entry['_id'])
+            while len(self._entries) > self.max_entries:
+                _, evicted = self._entries.popitem(last=False)
+                for band in evicted['bands'] or []:
+                    members = self._band_index.get(band)
+                    if members is not None:
+                        members.discard(evicted['_id'])
+                        if not members:
+                            del self._band_index[band]
+        return entry
+
+    def stats(self):
+        """Hit rate (exact and near-duplicate) and model latency saved since process start."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['lru_entries'] = len(self._entries)
+        hits = stats['exact_hits'] + stats['near_hits']
+        stats['hits'] = hits
+        stats['hit_ratio'] = round(hits / stats['lookups'], 4) if stats['lookups'] else 0.0
+        stats['saved_latency_seconds'] = round(stats['saved_latency_seconds'], 4)
+        stats['miss_latency_seconds'] = round(stats['miss_latency_seconds'], 4)
+        return stats
+
+    def _bump(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def _record_hit(self, name, entry):
+        with self._lock:
+            self._stats[name] += 1
+            self._stats['saved_latency_seconds'] += entry.get('latency_seconds') or 0.0
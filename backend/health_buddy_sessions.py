@@ -0,0 +1,210 @@
+"""
+Health Buddy Sessions
+=====================
+
+Server-side conversation state for the health buddy.
+
+A session holds:
+- context: the member/provider/payer context block, rendered once when the
+  session starts and sent unchanged as the system message of every turn
+  (a stable prefix the model provider can serve from its prompt cache)
+- summary: a rolling summary of older turns
+- turns: the most recent turns verbatim, each numbered with n
+
+Follow-up turns therefore send the context block, the summary, the last
+few turns and only the new question, instead of rebuilding the whole
+prompt. Once more than keep_turns turns accumulate, the oldest ones are
+handed to a summarizer and folded into the summary.
+
+Session document:
+{
+    "_id": "HB3F9C0A1B2D4E",
+    "member_id": "M001",
+    "context": "...",
+    "context_tokens": 1830,
+    "provider_ids": ["P004", ...],      # candidates already in the context
+    "payer_ids": ["PY002", ...],
+    "summary": "...",
+    "summarized_through": 6,            # highest turn n folded into the summary
+    "turns": [{"n": 7, "role": "user", "content": "...", "at": ISODate(...)}, ...],
+    "turn_count": 10,
+    "created_at": ISODate(...),
+    "updated_at": ISODate(...)          # TTL
+}
+"""
+
+import threading
+import uuid
+from datetime import datetime as dtt, timezone
+
+from pymongo import ReturnDocument
+
+from db_indexes import apply_indexes, index
+
+
+class HealthBuddySessions:
+    """
+    Health buddy conversation sessions stored in MongoDB.
+
+    Args:
+        collection: pymongo collection holding session documents
+        ttl_seconds: idle time after which a session expires
+        keep_turns: recent turns (user and assistant messages) kept verbatim
+        context_max_age: seconds after which the context block is rebuilt
+    """
+
+    def __init__(self, collection, ttl_seconds=24 * 3600, keep_turns=6, context_max_age=1800):
+        self.collection = collection
+        self.ttl_seconds = ttl_seconds
+        self.keep_turns = keep_turns
+        self.context_max_age = context_max_age
+        self._lock = threading.Lock()
+        self._stats = {
+            'sessions_started': 0,
+            'turns': 0,
+            'context_reuses': 0,
+            'context_rebuilds': 0,
+            'summaries': 0,
+            'summary_errors': 0
+        }
+
+    def index_specs(self):
+        return [index('updated_at', expireAfterSeconds=int(self.ttl_seconds)), index('member_id')]
+
+    def ensure_indexes(self):
+        return apply_indexes(self.collection, self.index_specs())
+
+    def get(self, session_id, member_id):
+        """A member's session, or None if it does not exist (or belongs to someone else)."""
+        if not session_id:
+            return None
+        return self.collection.find_one({'_id': session_id, 'member_id': member_id})
+
+    def context_is_fresh(self, session):
+        built_at = session.get('context_built_at')
+        if built_at is None:
+            return False
+        if built_at.tzinfo is None:
+            built_at = built_at.replace(tzinfo=timezone.utc)
+        return (dtt.now(timezone.utc) - built_at).total_seconds() < self.context_max_age
+
+    def start(self, member_id, context, context_tokens, provider_ids, payer_ids):
+        """Create a new session around a freshly rendered context block."""
+        now = dtt.now(timezone.utc)
+        session = {
+            '_id': f"HB{uuid.uuid4().hex[:12].upper()}",
+            'member_id': member_id,
+            'context': context,
+            'context_tokens': context_tokens,
+            'context_built_at': now,
+            'provider_ids': list(provider_ids),
+            'payer_ids': list(payer_ids),
+            'summary': '',
+            'summarized_through': 0,
+            'turns': [],
+            'turn_count': 0,
+            'created_at': now,
+            'updated_at': now
+        }
+        self.collection.insert_one(session)
+        self._bump('sessions_started')
+        return session
+
+    def replace_context(self, session, context, context_tokens, provider_ids, payer_ids):
+        """Swap in a rebuilt context block, keeping the conversation."""
+        fields = {
+            'context': context,
+            'context_tokens': context_tokens,
+            'context_built_at': dtt.now(timezone.utc),
+            'provider_ids': list(provider_ids),
+            'payer_ids': list(payer_ids)
+        }
+        self.collection.update_one({'_id': session['_id']}, {'$set': fields})
+        session.update(fields)
+        self._bump('context_rebuilds')
+
+    def note_reuse(self):
+        self._bump('context_reuses')
+
+    def messages(self, session, user_content, system_prompt):
+        """
+        Chat messages for the next turn: system prompt + context block, the
+        rolling summary, the recent turns and the new user content.
+        """
+        messages = [{'role': 'system', 'content': f"{system_prompt}\n\n{session['context']}"}]
+        if session.get('summary'):
+            messages.append({
+                'role': 'system',
+                'content': f"Summary of the conversation so far:\n{session['summary']}"
+            })
+        for turn in session.get('turns', [])[-self.keep_turns:]:
+            messages.append({'role': turn['role'], 'content': turn['content']})
+        messages.append({'role': 'user', 'content': user_content})
+        return messages
+
+    def record_turn(self, session, user_content, answer, extra_provider_ids=(), extra_payer_ids=()):
+        """Append a user/assistant exchange; returns the updated session."""
+        now = dtt.now(timezone.utc)
+        update = {
+            '$push': {'turns': {'$each': [
+                {'n': session['turn_count'] + 1, 'role': 'user', 'content': user_content, 'at': now},
+                {'n': session['turn_count'] + 2, 'role': 'assistant', 'content': answer, 'at': now}
+            ]}},
+            '$inc': {'turn_count': 2},
+            '$set': {'updated_at': now}
+        }
+        add_to_set = {}
+        if extra_provider_ids:
+            add_to_set['provider_ids'] = {'$each': list(extra_provider_ids)}
+        if extra_payer_ids:
+            add_to_set['payer_ids'] = {'$each': list(extra_payer_ids)}
+        if add_to_set:
+            update['$addToSet'] = add_to_set
+
+        self._bump('turns')
+        return self.collection.find_one_and_update(
+            {'_id': session['_id']}, update, return_document=ReturnDocument.AFTER
+        )
+
+    def fold_candidates(self, session):
+        """
+        Turns that should be folded into the summary.
+
+        Returns:
+            (through_n, turns) or None when the recent window is not full
+        """
+        turns = session.get('turns', [])
+        if len(turns) <= self.keep_turns:
+            return None
+        folded = turns[:len(turns) - self.keep_turns]
+        return folded[-1]['n'], folded
+
+    def apply_summary(self, session_id, previous_through, through_n, summary):
+        """
+        Store a new summary and drop the turns it covers. Only applies if no
+        other summary landed in the meantime.
+        """
+        result = self.collection.update_one(
+            {'_id': session_id, 'summarized_through': previous_through},
+            {
+                '$set': {'summary': summary, 'summarized_through': through_n},
+                '$pull': {'turns': {'n': {'$lte': through_n}}}
+            }
+        )
+        if result.modified_count:
+            self._bump('summaries')
+        return result.modified_count == 1
+
+    def record_summary_error(self):
+        self._bump('summary_errors')
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        returning = stats['context_reuses'] + stats['context_rebuilds']
+        stats['context_reuse_ratio'] = round(stats['context_reuses'] / returning, 4) if returning else 0.0
+        return stats
+
+    def _bump(self, name):
+        with self._lock:
+            self._stats[name] += 1
@@ -0,0 +1,135 @@
+"""
+Async LLM Runtime
+=================
+
+One background asyncio event loop, shared by the whole process, that
+carries every LLM request over a single pooled keep-alive HTTP transport.
+
+Flask request threads (and the review worker) hand coroutines to the loop
+and wait for the result, so a thread only blocks on its own call while the
+loop multiplexes any number of in-flight completions over the shared
+connection pool. Fan-out work (batch reviews) submits many coroutines at
+once and bounds them with an asyncio semaphore instead of a thread each.
+
+Bridges for sync code:
+- run_sync(coro): run a coroutine on the loop and return its result
+- submit(coro): schedule a coroutine, returning a concurrent.futures.Future
+- SyncStream: iterate an async stream (e.g. a streamed completion) from sync code
+"""
+
+import asyncio
+import threading
+
+try:
+    import httpx
+except ImportError:  # pragma: no cover - installed with openai
+    httpx = None
+
+
+def make_http_client(max_connections=100, max_keepalive_connections=20, keepalive_expiry=30.0, timeout=30.0):
+    """Pooled keep-alive async HTTP transport shared by every LLM backend."""
+    return httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry
+        ),
+        timeout=timeout
+    )
+
+
+class AsyncRuntime:
+    """
+    Background event loop thread, started on first use.
+
+    Args:
+        name: thread name
+    """
+
+    def __init__(self, name='llm-loop'):
+        self.name = name
+        self._loop = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    @property
+    def loop(self):
+        with self._lock:
+            if self._loop is None:
+                ready = threading.Event()
+
+                def run():
+                    self._loop = asyncio.new_event_loop()
+                    asyncio.set_event_loop(self._loop)
+                    ready.set()
+                    self._loop.run_forever()
+
+                self._thread = threading.Thread(target=run, name=self.name, daemon=True)
+                self._thread.start()
+                ready.wait()
+            return self._loop
+
+    def submit(self, coro):
+        """Schedule a coroutine on the loop; returns a concurrent.futures.Future."""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run_sync(self, coro, timeout=None):
+        """Run a coroutine on the loop and block the calling thread for its result."""
+        loop = self.loop
+        if threading.current_thread() is self._thread:
+            coro.close()
+            raise RuntimeError('run_sync() called from the event loop thread; await the coroutine instead')
+        future = asyncio.run_coroutine_threadsafe(coro, loop)
+        try:
+            return future.result(timeout)
+        except BaseException:
+            future.cancel()
+            raise
+
+    def semaphore(self, limit):
+        """asyncio.Semaphore owned by the runtime loop (for bounding submitted work)."""
+        async def make():
+            return asyncio.Semaphore(limit)
+        return self.run_sync(make())
+
+    def stop(self, http_client=None):
+        """Close the shared transport and stop the loop."""
+        if self._loop is None:
+            return
+        if http_client is not None:
+            try:
+                self.run_sync(http_client.aclose(), timeout=5)
+            except Exception as e:
+                print(f"Error closing LLM HTTP client: {e}")
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
+
+
+class SyncStream:
+    """
+    Sync iterator over an async stream running on the runtime loop.
+
+    close() closes the upstream stream (cancelling generation).
+    """
+
+    def __init__(self, runtime, stream):
+        self.runtime = runtime
+        self.stream = stream
+        self._iterator = stream.__aiter__()
+        self._closed = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self._closed:
+            raise StopIteration
+        try:
+            return self.runtime.run_sync(self._iterator.__anext__())
+        except StopAsyncIteration:
+            raise StopIteration
+
+    def close(self):
+        if not self._closed:
+            self._closed = True
+            self.runtime.run_sync(self.stream.close())
@@ -0,0 +1,330 @@
+"""
+LLM Backend Layer
+=================
+
+One routing layer in front of every chat-completion backend (Azure OpenAI,
+Gemini through its OpenAI-compatible endpoint, ...). Backends are tried in
+the configured order.
+
+Fault handling:
+- Per-backend circuit breaker: after failure_threshold consecutive
+  retryable failures the backend is skipped for reset_timeout seconds,
+  then a single trial request decides whether it closes again.
+- Jittered retries: retryable errors (timeouts, connection errors, 429,
+  5xx, open circuit) are retried with full-jitter exponential backoff,
+  failing over to the next healthy backend.
+- Deadline-aware timeouts: every call has an overall deadline and each
+  attempt only gets the time that is left.
+- Hedged requests (optional): if the primary has not answered within its
+  recent latency percentile, the same request is sent to the next
+  backend, whichever answers first wins and the other is cancelled.
+
+Backends use async openai clients driven by the shared AsyncRuntime loop
+(llm_async.py); complete() is the sync bridge for existing helpers.
+"""
+
+import asyncio
+import random
+import threading
+import time
+from collections import deque
+
+from llm_async import SyncStream
+from llm_metrics import is_timeout
+
+
+# openai exception types worth retrying (matched by name to keep this module client-agnostic)
+RETRYABLE_ERRORS = {
+    'APIConnectionError', 'APITimeoutError', 'RateLimitError', 'InternalServerError', 'CircuitOpenError'
+}
+
+
+class CircuitOpenError(Exception):
+    """Raised when a backend's circuit breaker is open."""
+
+
+class DeadlineExceededError(TimeoutError):
+    """Raised when the overall deadline for an LLM call has passed."""
+
+
+class NoBackendAvailableError(Exception):
+    """Raised when every configured backend has an open circuit."""
+
+
+def is_retryable(error):
+    return type(error).__name__ in RETRYABLE_ERRORS or (
+        is_timeout(error) and not isinstance(error, DeadlineExceededError)
+    )
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker.
+
+    States: closed (normal), open (rejecting), half_open (one trial allowed).
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._opened_at is None:
+                return 'closed'
+            if time.monotonic() - self._opened_at >= self.reset_timeout:
+                return 'half_open'
+            return 'open'
+
+    def available(self):
+        """Whether a request could be sent now (does not claim the half-open trial)."""
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            return time.monotonic() - self._opened_at >= self.reset_timeout and not self._trial_in_flight
+
+    def allow(self):
+        """Claim permission to send a request."""
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at >= self.reset_timeout and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            # A failed half-open trial re-opens the circuit immediately
+            if self._trial_in_flight or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+            self._trial_in_flight = False
+
+    def release(self):
+        """Give back a claimed trial that ended with a non-retryable error."""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def snapshot(self):
+        return {'state': self.state, 'consecutive_failures': self._failures}
+
+
+class LLMBackend:
+    """
+    One OpenAI-compatible chat completion backend.
+
+    Args:
+        name: label used in metrics and status
+        client: async openai client (AsyncOpenAI / AsyncAzureOpenAI)
+        model: model or deployment name sent with every request
+        timeout: per-attempt timeout cap in seconds
+        breaker: CircuitBreaker for this backend
+    """
+
+    def __init__(self, name, client, model, timeout=30.0, breaker=None, latency_window=200):
+        self.name = name
+        self.client = client
+        self.model = model
+        self.timeout = timeout
+        self.breaker = breaker or CircuitBreaker()
+        self._latencies = deque(maxlen=latency_window)
+
+    async def create(self, deadline, kwargs):
+        if not self.breaker.allow():
+            raise CircuitOpenError(f"LLM backend '{self.name}' circuit is open")
+
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            self.breaker.release()
+            raise DeadlineExceededError(f"LLM deadline exceeded before calling '{self.name}'")
+
+        started = time.monotonic()
+        try:
+            response = await self.client.with_options(timeout=min(self.timeout, remaining)).chat.completions.create(
+                model=self.model, **kwargs
+            )
+        except asyncio.CancelledError:
+            # Lost a hedge race: not the backend's fault
+            self.breaker.release()
+            raise
+        except Exception as e:
+            if is_retryable(e):
+                self.breaker.record_failure()
+            else:
+                self.breaker.release()
+            raise
+
+        self.breaker.record_success()
+        if not kwargs.get('stream'):
+            self._latencies.append(time.monotonic() - started)
+        return response
+
+    def latency_percentile(self, percentile, min_samples=20):
+        """Recent successful-call latency percentile in seconds, None if too few samples."""
+        samples = sorted(self._latencies)
+        if len(samples) < min_samples:
+            return None
+        return samples[min(len(samples) - 1, int(percentile * len(samples)))]
+
+    def status(self):
+        p95 = self.latency_percentile(0.95, min_samples=1)
+        return dict(
+            self.breaker.snapshot(),
+            model=self.model,
+            p95_latency_ms=round(p95 * 1000, 1) if p95 is not None else None
+        )
+
+
+class LLMRouter:
+    """
+    Routes chat completions across backends with retries, failover and hedging.
+
+    Args:
+        backends: LLMBackend list, in preference order
+        metrics: LLMMetrics instance calls are recorded in
+        runtime: AsyncRuntime whose loop runs the requests
+        retries: retries after the first attempt
+        base_backoff / max_backoff: full-jitter backoff bounds in seconds
+        default_timeout: overall deadline when the caller gives none
+        hedge_enabled: allow hedged requests for calls that ask for them
+        hedge_percentile: primary latency percentile after which to hedge
+        hedge_default_delay: hedge delay used until enough latency samples exist
+    """
+
+    def __init__(self, backends, metrics, runtime, retries=2, base_backoff=0.5, max_backoff=8.0, default_timeout=60.0,
+                 hedge_enabled=False, hedge_percentile=0.95, hedge_default_delay=5.0):
+        if not backends:
+            raise ValueError('At least one LLM backend is required')
+        self.backends = backends
+        self.metrics = metrics
+        self.runtime = runtime
+        self.retries = retries
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.default_timeout = default_timeout
+        self.hedge_enabled = hedge_enabled and len(backends) > 1
+        self.hedge_percentile = hedge_percentile
+        self.hedge_default_delay = hedge_default_delay
+
+    @property
+    def primary(self):
+        return self.backends[0]
+
+    def complete(self, function, timeout=None, hedge=False, **kwargs):
+        """
+        Sync bridge: run acomplete() on the runtime loop and wait for it.
+
+        Streamed calls return a SyncStream over the async stream.
+        """
+        timeout = timeout or self.default_timeout
+        response = self.runtime.run_sync(
+            self.acomplete(function, timeout=timeout, hedge=hedge, **kwargs),
+            timeout=timeout + 5
+        )
+        if kwargs.get('stream'):
+            return SyncStream(self.runtime, response)
+        return response
+
+    def submit(self, function, semaphore=None, timeout=None, hedge=False, **kwargs):
+        """
+        Schedule a completion on the runtime loop without waiting.
+
+        Args:
+            semaphore: optional runtime-owned asyncio.Semaphore bounding concurrency
+        Returns:
+            concurrent.futures.Future resolving to the response
+        """
+        async def run():
+            if semaphore is None:
+                return await self.acomplete(function, timeout=timeout, hedge=hedge, **kwargs)
+            async with semaphore:
+                return await self.acomplete(function, timeout=timeout, hedge=hedge, **kwargs)
+        return self.runtime.submit(run())
+
+    async def acomplete(self, function, timeout=None, hedge=False, **kwargs):
+        """
+        Run a chat completion for the helper named function.
+
+        Args:
+            timeout: overall deadline in seconds across retries and failover
+            hedge: allow a hedged request to the next backend (non-streaming only)
+            **kwargs: chat.completions.create arguments (model is set per backend)
+        """
+        started = time.perf_counter()
+        deadline = time.monotonic() + (timeout or self.default_timeout)
+        attempt = 0
+
+        while True:
+            candidates = [backend for backend in self.backends if backend.breaker.available()]
+            try:
+                if not candidates:
+                    raise NoBackendAvailableError('All LLM backends have open circuits')
+                if hedge and self.hedge_enabled and len(candidates) > 1 and not kwargs.get('stream'):
+                    response, backend = await self._hedged(function, candidates[0], candidates[1], deadline, kwargs)
+                else:
+                    response, backend = await candidates[0].create(deadline, kwargs), candidates[0]
+                break
+            except Exception as e:
+                delay = random.uniform(0, min(self.max_backoff, self.base_backoff * (2 ** attempt)))
+                if attempt >= self.retries or not is_retryable(e) or time.monotonic() + delay >= deadline:
+                    self.metrics.record(function, time.perf_counter() - started, error=e,
+                                        backend=candidates[0].name if candidates else None)
+                    raise
+                attempt += 1
+                self.metrics.record_retry(function)
+                await asyncio.sleep(delay)
+
+        usage = getattr(response, 'usage', None)
+        self.metrics.record(
+            function,
+            time.perf_counter() - started,
+            prompt_tokens=getattr(usage, 'prompt_tokens', 0) or 0,
+            completion_tokens=getattr(usage, 'completion_tokens', 0) or 0,
+            backend=backend.name
+        )
+        return response
+
+    async def _hedged(self, function, primary, secondary, deadline, kwargs):
+        delay = primary.latency_percentile(self.hedge_percentile)
+        if delay is None:
+            delay = self.hedge_default_delay
+
+        first = asyncio.ensure_future(primary.create(deadline, kwargs))
+        tasks = {first: primary}
+        done, _ = await asyncio.wait({first}, timeout=max(0.0, min(delay, deadline - time.monotonic())))
+        if not done and secondary.breaker.available():
+            tasks[asyncio.ensure_future(secondary.create(deadline, kwargs))] = secondary
+            self.metrics.record_hedge(function)
+
+        # First successful answer wins; the other request is cancelled
+        pending, last_error = set(tasks), None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, timeout=max(0.0, deadline - time.monotonic()), return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    raise DeadlineExceededError('LLM deadline exceeded waiting for hedged request')
+                for task in done:
+                    if task.exception() is None:
+                        return task.result(), tasks[task]
+                    last_error = task.exception()
+            raise last_error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def status(self):
+        return {backend.name: backend.status() for backend in self.backends}
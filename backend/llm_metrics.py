@@ -0,0 +1,195 @@
+"""
+LLM Call Metrics
+================
+
+In-process instrumentation for chat completion calls.
+
+Every call is recorded per calling helper: latency histogram and rolling
+percentiles, prompt/completion tokens and estimated cost, retries, hedged
+requests, timeouts, errors and the backend that answered. Helpers that
+parse JSON out of the reply also record whether the reply parsed
+directly (whole or incrementally while streaming, possibly stopping the
+stream early), needed the regex fallback, could not be parsed at all, or
+parsed but failed validation.
+
+A one-line-per-helper summary is printed every log_interval seconds.
+"""
+
+import threading
+import time
+from collections import Counter, deque
+
+
+# Histogram bucket upper bounds in seconds
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 30.0, 60.0, float('inf'))
+
+PARSE_OUTCOMES = ('direct', 'streamed', 'early_stop', 'fallback', 'failed', 'invalid')
+
+
+def is_timeout(error):
+    return 'Timeout' in type(error).__name__ or isinstance(error, TimeoutError)
+
+
+def percentiles(samples, points=(0.5, 0.9, 0.99), scale=1000.0):
+    """Nearest-rank percentiles of samples (seconds), scaled to ms by default."""
+    ordered = sorted(samples)
+    if not ordered:
+        return {f"p{int(p * 100)}": None for p in points}
+    return {
+        f"p{int(p * 100)}": round(ordered[min(len(ordered) - 1, int(p * len(ordered)))] * scale, 1)
+        for p in points
+    }
+
+
+class _FunctionStats:
+    __slots__ = (
+        'calls', 'errors', 'timeouts', 'retries', 'hedges', 'prompt_tokens', 'completion_tokens',
+        'buckets', 'latencies', 'ttfts', 'parse', 'max_latency', 'backends'
+    )
+
+    def __init__(self, window):
+        self.calls = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.retries = 0
+        self.hedges = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+        self.latencies = deque(maxlen=window)
+        self.ttfts = deque(maxlen=window)
+        self.parse = dict.fromkeys(PARSE_OUTCOMES, 0)
+        self.max_latency = 0.0
+        self.backends = Counter()
+
+
+class LLMMetrics:
+    """
+    Per-helper LLM call metrics.
+
+    Args:
+        window: number of recent samples kept for percentiles
+        prompt_cost_per_1k / completion_cost_per_1k: USD prices for cost estimates
+        log_interval: seconds between printed summaries (0 disables)
+    """
+
+    def __init__(self, window=1000, prompt_cost_per_1k=0.0, completion_cost_per_1k=0.0, log_interval=300.0):
+        self.window = window
+        self.prompt_cost_per_1k = prompt_cost_per_1k
+        self.completion_cost_per_1k = completion_cost_per_1k
+        self.log_interval = log_interval
+        self.started_at = time.time()
+        self._lock = threading.Lock()
+        self._functions = {}
+        self._logged_at = time.monotonic()
+
+    def _stats(self, function):
+        stats = self._functions.get(function)
+        if stats is None:
+            stats = self._functions[function] = _FunctionStats(self.window)
+        return stats
+
+    def record(self, function, latency, prompt_tokens=0, completion_tokens=0, error=None, ttft=None, backend=None):
+        """Record one finished call, including all of its retries."""
+        with self._lock:
+            stats = self._stats(function)
+            stats.calls += 1
+            if backend:
+                stats.backends[backend] += 1
+            stats.prompt_tokens += prompt_tokens
+            stats.completion_tokens += completion_tokens
+            stats.latencies.append(latency)
+            stats.max_latency = max(stats.max_latency, latency)
+            for index, bound in enumerate(LATENCY_BUCKETS):
+                if latency <= bound:
+                    stats.buckets[index] += 1
+                    break
+            if ttft is not None:
+                stats.ttfts.append(ttft)
+            if error is not None:
+                stats.errors += 1
+                if is_timeout(error):
+                    stats.timeouts += 1
+        self._maybe_log()
+
+    def record_retry(self, function):
+        with self._lock:
+            self._stats(function).retries += 1
+
+    def record_hedge(self, function):
+        with self._lock:
+            self._stats(function).hedges += 1
+
+    def record_parse(self, function, outcome):
+        """Record how a reply was parsed (one of PARSE_OUTCOMES)."""
+        with self._lock:
+            self._stats(function).parse[outcome] += 1
+
+    def cost(self, prompt_tokens, completion_tokens):
+        return round(
+            prompt_tokens / 1000.0 * self.prompt_cost_per_1k
+            + completion_tokens / 1000.0 * self.completion_cost_per_1k,
+            4
+        )
+
+    def summary(self):
+        """Per-helper counters, token totals, estimated cost and latency percentiles."""
+        with self._lock:
+            snapshot = {
+                name: (
+                    stats.calls, stats.errors, stats.timeouts, stats.retries, stats.hedges,
+                    stats.prompt_tokens, stats.completion_tokens, list(stats.buckets),
+                    list(stats.latencies), list(stats.ttfts), dict(stats.parse), stats.max_latency,
+                    dict(stats.backends)
+                )
+                for name, stats in self._functions.items()
+            }
+
+        functions = {}
+        for name, (calls, errors, timeouts, retries, hedges, prompt_tokens, completion_tokens,
+                   buckets, latencies, ttfts, parse, max_latency, backends) in snapshot.items():
+            cumulative, histogram = 0, {}
+            for bound, count in zip(LATENCY_BUCKETS, buckets):
+                cumulative += count
+                histogram['+Inf' if bound == float('inf') else str(bound)] = cumulative
+
+            functions[name] = {
+                'calls': calls,
+                'errors': errors,
+                'timeouts': timeouts,
+                'retries': retries,
+                'hedges': hedges,
+                'backends': backends,
+                'prompt_tokens': prompt_tokens,
+                'completion_tokens': completion_tokens,
+                'estimated_cost_usd': self.cost(prompt_tokens, completion_tokens),
+                'latency_ms': dict(percentiles(latencies), max=round(max_latency * 1000, 1)),
+                'latency_histogram': histogram,
+                'parse': parse
+            }
+            if ttfts:
+                functions[name]['ttft_ms'] = percentiles(ttfts)
+
+        return {
+            'uptime_seconds': round(time.time() - self.started_at, 1),
+            'window': self.window,
+            'functions': functions
+        }
+
+    def _maybe_log(self):
+        if not self.log_interval:
+            return
+        now = time.monotonic()
+        with self._lock:
+            if now - self._logged_at < self.log_interval:
+                return
+            self._logged_at = now
+
+        for name, stats in sorted(self.summary()['functions'].items()):
+            print(
+                f"[llm] {name}: calls={stats['calls']} errors={stats['errors']} "
+                f"timeouts={stats['timeouts']} retries={stats['retries']} "
+                f"p50={stats['latency_ms']['p50']}ms p99={stats['latency_ms']['p99']}ms "
+                f"tokens={stats['prompt_tokens']}+{stats['completion_tokens']} "
+                f"cost=${stats['estimated_cost_usd']} parse={stats['parse']}"
+            )
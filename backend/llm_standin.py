@@ -0,0 +1,392 @@
+"""
+Local LLM Stand-in Server
+=========================
+
+OpenAI-compatible chat completions server for load-testing the AI routes
+without calling Azure. Standard library only, so it runs on an air-gapped
+box.
+
+Serves POST .../chat/completions on both the OpenAI path (/v1/chat/completions)
+and the Azure path (/openai/deployments/<deployment>/chat/completions), with
+and without stream=true.
+
+Modes:
+    synth   - deterministic synthetic replies (JSON decisions for review
+              prompts, short completions for autocomplete, prose otherwise)
+    record  - forward each request to the real upstream once and append the
+              transcript to a JSONL file
+    replay  - serve recorded transcripts by request fingerprint; misses fall
+              back to synth (or 404 with --replay-miss error)
+
+Latency is sampled per request (time to first token) from a fixed, uniform,
+normal or lognormal distribution, then completion tokens are paced at
+--tokens-per-second. Errors (429/500/503) and hangs can be injected at a
+configured rate.
+
+Usage:
+    python llm_standin.py --port 8001 --latency-ms 800 --latency-dist lognormal --tokens-per-second 60
+    LLM_BACKENDS=openai LLM_OPENAI_BASE_URL=http://127.0.0.1:8001/v1 python app.py
+
+    # or keep the Azure client and only swap its endpoint
+    AZURE_OPENAI_ENDPOINT=http://127.0.0.1:8001 python app.py
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import random
+import re
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+ERROR_TYPES = {
+    429: 'rate_limit_exceeded',
+    500: 'server_error',
+    503: 'service_unavailable'
+}
+
+_TOKEN = re.compile(r"\S+\s*")
+
+_PROSE = (
+    "Based on the information provided, the request appears consistent with standard care guidelines. "
+    "Please make sure the supporting documentation from your provider is attached, confirm that the "
+    "provider is in network for your plan, and review the remaining balance on your subscription before "
+    "scheduling the procedure. If symptoms get worse, contact your provider or seek urgent care. "
+)
+
+
+class ReplayMissError(Exception):
+    """No recorded transcript matches the request (replay mode with --replay-miss error)."""
+
+
+def request_fingerprint(body):
+    """Stable key for a chat request (model and stream flag are ignored)."""
+    canonical = {
+        'messages': body.get('messages'),
+        'temperature': body.get('temperature'),
+        'max_tokens': body.get('max_tokens'),
+        'response_format': body.get('response_format')
+    }
+    return hashlib.sha256(json.dumps(canonical, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def split_tokens(text):
+    """Approximate tokens (word + trailing whitespace) used for pacing and usage."""
+    return _TOKEN.findall(text or '') or ([text] if text else [])
+
+
+def synthetic_reply(body, key):
+    """Deterministic reply shaped like what each AI helper expects."""
+    messages = body.get('messages') or []
+    prompt = '\n'.join(str(message.get('content') or '') for message in messages)
+    seed = int(key[:8], 16)
+
+    if 'JSON' in prompt and 'status' in prompt:
+        status = ('approved', 'approved', 'pending', 'rejected')[seed % 4]
+        return json.dumps({
+            'status': status,
+            'reason': f"Synthetic {status} decision from the local stand-in",
+            'ai_notes': f"fingerprint {key[:12]}"
+        })
+
+    if 'autocomplete' in prompt.lower():
+        last = str(messages[-1].get('content') or '') if messages else ''
+        return (last + ' ' + ('with follow-up consultation', 'for chronic lower back pain', 'as advised by my doctor')[seed % 3]).strip()
+
+    max_tokens = body.get('max_tokens') or 200
+    words = split_tokens(_PROSE)
+    return ''.join(words[i % len(words)] for i in range(min(max_tokens, 4 * len(words)))).strip()
+
+
+class StandinState:
+    """Configuration, RNG and transcripts shared by all handler threads."""
+
+    def __init__(self, args):
+        self.args = args
+        self.rng = random.Random(args.seed)
+        self.lock = threading.Lock()
+        self.transcripts = {}
+        self.stats = {'requests': 0, 'errors_injected': 0, 'hangs_injected': 0,
+                      'replay_hits': 0, 'replay_misses': 0, 'recorded': 0}
+        if args.mode in ('record', 'replay'):
+            self._load_transcripts()
+
+    def _load_transcripts(self):
+        try:
+            with open(self.args.transcripts) as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self.transcripts[entry['key']] = entry
+        except FileNotFoundError:
+            pass
+        print(f"Loaded {len(self.transcripts)} transcripts from {self.args.transcripts}")
+
+    def bump(self, name):
+        with self.lock:
+            self.stats[name] += 1
+
+    def random(self):
+        with self.lock:
+            return self.rng.random()
+
+    def sample_latency(self):
+        """Time to first token in seconds."""
+        args = self.args
+        base = args.latency_ms / 1000.0
+        with self.lock:
+            if args.latency_dist == 'uniform':
+                value = self.rng.uniform(base * (1 - args.latency_jitter), base * (1 + args.latency_jitter))
+            elif args.latency_dist == 'normal':
+                value = self.rng.gauss(base, base * args.latency_jitter)
+            elif args.latency_dist == 'lognormal':
+                # base is the median; jitter is sigma of the underlying normal
+                value = base * math.exp(self.rng.gauss(0, args.latency_jitter))
+            else:
+                value = base
+        return max(0.0, value)
+
+    def record(self, entry):
+        with self.lock:
+            self.transcripts[entry['key']] = entry
+            self.stats['recorded'] += 1
+            with open(self.args.transcripts, 'a') as f:
+                f.write(json.dumps(entry) + '\n')
+
+
+def make_handler(state):
+
+    class StandinHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, format, *args):
+            if state.args.verbose:
+                super().log_message(format, *args)
+
+        def _send_json(self, status, payload, headers=None):
+            data = json.dumps(payload).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path.rstrip('/') in ('/health', '/v1/health'):
+                with state.lock:
+                    stats = dict(state.stats)
+                return self._send_json(200, dict(stats, mode=state.args.mode, transcripts=len(state.transcripts)))
+            if self.path.rstrip('/').endswith('/models'):
+                return self._send_json(200, {'object': 'list', 'data': [{'id': state.args.model, 'object': 'model'}]})
+            self._send_json(404, {'error': {'message': 'Not found', 'type': 'not_found'}})
+
+        def do_POST(self):
+            path = self.path.split('?', 1)[0]
+            if not path.endswith('/chat/completions'):
+                return self._send_json(404, {'error': {'message': 'Not found', 'type': 'not_found'}})
+
+            length = int(self.headers.get('Content-Length') or 0)
+            try:
+                body = json.loads(self.rfile.read(length) or b'{}')
+            except ValueError:
+                return self._send_json(400, {'error': {'message': 'Invalid JSON body', 'type': 'invalid_request_error'}})
+
+            state.bump('requests')
+            deployment = re.search(r'/deployments/([^/]+)/', path)
+            model = body.get('model') or (deployment.group(1) if deployment else state.args.model)
+            started = time.monotonic()
+
+            if state.random() < state.args.error_rate:
+                state.bump('errors_injected')
+                with state.lock:
+                    code = state.rng.choice(state.args.error_codes)
+                time.sleep(self._ttft())
+                headers = {'Retry-After': '1'} if code == 429 else None
+                return self._send_json(code, {
+                    'error': {'message': f'Injected {code} from llm stand-in', 'type': ERROR_TYPES.get(code, 'server_error')}
+                }, headers)
+
+            if state.random() < state.args.hang_rate:
+                state.bump('hangs_injected')
+                time.sleep(state.args.hang_seconds)
+
+            try:
+                content, usage = self._reply(path, body)
+            except ReplayMissError as e:
+                return self._send_json(404, {'error': {'message': str(e), 'type': 'replay_miss'}})
+            except urllib.error.HTTPError as e:
+                return self._send_json(e.code, {'error': {'message': f'Upstream error: {e.reason}', 'type': 'upstream_error'}})
+            except Exception as e:
+                return self._send_json(502, {'error': {'message': f'Stand-in error: {e}', 'type': 'server_error'}})
+
+            if body.get('stream'):
+                self._stream(model, content, started)
+            else:
+                self._complete(model, content, usage, started)
+
+        def _ttft(self):
+            return state.sample_latency()
+
+        def _reply(self, path, body):
+            """Return (content, usage) for a request according to the mode."""
+            key = request_fingerprint(body)
+            mode = state.args.mode
+
+            if mode in ('replay', 'record'):
+                with state.lock:
+                    entry = state.transcripts.get(key)
+                if entry:
+                    state.bump('replay_hits')
+                    return entry['content'], entry.get('usage')
+                if mode == 'replay':
+                    state.bump('replay_misses')
+                    if state.args.replay_miss == 'error':
+                        raise ReplayMissError(f"No recorded transcript for request {key[:12]}")
+
+            if mode == 'record':
+                content, usage = self._forward(path, body)
+                state.record({'key': key, 'request': body, 'content': content, 'usage': usage,
+                              'recorded_at': time.time()})
+                return content, usage
+
+            return synthetic_reply(body, key), None
+
+        def _forward(self, path, body):
+            """Send the request to the real upstream (non-streaming) and return its reply."""
+            upstream = dict(body, stream=False)
+            request = urllib.request.Request(
+                state.args.upstream_url.rstrip('/') + self.path,
+                data=json.dumps(upstream).encode('utf-8'),
+                headers={'Content-Type': 'application/json'},
+                method='POST'
+            )
+            for header in ('api-key', 'Authorization'):
+                if self.headers.get(header):
+                    request.add_header(header, self.headers[header])
+            with urllib.request.urlopen(request, timeout=state.args.upstream_timeout) as response:
+                payload = json.loads(response.read())
+            return payload['choices'][0]['message'].get('content') or '', payload.get('usage')
+
+        def _usage(self, body_tokens, content, usage):
+            if usage:
+                return usage
+            completion = len(split_tokens(content))
+            return {'prompt_tokens': body_tokens, 'completion_tokens': completion,
+                    'total_tokens': body_tokens + completion}
+
+        def _complete(self, model, content, usage, started):
+            tokens = split_tokens(content)
+            # Non-streamed replies arrive after the whole completion would have been generated
+            delay = self._ttft() + len(tokens) / state.args.tokens_per_second
+            time.sleep(max(0.0, delay - (time.monotonic() - started)))
+            self._send_json(200, {
+                'id': f"chatcmpl-{uuid.uuid4().hex[:24]}",
+                'object': 'chat.completion',
+                'created': int(time.time()),
+                'model': model,
+                'choices': [{
+                    'index': 0,
+                    'message': {'role': 'assistant', 'content': content},
+                    'finish_reason': 'stop'
+                }],
+                'usage': self._usage(self._prompt_tokens(), content, usage)
+            })
+
+        def _prompt_tokens(self):
+            return int(self.headers.get('Content-Length') or 0) // 4
+
+        def _stream(self, model, content, started):
+            completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+            created = int(time.time())
+
+            def chunk(delta, finish_reason=None):
+                payload = {
+                    'id': completion_id,
+                    'object': 'chat.completion.chunk',
+                    'created': created,
+                    'model': model,
+                    'choices': [{'index': 0, 'delta': delta, 'finish_reason': finish_reason}]
+                }
+                self.wfile.write(f"data: {json.dumps(payload)}\n\n".encode('utf-8'))
+                self.wfile.flush()
+
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.send_header('Cache-Control', 'no-cache')
+            self.send_header('Connection', 'close')
+            self.end_headers()
+            self.close_connection = True
+
+            time.sleep(max(0.0, self._ttft() - (time.monotonic() - started)))
+            interval = 1.0 / state.args.tokens_per_second
+            try:
+                chunk({'role': 'assistant', 'content': ''})
+                for piece in split_tokens(content):
+                    chunk({'content': piece})
+                    time.sleep(interval)
+                chunk({}, 'stop')
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.wfile.flush()
+            except (BrokenPipeError, ConnectionResetError):
+                # Client went away mid-stream (e.g. cancelled generation)
+                pass
+
+    return StandinHandler
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Local OpenAI-compatible LLM stand-in server')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8001)
+    parser.add_argument('--model', default='standin-gpt-4o')
+    parser.add_argument('--mode', choices=['synth', 'record', 'replay'], default='synth')
+    parser.add_argument('--transcripts', default='llm_transcripts.jsonl', help='JSONL file for record/replay')
+    parser.add_argument('--replay-miss', choices=['synth', 'error'], default='synth')
+    parser.add_argument('--upstream-url', help='Real endpoint to forward to in record mode, e.g. https://<resource>.openai.azure.com')
+    parser.add_argument('--upstream-timeout', type=float, default=60.0)
+    parser.add_argument('--latency-ms', type=float, default=500.0, help='Median time to first token')
+    parser.add_argument('--latency-dist', choices=['fixed', 'uniform', 'normal', 'lognormal'], default='lognormal')
+    parser.add_argument('--latency-jitter', type=float, default=0.5,
+                        help='Spread: +/- fraction for uniform, stddev fraction for normal, sigma for lognormal')
+    parser.add_argument('--tokens-per-second', type=float, default=50.0)
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of requests answered with an error')
+    parser.add_argument('--error-codes', type=lambda s: [int(c) for c in s.split(',')], default=[429, 500, 503])
+    parser.add_argument('--hang-rate', type=float, default=0.0, help='Fraction of requests delayed by --hang-seconds')
+    parser.add_argument('--hang-seconds', type=float, default=120.0)
+    parser.add_argument('--seed', type=int, default=None, help='Seed latency/error sampling for repeatable runs')
+    parser.add_argument('--verbose', action='store_true')
+    args = parser.parse_args(argv)
+
+    if args.mode == 'record' and not args.upstream_url:
+        parser.error('--upstream-url is required in record mode')
+    if args.tokens_per_second <= 0:
+        parser.error('--tokens-per-second must be positive')
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    state = StandinState(args)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(state))
+    server.daemon_threads = True
+    print(f"🧪 LLM stand-in ({args.mode}) listening on http://{args.host}:{args.port} "
+          f"- ttft {args.latency_dist} {args.latency_ms}ms, {args.tokens_per_second} tok/s, "
+          f"errors {args.error_rate:.0%}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,378 @@
+"""
+Member Feature Profiles
+=======================
+
+One small, incrementally maintained document per member with everything
+the AI helpers and profile screens need about a member's history, so no
+caller has to list and re-derive a member's past requests:
+
+{
+    "_id": "M001",                      # member_id
+    "version": 2,
+    "generation": ObjectId(...),        # new on every rebuild
+    "member_id": "M001",
+    "name": "...", "age": 47, "gender": "F",
+    "age_band": "40-49",
+    "diseases": ["asthma", ...],
+    "total": 12,                        # prior authorizations / claims
+    "by_status": {"approved": 7, ...},  # request status (falls back to the AI decision)
+    "by_decision": {"approved": 8, ...},# AI decision (falls back to the status), normalized
+    "total_reimbursed": 4200,
+    "procedure_counts": [{"procedure": "MRI Scan", "count": 3}, ...],
+    "recent": [{"auth_id", "date", "procedure", "diagnosis", "urgency", "status"}, ...],
+    "active_subscription": {"subscription_id", "payer_id", "payer_name", ...} | null,
+    "updated_at": ISODate(...)
+}
+
+The prior authorization repository calls on_auth_inserted / on_auth_updated
+for every write; subscription writes call on_subscription_changed. A
+missing or outdated (version) document is rebuilt from the source
+collections on first read.
+
+Each prior authorization counted in a feature document carries that
+document's generation as features_generation. The marker keeps
+incremental updates idempotent without the profile listing every
+request, and a rebuild (new generation) invalidates all older markers.
+"""
+
+import threading
+from datetime import datetime as dtt, timezone
+
+from bson import ObjectId
+from pymongo import DESCENDING
+
+from db_indexes import apply_indexes, index
+
+from decision_cache import age_band, count_bucket, normalize_text
+
+
+FEATURES_VERSION = 2
+
+# Fields of a prior authorization the features depend on
+AUTH_FIELDS = ['auth_id', 'member_id', 'status', 'ai_decision', 'amount_reimbursed', 'procedure',
+               'diagnosis', 'urgency', 'submitted_at']
+
+SUBSCRIPTION_FIELDS = ['subscription_id', 'payer_id', 'payer_name', 'remaining_balance', 'coverage_amount',
+                       'validity_date', 'deductible', 'copay', 'coverage_scheme']
+
+
+def _field_key(value):
+    """Status text usable as a document field name."""
+    return str(value).replace('.', '_').replace('$', '_')
+
+
+def status_key(auth):
+    return _field_key(auth.get('status') or auth.get('ai_decision') or 'unknown')
+
+
+def decision_key(auth):
+    return _field_key(normalize_text(auth.get('ai_decision') or auth.get('status') or 'unknown'))
+
+
+def _amount(auth):
+    try:
+        return float(auth.get('amount_reimbursed') or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _short(value, limit):
+    text = ' '.join(str(value or '').split())
+    return text if len(text) <= limit else text[:limit - 3] + '...'
+
+
+def _recent_item(auth):
+    return {
+        'auth_id': auth.get('auth_id'),
+        'date': auth.get('submitted_at'),
+        'procedure': _short(auth.get('procedure'), 40),
+        'diagnosis': _short(auth.get('diagnosis'), 60),
+        'urgency': auth.get('urgency', 'routine'),
+        'status': auth.get('status') or auth.get('ai_decision') or 'unknown'
+    }
+
+
+def _procedure(auth):
+    return str(auth.get('procedure')).strip() if auth.get('procedure') else None
+
+
+def _without(counts, key):
+    counts = dict(counts or {})
+    if key in counts:
+        counts[key] -= 1
+        if counts[key] <= 0:
+            del counts[key]
+    return counts
+
+
+def _counted(features, auth):
+    """Whether an authorization is already reflected in the feature counts."""
+    generation = features.get('generation')
+    return generation is not None and auth.get('features_generation') == generation
+
+
+def history_digest(features, exclude_auth=None, recent_n=5, top_procedures=5):
+    """
+    The prompt_budget history digest, read from a feature document.
+
+    Args:
+        exclude_auth: the request under review, left out of its own history
+    """
+    features = features or {}
+    total = features.get('total', 0)
+    by_status = dict(features.get('by_status') or {})
+    procedure_counts = {item['procedure']: item['count'] for item in features.get('procedure_counts') or []}
+    recent = list(features.get('recent') or [])
+
+    if exclude_auth and _counted(features, exclude_auth):
+        total -= 1
+        by_status = _without(by_status, status_key(exclude_auth))
+        procedure = _procedure(exclude_auth)
+        if procedure in procedure_counts:
+            procedure_counts[procedure] -= 1
+        recent = [item for item in recent if item.get('auth_id') != exclude_auth.get('auth_id')]
+
+    return {
+        'total': max(total, 0),
+        'by_status': dict(sorted(by_status.items(), key=lambda item: -item[1])),
+        'recent': [
+            dict(item, date=item['date'].strftime('%Y-%m-%d') if isinstance(item.get('date'), dtt)
+                 else str(item.get('date') or 'unknown')[:10])
+            for item in recent[:recent_n]
+        ],
+        'recurring_procedures': [
+            {'procedure': procedure, 'count': count}
+            for procedure, count in sorted(procedure_counts.items(), key=lambda item: -item[1])[:top_procedures]
+            if count > 1
+        ]
+    }
+
+
+def profile_bucket(features, exclude_auth=None):
+    """decision_cache.member_profile_bucket computed from a feature document."""
+    features = features or {}
+    by_decision = dict(features.get('by_decision') or {})
+    if exclude_auth and _counted(features, exclude_auth):
+        by_decision = _without(by_decision, decision_key(exclude_auth))
+    return {
+        'age_band': features.get('age_band') or age_band(None),
+        'conditions': sorted({normalize_text(d) for d in features.get('diseases', []) if d}),
+        'prior_decisions': {status: count_bucket(count) for status, count in sorted(by_decision.items())}
+    }
+
+
+class MemberFeatures:
+    """
+    Per-member feature documents.
+
+    Args:
+        collection: pymongo collection holding the feature documents
+        members / prior_auths / subscriptions: source collections for rebuilds
+        recent_n: recent requests kept per member
+    """
+
+    def __init__(self, collection, members, prior_auths, subscriptions, recent_n=5):
+        self.collection = collection
+        self.members = members
+        self.prior_auths = prior_auths
+        self.subscriptions = subscriptions
+        self.recent_n = recent_n
+        self._lock = threading.Lock()
+        self._stats = {'reads': 0, 'rebuilds': 0, 'incremental_updates': 0}
+
+    def index_specs(self):
+        return [index('active_subscription.payer_id')]
+
+    def ensure_indexes(self):
+        return apply_indexes(self.collection, self.index_specs())
+
+    def get(self, member_id):
+        """A member's feature document, rebuilt first if missing or outdated."""
+        self._bump('reads')
+        doc = self.collection.find_one({'_id': member_id})
+        if doc is None or doc.get('version') != FEATURES_VERSION:
+            doc = self.rebuild(member_id)
+        return doc
+
+    def get_many(self, member_ids):
+        """{member_id: feature document} for several members in one query."""
+        member_ids = list(member_ids)
+        docs = {
+            doc['_id']: doc
+            for doc in self.collection.find({'_id': {'$in': member_ids}})
+            if doc.get('version') == FEATURES_VERSION
+        }
+        self._bump('reads', len(member_ids))
+        for member_id in member_ids:
+            if member_id not in docs:
+                rebuilt = self.rebuild(member_id)
+                if rebuilt:
+                    docs[member_id] = rebuilt
+        return docs
+
+    def rebuild(self, member_id):
+        """Recompute a member's features from the source collections."""
+        member = self.members.find_one({'member_id': member_id}, {'_id': 0, 'password_hash': 0})
+        if not member:
+            return None
+
+        auths = list(self.prior_auths.find({'member_id': member_id}, {'_id': 0, **dict.fromkeys(AUTH_FIELDS, 1)}))
+        by_status, by_decision, procedures = {}, {}, {}
+        for auth in auths:
+            by_status[status_key(auth)] = by_status.get(status_key(auth), 0) + 1
+            by_decision[decision_key(auth)] = by_decision.get(decision_key(auth), 0) + 1
+            procedure = _procedure(auth)
+            if procedure:
+                procedures[procedure] = procedures.get(procedure, 0) + 1
+
+        # Mark the counted requests before publishing the document so an
+        # insert racing the rebuild cannot count its request a second time
+        generation = ObjectId()
+        self.prior_auths.update_many(
+            {'auth_id': {'$in': [auth['auth_id'] for auth in auths if auth.get('auth_id')]}},
+            {'$set': {'features_generation': generation}}
+        )
+
+        epoch = dtt.min.replace(tzinfo=timezone.utc)
+        recent = sorted(
+            auths,
+            key=lambda auth: auth['submitted_at'].replace(tzinfo=auth['submitted_at'].tzinfo or timezone.utc)
+            if isinstance(auth.get('submitted_at'), dtt) else epoch,
+            reverse=True
+        )[:self.recent_n]
+
+        doc = {
+            '_id': member_id,
+            'version': FEATURES_VERSION,
+            'generation': generation,
+            'member_id': member_id,
+            'name': member.get('name'),
+            'age': member.get('age'),
+            'gender': member.get('gender'),
+            'age_band': age_band(member.get('age')),
+            'diseases': member.get('diseases', []),
+            'total': len(auths),
+            'by_status': by_status,
+            'by_decision': by_decision,
+            'total_reimbursed': sum(_amount(auth) for auth in auths),
+            'procedure_counts': [{'procedure': name, 'count': count} for name, count in procedures.items()],
+            'recent': [_recent_item(auth) for auth in recent],
+            'active_subscription': self._active_subscription(member_id),
+            'updated_at': dtt.now(timezone.utc)
+        }
+        self.collection.replace_one({'_id': member_id}, doc, upsert=True)
+        self._bump('rebuilds')
+        return doc
+
+    def rebuild_all(self):
+        count = 0
+        for member in self.members.find({}, {'member_id': 1}):
+            if self.rebuild(member['member_id']):
+                count += 1
+        return count
+
+    def on_auth_inserted(self, auth):
+        """Fold a new prior authorization into its member's features."""
+        member_id = auth.get('member_id')
+        if not member_id:
+            return
+        current = self.collection.find_one({'_id': member_id, 'version': FEATURES_VERSION}, {'generation': 1})
+        if current is None:
+            # Rebuilding reads the new request from the source collection
+            rebuilt = self.rebuild(member_id)
+            if rebuilt:
+                auth['features_generation'] = rebuilt['generation']
+            return
+
+        generation = current['generation']
+        claimed = self.prior_auths.update_one(
+            {'auth_id': auth.get('auth_id'), 'features_generation': {'$ne': generation}},
+            {'$set': {'features_generation': generation}}
+        )
+        if not claimed.modified_count:
+            return
+        auth['features_generation'] = generation
+        result = self.collection.update_one(
+            {'_id': member_id, 'generation': generation},
+            {
+                '$inc': {
+                    'total': 1,
+                    f"by_status.{status_key(auth)}": 1,
+                    f"by_decision.{decision_key(auth)}": 1,
+                    'total_reimbursed': _amount(auth)
+                },
+                '$push': {
+                    'recent': {'$each': [_recent_item(auth)], '$sort': {'date': -1}, '$slice': self.recent_n}
+                },
+                '$set': {'updated_at': dtt.now(timezone.utc)}
+            }
+        )
+        procedure = _procedure(auth)
+        if result.modified_count and procedure:
+            bumped = self.collection.update_one(
+                {'_id': member_id, 'procedure_counts.procedure': procedure},
+                {'$inc': {'procedure_counts.$.count': 1}}
+            )
+            if not bumped.matched_count:
+                self.collection.update_one(
+                    {'_id': member_id},
+                    {'$push': {'procedure_counts': {'procedure': procedure, 'count': 1}}}
+                )
+        self._bump('incremental_updates')
+
+    def on_auth_updated(self, before, fields):
+        """Apply a status, AI decision or reimbursement change to the member's features."""
+        member_id = before.get('member_id')
+        if not member_id or not any(field in fields for field in ('status', 'ai_decision', 'amount_reimbursed')):
+            return
+        after = dict(before, **fields)
+
+        inc = {}
+        for key_of, prefix in ((status_key, 'by_status'), (decision_key, 'by_decision')):
+            old, new = key_of(before), key_of(after)
+            if old != new:
+                inc[f"{prefix}.{old}"] = -1
+                inc[f"{prefix}.{new}"] = 1
+        delta = _amount(after) - _amount(before)
+        if delta:
+            inc['total_reimbursed'] = delta
+        if not inc:
+            return
+
+        result = self.collection.update_one(
+            {'_id': member_id, 'version': FEATURES_VERSION, 'generation': before.get('features_generation')},
+            {'$inc': inc, '$set': {'updated_at': dtt.now(timezone.utc)}}
+        )
+        if not result.matched_count:
+            self.rebuild(member_id)
+            return
+        self.collection.update_one(
+            {'_id': member_id, 'recent.auth_id': before.get('auth_id')},
+            {'$set': {'recent.$.status': _recent_item(after)['status']}}
+        )
+        self._bump('incremental_updates')
+
+    def on_subscription_changed(self, member_id):
+        """Refresh the active subscription summary after a subscription write."""
+        result = self.collection.update_one(
+            {'_id': member_id},
+            {'$set': {'active_subscription': self._active_subscription(member_id),
+                      'updated_at': dtt.now(timezone.utc)}}
+        )
+        if result.matched_count:
+            self._bump('incremental_updates')
+
+    def _active_subscription(self, member_id):
+        return self.subscriptions.find_one(
+            {'member_id': member_id, 'status': 'active'},
+            {'_id': 0, **dict.fromkeys(SUBSCRIPTION_FIELDS, 1)},
+            sort=[('subscription_date', DESCENDING)]
+        )
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats)
+
+    def _bump(self, name, amount=1):
+        with self._lock:
+            self._stats[name] += amount
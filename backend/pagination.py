@@ -0,0 +1,209 @@
+"""
+Keyset Pagination
+=================
+
+Bounded, newest-first pages of a listing, continued with an opaque cursor
+instead of skip/offset so every page is one indexed range scan no matter
+how deep the reader is.
+
+Listings are ordered by (sort field, _id) descending; _id breaks ties
+between documents submitted in the same instant. The cursor is the
+(sort value, _id) of the last document on the page, serialized with
+bson.json_util (datetimes and ObjectIds round-trip) and base64url encoded.
+Clients pass it back unchanged as ?cursor=...; next_cursor is null on the
+last page.
+
+Documents without the sort field sort after all others (MongoDB orders
+missing / null lowest), so the keyset query carries them along on the
+last pages rather than dropping them.
+
+Query parameters understood by parse_listing_args():
+- limit: page size (capped at max_limit)
+- cursor: next_cursor of the previous page
+- status: one value or a comma separated list
+- urgency, payer_id, provider_id, member_id: exact match, when the
+  listing allows the filter
+- <date>_from / <date>_to: ISO dates or datetimes bounding the sort field
+  (e.g. submitted_from=2025-01-01&submitted_to=2025-02-01); a bare date
+  as _to includes that whole day
+- fields: comma separated projection; the sort field and _id are always
+  included so the next cursor can be built
+
+Export-style readers that want every matching document use
+stream_listing() instead: the same filters and order, read from one
+MongoDB cursor batch_size documents at a time, so nothing larger than a
+batch is ever held in memory.
+"""
+
+import base64
+import binascii
+from datetime import datetime as dtt, timedelta, timezone
+
+from bson import json_util
+from pymongo import DESCENDING
+
+
+# Filters a listing may allow: query parameter -> document field
+FILTER_FIELDS = {
+    'status': 'status',
+    'urgency': 'urgency',
+    'payer_id': 'payer_id',
+    'provider_id': 'provider_id',
+    'member_id': 'member_id'
+}
+
+
+class PageError(ValueError):
+    """A malformed cursor, filter or limit in the request."""
+
+
+def encode_cursor(doc, sort_field):
+    payload = json_util.dumps([doc.get(sort_field), doc['_id']])
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """(sort value, _id) from a cursor produced by encode_cursor."""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        value, last_id = json_util.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+    except (binascii.Error, UnicodeDecodeError, ValueError, TypeError):
+        raise PageError('Invalid cursor')
+    if isinstance(value, dtt) and value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value, last_id
+
+
+def after_cursor(sort_field, value, last_id):
+    """Documents strictly after (value, last_id) in (sort_field, _id) descending order."""
+    if value is None:
+        return {sort_field: None, '_id': {'$lt': last_id}}
+    return {'$or': [
+        {sort_field: {'$lt': value}},
+        {sort_field: value, '_id': {'$lt': last_id}},
+        {sort_field: None}
+    ]}
+
+
+def _parse_date(text, end_of_range):
+    try:
+        value = dtt.fromisoformat(text)
+    except ValueError:
+        raise PageError(f"Invalid date: {text}")
+    if end_of_range and len(text) == 10:
+        # A bare date as the upper bound means "through that day"
+        value += timedelta(days=1)
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+def parse_filters(args, allowed, date_field=None, date_param=None):
+    """
+    MongoDB filter from the request's query parameters.
+
+    Args:
+        args: request.args
+        allowed: filter parameters (keys of FILTER_FIELDS) the listing supports
+        date_field: field bounded by <date_param>_from / <date_param>_to
+    """
+    query = {}
+    for param in allowed:
+        raw = args.get(param, '').strip()
+        if not raw:
+            continue
+        values = [value.strip() for value in raw.split(',') if value.strip()]
+        query[FILTER_FIELDS[param]] = values[0] if len(values) == 1 else {'$in': values}
+
+    if date_field:
+        bounds = {}
+        if args.get(f"{date_param}_from"):
+            bounds['$gte'] = _parse_date(args[f"{date_param}_from"], end_of_range=False)
+        if args.get(f"{date_param}_to"):
+            bounds['$lt'] = _parse_date(args[f"{date_param}_to"], end_of_range=True)
+        if bounds:
+            query[date_field] = bounds
+    return query
+
+
+def parse_projection(args, sort_field, default=None):
+    """Inclusion projection from ?fields=..., or default when none is given."""
+    fields = [field.strip() for field in args.get('fields', '').split(',') if field.strip()]
+    if not fields:
+        return default
+    projection = dict.fromkeys(fields, 1)
+    projection.update({sort_field: 1, '_id': 1})
+    return projection
+
+
+def parse_limit(args, default, max_limit):
+    raw = args.get('limit')
+    if raw in (None, ''):
+        return default
+    try:
+        limit = int(raw)
+    except ValueError:
+        raise PageError('limit must be an integer')
+    if limit < 1:
+        raise PageError('limit must be at least 1')
+    return min(limit, max_limit)
+
+
+def parse_listing_args(args, sort_field, allowed, default_limit, max_limit,
+                       date_param=None, default_projection=None):
+    """
+    Everything a listing needs from the query string.
+
+    Returns:
+        {'query', 'projection', 'limit', 'cursor'}, raising PageError on bad input
+    """
+    cursor = args.get('cursor')
+    return {
+        'query': parse_filters(args, allowed, date_field=sort_field if date_param else None, date_param=date_param),
+        'projection': parse_projection(args, sort_field, default_projection),
+        'limit': parse_limit(args, default_limit, max_limit),
+        'cursor': decode_cursor(cursor) if cursor else None
+    }
+
+
+def _listing_cursor(collection, sort_field, query, projection, cursor):
+    query = dict(query or {})
+    if cursor is not None:
+        keyset = after_cursor(sort_field, *cursor)
+        query = {'$and': [query, keyset]} if query else keyset
+    return collection.find(query, projection).sort([(sort_field, DESCENDING), ('_id', DESCENDING)])
+
+
+def fetch_page(collection, sort_field, query=None, projection=None, limit=100, cursor=None):
+    """
+    One page of a listing.
+
+    Reads limit + 1 documents to know whether another page follows.
+
+    Returns:
+        (documents, next_cursor or None)
+    """
+    docs = list(_listing_cursor(collection, sort_field, query, projection, cursor).limit(limit + 1))
+    if len(docs) <= limit:
+        return docs, None
+    docs = docs[:limit]
+    return docs, encode_cursor(docs[-1], sort_field)
+
+
+def stream_listing(collection, sort_field, query=None, projection=None, cursor=None, batch_size=500, limit=0):
+    """
+    Every matching document (after cursor, up to limit if set), in page
+    order, as a lazily read MongoDB cursor.
+    """
+    docs = _listing_cursor(collection, sort_field, query, projection, cursor).batch_size(batch_size)
+    return docs.limit(limit) if limit else docs
+
+
+def batches(docs, size):
+    """Consecutive lists of up to size documents from an iterable."""
+    batch = []
+    for doc in docs:
+        batch.append(doc)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
@@ -0,0 +1,307 @@
+"""
+Precedent Index
+===============
+
+Local BM25 retrieval over decided prior authorizations, used to show the
+reviewer how the most similar past cases were decided (few-shot
+precedents) instead of only the member's own history.
+
+Only requests with a final status (approved / rejected) are indexed. The
+indexed text is the procedure, diagnosis, additional notes and the
+decision reason; the status and a short reason are kept for rendering.
+
+The index is held in compact arrays:
+- terms: {term: term_id}
+- postings[term_id]: array('I') of doc numbers + array('H') of term counts
+- lengths: array('I') of document lengths (in terms)
+- alive: bytearray tombstones for re-decided requests; compacted once
+  more than a quarter of the documents are dead
+
+It is kept current incrementally: the prior authorization repository
+calls on_auth_inserted / on_auth_updated on every write in this process,
+and refresh() polls for documents other processes inserted or decided.
+"""
+
+import heapq
+import math
+import re
+import threading
+import time
+from array import array
+from collections import Counter, deque
+
+from llm_metrics import percentiles
+
+
+DECIDED_STATUSES = ('approved', 'rejected')
+TEXT_FIELDS = ('procedure', 'diagnosis', 'additional_notes')
+REASON_FIELDS = ('review_notes', 'decision_notes', 'ai_reason')
+SOURCE_FIELDS = ['auth_id', 'status', 'reviewed_at', *TEXT_FIELDS, *REASON_FIELDS]
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset(
+    'a an and are as at be by for from has have in is it of on or the to was were with no not patient'.split()
+)
+_MAX_TF = 0xFFFF
+
+
+def tokenize(text):
+    return [token for token in _TOKEN.findall(str(text or '').lower())
+            if len(token) > 1 and token not in _STOPWORDS]
+
+
+def _short(value, limit):
+    text = ' '.join(str(value or '').split())
+    return text if len(text) <= limit else text[:limit - 3] + '...'
+
+
+def decision_reason(doc):
+    for field in REASON_FIELDS:
+        if doc.get(field):
+            return doc[field]
+    return ''
+
+
+def render_precedents(precedents):
+    """Render precedents as short few-shot lines for a review prompt."""
+    if not precedents:
+        return "No similar decided cases found"
+    return "\n".join(
+        f"- {item['procedure']} | {item['diagnosis']} -> {item['status']}"
+        + (f": {item['reason']}" if item['reason'] else '')
+        for item in precedents
+    )
+
+
+class PrecedentIndex:
+    """
+    BM25 index over decided prior authorizations.
+
+    Args:
+        collection: the prior authorization collection (for refresh)
+        refresh_interval: seconds between polls for other processes' writes
+        k1, b: BM25 parameters
+    """
+
+    def __init__(self, collection, refresh_interval=60.0, k1=1.2, b=0.75):
+        self.collection = collection
+        self.refresh_interval = refresh_interval
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._refreshed_at = 0.0
+        self._last_id = None
+        self._last_reviewed_at = None
+        self._latencies = deque(maxlen=1000)
+        self._stats = {'queries': 0, 'added': 0, 'replaced': 0, 'compactions': 0}
+        self._reset()
+
+    def _reset(self):
+        self.terms = {}
+        self.postings = []
+        self.frequencies = []
+        self.lengths = array('I')
+        self.alive = bytearray()
+        self.docs = []
+        self.by_auth = {}
+        self.total_length = 0
+        self.live = 0
+
+    # ---- Writes ----
+
+    def add(self, doc):
+        """Index (or re-index) one decided request; undecided requests are dropped from the index."""
+        auth_id = doc.get('auth_id')
+        if not auth_id:
+            return False
+        reason = decision_reason(doc)
+        entry = (
+            auth_id,
+            _short(doc.get('procedure'), 40),
+            _short(doc.get('diagnosis'), 60),
+            doc.get('status'),
+            _short(reason, 100)
+        )
+        with self._lock:
+            previous = self.by_auth.get(auth_id)
+            if previous is not None:
+                if self.docs[previous] == entry:
+                    # Seen already (e.g. via the write listener before a refresh)
+                    return False
+                self._remove(previous)
+                self._stats['replaced'] += 1
+            if doc.get('status') not in DECIDED_STATUSES:
+                return False
+
+            tokens = tokenize(' '.join(str(doc.get(field) or '') for field in TEXT_FIELDS) + ' ' + str(reason))
+            if not tokens:
+                return False
+
+            number = len(self.docs)
+            for term, count in Counter(tokens).items():
+                term_id = self.terms.get(term)
+                if term_id is None:
+                    term_id = self.terms[term] = len(self.postings)
+                    self.postings.append(array('I'))
+                    self.frequencies.append(array('H'))
+                self.postings[term_id].append(number)
+                self.frequencies[term_id].append(min(count, _MAX_TF))
+
+            self.lengths.append(len(tokens))
+            self.alive.append(1)
+            self.docs.append(entry)
+            self.by_auth[auth_id] = number
+            self.total_length += len(tokens)
+            self.live += 1
+            self._stats['added'] += 1
+
+            if len(self.docs) - self.live > max(64, len(self.docs) // 4):
+                self._compact()
+            return True
+
+    def _remove(self, number):
+        if self.alive[number]:
+            self.alive[number] = 0
+            self.total_length -= self.lengths[number]
+            self.live -= 1
+            del self.by_auth[self.docs[number][0]]
+
+    def _compact(self):
+        """Drop tombstoned documents and renumber the rest."""
+        renumber = array('i', [-1]) * len(self.docs)
+        docs, lengths = [], array('I')
+        for number, doc in enumerate(self.docs):
+            if self.alive[number]:
+                renumber[number] = len(docs)
+                docs.append(doc)
+                lengths.append(self.lengths[number])
+
+        terms, postings, frequencies = {}, [], []
+        for term, term_id in self.terms.items():
+            kept, kept_tf = array('I'), array('H')
+            for number, count in zip(self.postings[term_id], self.frequencies[term_id]):
+                if renumber[number] >= 0:
+                    kept.append(renumber[number])
+                    kept_tf.append(count)
+            if kept:
+                terms[term] = len(postings)
+                postings.append(kept)
+                frequencies.append(kept_tf)
+
+        self.terms, self.postings, self.frequencies = terms, postings, frequencies
+        self.docs, self.lengths = docs, lengths
+        self.alive = bytearray([1]) * len(docs)
+        self.by_auth = {doc[0]: number for number, doc in enumerate(docs)}
+        self._stats['compactions'] += 1
+
+    def on_auth_inserted(self, doc):
+        if doc.get('status') in DECIDED_STATUSES:
+            self.add(doc)
+
+    def on_auth_updated(self, before, fields):
+        if 'status' in fields or (before.get('auth_id') in self.by_auth
+                                  and any(field in fields for field in (*TEXT_FIELDS, *REASON_FIELDS))):
+            self.add(dict(before, **fields))
+
+    def refresh(self, force=False):
+        """Pick up requests inserted or decided by other processes since the last poll."""
+        now = time.monotonic()
+        if not force and now - self._refreshed_at < self.refresh_interval:
+            return 0
+        # One poll at a time; concurrent callers keep querying the current index
+        if not self._refresh_lock.acquire(blocking=False):
+            return 0
+        try:
+            self._refreshed_at = now
+            if self._last_id is None:
+                query = {'status': {'$in': list(DECIDED_STATUSES)}}
+            else:
+                changed = [{'_id': {'$gt': self._last_id}}]
+                if self._last_reviewed_at is not None:
+                    changed.append({'reviewed_at': {'$gt': self._last_reviewed_at}})
+                query = {'$or': changed}
+
+            ingested = 0
+            projection = dict.fromkeys(SOURCE_FIELDS, 1)
+            for doc in self.collection.find(query, projection).sort('_id', 1):
+                if self._last_id is None or doc['_id'] > self._last_id:
+                    self._last_id = doc['_id']
+                reviewed_at = doc.get('reviewed_at')
+                if reviewed_at and (self._last_reviewed_at is None or reviewed_at > self._last_reviewed_at):
+                    self._last_reviewed_at = reviewed_at
+                if doc.get('status') in DECIDED_STATUSES or doc.get('auth_id') in self.by_auth:
+                    self.add(doc)
+                    ingested += 1
+            if self._last_id is None:
+                # Empty collection: poll for new documents from here on
+                newest = self.collection.find_one({}, {'_id': 1}, sort=[('_id', -1)])
+                self._last_id = newest['_id'] if newest else None
+            return ingested
+        finally:
+            self._refresh_lock.release()
+
+    # ---- Queries ----
+
+    def search(self, auth_request, k=3, exclude_auth_id=None):
+        """
+        Top-k most similar decided requests.
+
+        Returns:
+            [{'auth_id', 'procedure', 'diagnosis', 'status', 'reason', 'score'}]
+        """
+        self.refresh()
+        started = time.perf_counter()
+        query = set(tokenize(' '.join(str(auth_request.get(field) or '') for field in TEXT_FIELDS)))
+
+        with self._lock:
+            results = []
+            if query and self.live:
+                # norm(doc) = base + slope * length, hoisted out of the posting loop
+                base = self.k1 * (1 - self.b)
+                slope = self.k1 * self.b * self.live / self.total_length
+                alive, lengths = self.alive, self.lengths
+                scores = {}
+                for term in query:
+                    term_id = self.terms.get(term)
+                    if term_id is None:
+                        continue
+                    numbers = self.postings[term_id]
+                    df = len(numbers)
+                    weight = math.log(1 + (self.live - df + 0.5) / (df + 0.5)) * (self.k1 + 1)
+                    for number, tf in zip(numbers, self.frequencies[term_id]):
+                        if alive[number]:
+                            scores[number] = (scores.get(number, 0.0)
+                                              + weight * tf / (tf + base + slope * lengths[number]))
+
+                if exclude_auth_id in self.by_auth:
+                    scores.pop(self.by_auth[exclude_auth_id], None)
+                for number, score in heapq.nlargest(k, scores.items(), key=lambda item: item[1]):
+                    auth_id, procedure, diagnosis, status, reason = self.docs[number]
+                    results.append({
+                        'auth_id': auth_id,
+                        'procedure': procedure,
+                        'diagnosis': diagnosis,
+                        'status': status,
+                        'reason': reason,
+                        'score': round(score, 3)
+                    })
+
+            self._stats['queries'] += 1
+            self._latencies.append(time.perf_counter() - started)
+        return results
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            postings = sum(len(numbers) for numbers in self.postings)
+            stats.update({
+                'documents': self.live,
+                'tombstones': len(self.docs) - self.live,
+                'terms': len(self.terms),
+                'postings': postings,
+                'array_bytes': (postings * (array('I').itemsize + array('H').itemsize)
+                                + len(self.lengths) * self.lengths.itemsize + len(self.alive)),
+                'query_ms': percentiles(list(self._latencies), points=(0.50, 0.95, 0.99))
+            })
+        return stats
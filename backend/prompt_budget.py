@@ -0,0 +1,169 @@
+"""
+Prompt Budget Utilities
+=======================
+
+Local token counting and history compaction for the AI helper prompts.
+
+Past requests are reduced to a fixed-schema digest (counts per status,
+most recent N items, recurring procedures) instead of being interpolated
+as raw documents, and every prompt section can be trimmed to a token
+budget so prompt size stays flat however long a member's history grows.
+"""
+
+import math
+import re
+
+try:
+    import tiktoken
+except ImportError:  # pragma: no cover - optional dependency
+    tiktoken = None
+
+
+TRUNCATION_MARKER = " ...[truncated]"
+
+_TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+_encoding = None
+_encoding_loaded = False
+
+
+def _get_encoding():
+    """Load the tiktoken encoding once; None if unavailable (e.g. offline)."""
+    global _encoding, _encoding_loaded
+    if not _encoding_loaded:
+        _encoding_loaded = True
+        if tiktoken is not None:
+            try:
+                _encoding = tiktoken.get_encoding("o200k_base")
+            except Exception as e:
+                print(f"tiktoken unavailable, using approximate token counts: {e}")
+                _encoding = None
+    return _encoding
+
+
+def count_tokens(text):
+    """
+    Count tokens in text.
+
+    Uses the GPT-4o tokenizer when tiktoken is available, otherwise a
+    word/punctuation approximation (~4 characters per token).
+    """
+    if not text:
+        return 0
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return sum(max(1, math.ceil(len(piece) / 4)) for piece in _TOKEN_PATTERN.findall(text))
+
+
+def count_message_tokens(messages):
+    """Approximate token count of a chat message list (content plus per-message overhead)."""
+    return sum(count_tokens(message.get('content') or '') + 4 for message in messages) + 2
+
+
+def truncate_to_tokens(text, max_tokens, keep='head'):
+    """
+    Trim text to at most max_tokens.
+
+    Args:
+        keep: 'head' keeps the beginning, 'tail' keeps the end
+    """
+    text = text or ''
+    if max_tokens <= 0:
+        return ''
+    if count_tokens(text) <= max_tokens:
+        return text
+
+    encoding = _get_encoding()
+    marker_tokens = count_tokens(TRUNCATION_MARKER)
+    limit = max(max_tokens - marker_tokens, 1)
+
+    if encoding is not None:
+        tokens = encoding.encode(text, disallowed_special=())
+        if keep == 'tail':
+            return TRUNCATION_MARKER.strip() + ' ' + encoding.decode(tokens[-limit:])
+        return encoding.decode(tokens[:limit]) + TRUNCATION_MARKER
+
+    # Approximate: binary search on character length
+    low, high = 0, len(text)
+    while low < high:
+        mid = (low + high + 1) // 2
+        piece = text[-mid:] if keep == 'tail' else text[:mid]
+        if count_tokens(piece) <= limit:
+            low = mid
+        else:
+            high = mid - 1
+    if keep == 'tail':
+        return TRUNCATION_MARKER.strip() + ' ' + text[-low:]
+    return text[:low] + TRUNCATION_MARKER
+
+
+def render_history_digest(digest):
+    """Render a history digest as compact prompt text."""
+    if not digest['total']:
+        return "No past requests found"
+
+    lines = [f"Total past requests: {digest['total']}"]
+    lines.append("By status: " + ", ".join(f"{status}={count}" for status, count in digest['by_status'].items()))
+    if digest['recurring_procedures']:
+        lines.append("Recurring procedures: " + ", ".join(
+            f"{item['procedure']} x{item['count']}" for item in digest['recurring_procedures']
+        ))
+    if digest['recent']:
+        lines.append(f"Most recent {len(digest['recent'])}:")
+        for item in digest['recent']:
+            lines.append(
+                f"- {item['date']} | {item['procedure']} | {item['diagnosis']} | {item['urgency']} | {item['status']}"
+            )
+    return "\n".join(lines)
+
+
+def compact_digest(digest, max_tokens):
+    """
+    Render an already computed digest (e.g. from the member feature
+    profiles) so it fits in max_tokens.
+
+    Drops recent items first, then recurring procedures, and finally
+    truncates the summary line if the budget is tiny.
+    """
+    digest = dict(digest)
+    text = render_history_digest(digest)
+
+    while count_tokens(text) > max_tokens and digest['recent']:
+        digest['recent'] = digest['recent'][:-1]
+        text = render_history_digest(digest)
+
+    if count_tokens(text) > max_tokens and digest['recurring_procedures']:
+        digest['recurring_procedures'] = []
+        text = render_history_digest(digest)
+
+    return truncate_to_tokens(text, max_tokens)
+
+
+def fit_sections(sections, max_tokens):
+    """
+    Trim named text sections so their combined size fits max_tokens.
+
+    The budget is water-filled: sections smaller than an equal share are
+    kept whole and the largest sections absorb the cuts.
+
+    Args:
+        sections: {name: text}
+    Returns:
+        {name: trimmed_text}
+    """
+    sizes = {name: count_tokens(text) for name, text in sections.items()}
+    if sum(sizes.values()) <= max_tokens:
+        return dict(sections)
+
+    fitted = {}
+    remaining_budget = max(max_tokens, 0)
+    ordered = sorted(sections, key=lambda n: sizes[n])
+    for index, name in enumerate(ordered):
+        cap = remaining_budget // (len(ordered) - index)
+        if sizes[name] <= cap:
+            fitted[name] = sections[name]
+            remaining_budget -= sizes[name]
+        else:
+            fitted[name] = truncate_to_tokens(sections[name], cap)
+            remaining_budget -= cap
+    return fitted
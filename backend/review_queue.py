@@ -0,0 +1,259 @@
+"""
+Review Job Queue
+================
+
+Mongo-backed job queue for AI review of prior authorization requests.
+
+The submit endpoints enqueue a job and return immediately; one or more
+worker processes (see review_worker.py) lease jobs, run the review and
+report back. Jobs are ordered by urgency so emergency requests are picked
+up ahead of routine ones, failed jobs are retried with exponential backoff
+and jobs that keep failing are dead-lettered.
+
+Job lifecycle:
+    queued -> leased -> succeeded
+                     -> queued (retry, after backoff)
+                     -> dead   (max attempts reached)
+
+A leased job whose lease expires (worker crashed or hung) becomes eligible
+for leasing again.
+"""
+
+import random
+import uuid
+from datetime import datetime as dtt, timezone, timedelta
+
+from pymongo import ASCENDING, DESCENDING, ReturnDocument
+
+from db_indexes import apply_indexes, index
+
+
+# Lower value = leased first
+URGENCY_PRIORITY = {
+    'emergency': 0,
+    'urgent': 1,
+    'routine': 2
+}
+DEFAULT_PRIORITY = URGENCY_PRIORITY['routine']
+
+# Speculative reviews (drafts for requests not yet approved) run after every real review
+SPECULATIVE_PRIORITY = max(URGENCY_PRIORITY.values()) + 1
+
+JOB_QUEUED = 'queued'
+JOB_LEASED = 'leased'
+JOB_SUCCEEDED = 'succeeded'
+JOB_DEAD = 'dead'
+
+
+def priority_for_urgency(urgency):
+    """Map a request urgency to a queue priority."""
+    return URGENCY_PRIORITY.get(str(urgency or '').strip().lower(), DEFAULT_PRIORITY)
+
+
+class ReviewQueue:
+    """
+    Durable review job queue stored in a MongoDB collection.
+
+    Args:
+        collection: pymongo collection holding the jobs
+        lease_seconds: how long a worker owns a job before it may be re-leased
+        max_attempts: attempts before a job is dead-lettered
+        base_backoff: first retry delay in seconds (doubles per attempt)
+        max_backoff: upper bound for the retry delay in seconds
+        on_dead_letter: optional callback invoked with the job when it is dead-lettered
+    """
+
+    def __init__(self, collection, lease_seconds=120, max_attempts=5, base_backoff=5, max_backoff=600,
+                 on_dead_letter=None):
+        self.collection = collection
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.on_dead_letter = on_dead_letter
+
+    def index_specs(self):
+        """The indexes used by leasing and status lookups."""
+        return [
+            index('job_id', unique=True),
+            index('status', 'priority', 'available_at'),
+            index('status', 'lease_expires_at'),
+            index('auth_id', ('enqueued_at', DESCENDING))   # latest_for_auth
+        ]
+
+    def ensure_indexes(self):
+        return apply_indexes(self.collection, self.index_specs())
+
+    def enqueue(self, auth_id, urgency='routine', kind='review', payload=None, priority=None):
+        """
+        Add a job to the queue.
+
+        Returns:
+            The inserted job document
+        """
+        now = dtt.now(timezone.utc)
+        job = {
+            'job_id': f"JOB{uuid.uuid4().hex[:12].upper()}",
+            'kind': kind,
+            'auth_id': auth_id,
+            'urgency': urgency,
+            'priority': priority_for_urgency(urgency) if priority is None else priority,
+            'payload': payload or {},
+            'status': JOB_QUEUED,
+            'attempts': 0,
+            'max_attempts': self.max_attempts,
+            'available_at': now,
+            'enqueued_at': now,
+            'lease_owner': None,
+            'lease_expires_at': None,
+            'last_error': None,
+            'errors': []
+        }
+        self.collection.insert_one(job)
+        return job
+
+    def lease(self, worker_id):
+        """
+        Atomically claim the highest-priority job that is ready to run.
+
+        Returns:
+            The leased job document, or None if nothing is ready
+        """
+        while True:
+            now = dtt.now(timezone.utc)
+            job = self.collection.find_one_and_update(
+                {
+                    '$or': [
+                        {'status': JOB_QUEUED, 'available_at': {'$lte': now}},
+                        {'status': JOB_LEASED, 'lease_expires_at': {'$lte': now}}
+                    ]
+                },
+                {
+                    '$set': {
+                        'status': JOB_LEASED,
+                        'lease_owner': worker_id,
+                        'leased_at': now,
+                        'lease_expires_at': now + timedelta(seconds=self.lease_seconds)
+                    },
+                    '$inc': {'attempts': 1}
+                },
+                sort=[('priority', ASCENDING), ('available_at', ASCENDING)],
+                return_document=ReturnDocument.AFTER
+            )
+            if not job:
+                return None
+
+            # A job whose worker kept dying while holding the lease
+            if job['attempts'] > job.get('max_attempts', self.max_attempts):
+                self._dead_letter(job, job.get('last_error') or 'Lease expired too many times')
+                continue
+
+            return job
+
+    def extend_lease(self, job):
+        """Push back the lease expiry of a job the worker still owns."""
+        result = self.collection.update_one(
+            {'job_id': job['job_id'], 'lease_owner': job['lease_owner'], 'status': JOB_LEASED},
+            {'$set': {'lease_expires_at': dtt.now(timezone.utc) + timedelta(seconds=self.lease_seconds)}}
+        )
+        return result.modified_count == 1
+
+    def complete(self, job, result=None):
+        """Mark a leased job as succeeded."""
+        update = self.collection.update_one(
+            {'job_id': job['job_id'], 'lease_owner': job['lease_owner'], 'status': JOB_LEASED},
+            {
+                '$set': {
+                    'status': JOB_SUCCEEDED,
+                    'result': result,
+                    'completed_at': dtt.now(timezone.utc),
+                    'lease_expires_at': None
+                }
+            }
+        )
+        return update.modified_count == 1
+
+    def fail(self, job, error):
+        """
+        Record a failed attempt and either schedule a retry or dead-letter the job.
+
+        Returns:
+            The new job status
+        """
+        error = str(error)
+        if job['attempts'] >= job.get('max_attempts', self.max_attempts):
+            self._dead_letter(job, error)
+            return JOB_DEAD
+
+        delay = self.backoff_seconds(job['attempts'])
+        now = dtt.now(timezone.utc)
+        self.collection.update_one(
+            {'job_id': job['job_id'], 'lease_owner': job['lease_owner'], 'status': JOB_LEASED},
+            {
+                '$set': {
+                    'status': JOB_QUEUED,
+                    'available_at': now + timedelta(seconds=delay),
+                    'lease_owner': None,
+                    'lease_expires_at': None,
+                    'last_error': error
+                },
+                '$push': {'errors': {'attempt': job['attempts'], 'error': error, 'at': now}}
+            }
+        )
+        return JOB_QUEUED
+
+    def backoff_seconds(self, attempts):
+        """Exponential backoff with jitter for the given attempt number."""
+        delay = min(self.max_backoff, self.base_backoff * (2 ** max(attempts - 1, 0)))
+        return delay * random.uniform(0.5, 1.5)
+
+    def get(self, job_id):
+        """Fetch a job by its job ID."""
+        return self.collection.find_one({'job_id': job_id}, {'_id': 0})
+
+    def latest_for_auth(self, auth_id):
+        """Fetch the most recent job for an authorization request."""
+        return self.collection.find_one(
+            {'auth_id': auth_id},
+            {'_id': 0},
+            sort=[('enqueued_at', -1)]
+        )
+
+    def requeue(self, job_id):
+        """Move a dead-lettered job back onto the queue with a fresh attempt budget."""
+        result = self.collection.update_one(
+            {'job_id': job_id, 'status': JOB_DEAD},
+            {
+                '$set': {
+                    'status': JOB_QUEUED,
+                    'attempts': 0,
+                    'available_at': dtt.now(timezone.utc),
+                    'lease_owner': None,
+                    'lease_expires_at': None
+                }
+            }
+        )
+        return result.modified_count == 1
+
+    def counts(self):
+        """Number of jobs per status."""
+        pipeline = [{'$group': {'_id': '$status', 'count': {'$sum': 1}}}]
+        return {row['_id']: row['count'] for row in self.collection.aggregate(pipeline)}
+
+    def _dead_letter(self, job, error):
+        now = dtt.now(timezone.utc)
+        self.collection.update_one(
+            {'job_id': job['job_id']},
+            {
+                '$set': {
+                    'status': JOB_DEAD,
+                    'dead_at': now,
+                    'lease_owner': None,
+                    'lease_expires_at': None,
+                    'last_error': error
+                },
+                '$push': {'errors': {'attempt': job['attempts'], 'error': error, 'at': now}}
+            }
+        )
+        if self.on_dead_letter:
+            self.on_dead_letter(job)
@@ -0,0 +1,102 @@
+"""
+Review Worker
+=============
+
+Consumes AI review jobs from the review queue. Run as many of these as
+needed, on one node or many; jobs are leased atomically so each job is
+processed by one worker at a time.
+
+While a job runs, a heartbeat thread keeps extending its lease (every
+third of the lease period), so a review that outlives one lease period
+(LLM deadline plus retries, streaming, rule/cache work) is not leased and
+processed again by another worker. The lease then only expires when the
+worker itself dies or hangs.
+
+Usage:
+    python review_worker.py
+"""
+
+import os
+import signal
+import socket
+import threading
+import time
+
+from app import review_queue, process_review_job, ensure_ai_storage
+
+
+POLL_INTERVAL = float(os.getenv("REVIEW_WORKER_POLL_INTERVAL", "1.0"))
+
+_stopping = False
+
+
+def _request_stop(signum, frame):
+    """Finish the current job and exit on SIGINT/SIGTERM."""
+    global _stopping
+    _stopping = True
+    print(f"Review worker received signal {signum}, stopping after current job...")
+
+
+class LeaseHeartbeat:
+    """Extends a job's lease in the background until stopped."""
+
+    def __init__(self, queue, job, interval=None):
+        self.queue = queue
+        self.job = job
+        self.interval = interval or max(1.0, queue.lease_seconds / 3)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"lease-{job['job_id']}", daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                if not self.queue.extend_lease(self.job):
+                    # Lease lost (expired and taken over, or job finished elsewhere)
+                    print(f"⚠️ Lost lease on {self.job['job_id']}")
+                    return
+            except Exception as e:
+                print(f"Lease heartbeat for {self.job['job_id']} failed: {e}")
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        return False
+
+
+def run_worker(worker_id=None, poll_interval=POLL_INTERVAL):
+    """
+    Lease and process review jobs until stopped.
+    """
+    worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+    ensure_ai_storage()
+    print(f"🔁 Review worker {worker_id} started")
+
+    while not _stopping:
+        job = review_queue.lease(worker_id)
+        if not job:
+            time.sleep(poll_interval)
+            continue
+
+        started = time.monotonic()
+        target = job.get('auth_id') or job.get('payload', {}).get('request_id')
+        try:
+            with LeaseHeartbeat(review_queue, job):
+                decision = process_review_job(job)
+            review_queue.complete(job, {'status': decision.get('status'), 'reason': decision.get('reason')})
+            print(f"✅ {job['job_id']} ({target}) -> {decision.get('status')} "
+                  f"in {time.monotonic() - started:.2f}s")
+        except Exception as e:
+            status = review_queue.fail(job, e)
+            print(f"❌ {job['job_id']} ({target}) attempt {job['attempts']} failed: {e} -> {status}")
+
+    print(f"Review worker {worker_id} stopped")
+
+
+if __name__ == '__main__':
+    signal.signal(signal.SIGINT, _request_stop)
+    signal.signal(signal.SIGTERM, _request_stop)
+    run_worker()
@@ -0,0 +1,141 @@
+"""
+Incremental JSON Object Parser
+==============================
+
+Parses a JSON object while it is still being streamed, token by token,
+and reports each top-level field as soon as its value is complete. Used
+to act on a review's "status" and "reason" before the model has finished
+(or to stop generation once the required keys are in).
+
+Leading text before the first '{' (e.g. a code fence) is skipped. Nested
+objects and arrays are returned whole once they close.
+
+    parser = IncrementalJSONParser()
+    for delta in deltas:
+        for key, value in parser.feed(delta).items():
+            ...
+    parser.fields    # everything parsed so far
+    parser.complete  # True once the closing '}' was seen
+"""
+
+import json
+
+
+_WHITESPACE = ' \t\r\n'
+
+
+class IncrementalJSONParser:
+    """Streaming parser for the top-level fields of one JSON object."""
+
+    def __init__(self):
+        self.buffer = ''
+        self.fields = {}
+        self.complete = False
+        self.error = None
+        self._pos = 0
+        self._state = 'seek_object'
+        self._key_start = None
+        self._key = None
+        self._value_start = None
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+
+    def feed(self, chunk):
+        """
+        Add streamed text.
+
+        Returns:
+            {key: value} for fields completed by this chunk
+        """
+        if self.complete or self.error or not chunk:
+            return {}
+        self.buffer += chunk
+        completed = {}
+        try:
+            self._scan(completed)
+        except ValueError as e:
+            self.error = str(e)
+        self.fields.update(completed)
+        return completed
+
+    def _scan(self, completed):
+        buffer = self.buffer
+        while self._pos < len(buffer):
+            char = buffer[self._pos]
+            state = self._state
+
+            if state == 'seek_object':
+                if char == '{':
+                    self._state = 'key_or_end'
+            elif state == 'key_or_end':
+                if char == '"':
+                    self._key_start = self._pos
+                    self._state = 'key'
+                    self._in_string, self._escape = True, False
+                elif char == '}':
+                    self.complete = True
+                    self._pos += 1
+                    return
+                elif char not in _WHITESPACE + ',':
+                    raise ValueError(f"Unexpected {char!r} at {self._pos} while expecting a key")
+            elif state == 'key':
+                if self._string_char(char):
+                    self._key = json.loads(buffer[self._key_start:self._pos + 1])
+                    self._state = 'colon'
+            elif state == 'colon':
+                if char == ':':
+                    self._state = 'value_start'
+                elif char not in _WHITESPACE:
+                    raise ValueError(f"Expected ':' after key {self._key!r}")
+            elif state == 'value_start':
+                if char not in _WHITESPACE:
+                    self._value_start = self._pos
+                    self._depth = 0
+                    self._state = 'value'
+                    continue
+            elif state == 'value':
+                if self._value_char(char, completed):
+                    continue
+            self._pos += 1
+
+    def _string_char(self, char):
+        """Advance string state; True when char closes the string."""
+        if self._escape:
+            self._escape = False
+        elif char == '\\':
+            self._escape = True
+        elif char == '"':
+            self._in_string = False
+            return True
+        return False
+
+    def _value_char(self, char, completed):
+        """
+        Advance through a value. Returns True if the current char was left
+        for the next state (end of a scalar) instead of being consumed.
+        """
+        if self._in_string:
+            if self._string_char(char) and self._depth == 0:
+                self._finish_value(self._pos + 1, completed)
+            return False
+
+        if char == '"':
+            self._in_string, self._escape = True, False
+        elif char in '{[':
+            self._depth += 1
+        elif char in '}]' and self._depth > 0:
+            self._depth -= 1
+            if self._depth == 0:
+                self._finish_value(self._pos + 1, completed)
+        elif self._depth == 0 and (char in ',}' or char in _WHITESPACE):
+            # End of a number/true/false/null; let key_or_end see the delimiter
+            self._finish_value(self._pos, completed)
+            return True
+        return False
+
+    def _finish_value(self, end, completed):
+        completed[self._key] = json.loads(self.buffer[self._value_start:end])
+        self._state = 'key_or_end'
+        self._key = None
+        self._value_start = None
@@ -0,0 +1,180 @@
+"""
+AI Token Quotas
+===============
+
+Token-bucket quotas for the AI routes, measured in estimated LLM tokens
+rather than requests.
+
+Each call is charged against several buckets at once (the user's email,
+their user_type and their payer). Buckets live in MongoDB so the limits
+hold across workers: refill and debit happen in a single atomic
+pipeline update per bucket, and if any bucket is short the buckets
+already debited are refunded and the caller gets a Retry-After.
+
+The estimate is charged up front. A call that turns out not to need the
+model (local answer, cache hit, rule decision, rejected request) is given
+its tokens back with refund(). Refunds can briefly push a bucket above
+capacity; the next debit clamps it again.
+
+Bucket document:
+{
+    "_id": "email:jane@example.com",
+    "tokens": 18250.5,          # tokens currently available
+    "capacity": 20000,
+    "rate": 333.3,              # tokens refilled per second
+    "updated_at": ISODate(...)
+}
+"""
+
+import math
+import threading
+import time
+from datetime import datetime as dtt, timezone
+
+from pymongo import ReturnDocument
+
+from db_indexes import apply_indexes, index
+
+
+class QuotaExceeded:
+    """Result of a denied charge."""
+
+    __slots__ = ('scope', 'retry_after', 'available', 'requested')
+
+    def __init__(self, scope, retry_after, available, requested):
+        self.scope = scope
+        self.retry_after = retry_after
+        self.available = available
+        self.requested = requested
+
+
+class TokenQuota:
+    """
+    Shared token buckets.
+
+    Args:
+        collection: pymongo collection holding bucket documents
+        enabled: set False to allow every call
+    """
+
+    def __init__(self, collection, enabled=True):
+        self.collection = collection
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._stats = {'charges': 0, 'denied': 0, 'errors': 0, 'tokens_charged': 0,
+                       'refunds': 0, 'tokens_refunded': 0}
+
+    def index_specs(self):
+        # Idle buckets are full again after capacity / rate seconds; drop them after a day
+        return [index('updated_at', expireAfterSeconds=24 * 3600)]
+
+    def ensure_indexes(self):
+        return apply_indexes(self.collection, self.index_specs())
+
+    def _debit(self, key, capacity, rate, cost, now):
+        """Refill then try to debit one bucket atomically; returns the updated document."""
+        # Clamped at 0 so a worker with a slightly slow clock never drains a bucket
+        elapsed = {'$max': [0, {'$divide': [{'$subtract': [now, {'$ifNull': ['$updated_at', now]}]}, 1000]}]}
+        return self.collection.find_one_and_update(
+            {'_id': key},
+            [
+                {'$set': {
+                    'tokens': {'$min': [capacity, {'$add': [
+                        {'$ifNull': ['$tokens', capacity]},
+                        {'$multiply': [elapsed, rate]}
+                    ]}]},
+                    'capacity': capacity,
+                    'rate': rate,
+                    'updated_at': now
+                }},
+                {'$set': {'granted': {'$gte': ['$tokens', cost]}}},
+                {'$set': {'tokens': {'$cond': ['$granted', {'$subtract': ['$tokens', cost]}, '$tokens']}}}
+            ],
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+
+    def charge(self, buckets, tokens):
+        """
+        Charge tokens against every bucket.
+
+        Args:
+            buckets: [(key, tokens_per_minute)]; buckets with no limit are skipped
+            tokens: estimated tokens for the call
+        Returns:
+            None if allowed, otherwise a QuotaExceeded
+        """
+        if not self.enabled or tokens <= 0:
+            return None
+
+        now = dtt.now(timezone.utc)
+        debited = []
+        try:
+            for key, per_minute in buckets:
+                if not per_minute or per_minute <= 0:
+                    continue
+                capacity = float(per_minute)
+                rate = capacity / 60.0
+                # A single call bigger than the bucket drains it instead of never fitting
+                cost = min(float(tokens), capacity)
+
+                doc = self._debit(key, capacity, rate, cost, now)
+                if not doc.get('granted'):
+                    self._refund(debited)
+                    self._bump('denied')
+                    available = doc.get('tokens', 0.0)
+                    return QuotaExceeded(
+                        scope=key,
+                        retry_after=max(1, math.ceil((cost - available) / rate)),
+                        available=int(available),
+                        requested=int(cost)
+                    )
+                debited.append((key, cost))
+        except Exception as e:
+            # Storage problems must not take the AI routes down: fail open
+            print(f"Token quota check failed, allowing call: {e}")
+            self._bump('errors')
+            return None
+
+        with self._lock:
+            self._stats['charges'] += 1
+            self._stats['tokens_charged'] += int(tokens)
+        return None
+
+    def refund(self, buckets, tokens):
+        """Give back a charge made with the same buckets and tokens."""
+        if not self.enabled or tokens <= 0:
+            return
+        debited = [(key, min(float(tokens), float(per_minute)))
+                   for key, per_minute in buckets if per_minute and per_minute > 0]
+        try:
+            self._refund(debited)
+        except Exception as e:
+            print(f"Token quota refund failed: {e}")
+            self._bump('errors')
+            return
+        with self._lock:
+            self._stats['refunds'] += 1
+            self._stats['tokens_refunded'] += int(tokens)
+
+    def _refund(self, debited):
+        for key, cost in debited:
+            self.collection.update_one({'_id': key}, {'$inc': {'tokens': cost}})
+
+    def levels(self, keys):
+        """Current (refilled) token levels for bucket keys."""
+        now = time.time()
+        result = {}
+        for doc in self.collection.find({'_id': {'$in': list(keys)}}):
+            updated_at = doc['updated_at'].replace(tzinfo=timezone.utc).timestamp()
+            tokens = min(doc['capacity'], doc['tokens'] + (now - updated_at) * doc['rate'])
+            result[doc['_id']] = {'available': int(tokens), 'capacity': int(doc['capacity'])}
+        return result
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats)
+
+    def _bump(self, name):
+        with self._lock:
+            self._stats[name] += 1
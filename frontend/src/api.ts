@@ -168,6 +168,30 @@ api.interceptors.response.use(
   }
 );
 
+// Paged listings (/prior-auth, /pending-requests, /member/insurance-subscriptions):
+// follow next_cursor until the last page and return every row under `key`
+export const fetchAllPages = async <T = any>(path: string, key: string, token: string): Promise<T[]> => {
+  const items: T[] = [];
+  const separator = path.includes('?') ? '&' : '?';
+  let cursor: string | null = null;
+  do {
+    const url = `${API_BASE_URL}${path}${cursor ? `${separator}cursor=${encodeURIComponent(cursor)}` : ''}`;
+    const response = await fetch(url, {
+      headers: {
+        'Authorization': `Bearer ${token}`,
+        'Content-Type': 'application/json',
+      },
+    });
+    if (!response.ok) {
+      throw new Error(`Failed to fetch ${path}`);
+    }
+    const data = await response.json();
+    items.push(...(data[key] || []));
+    cursor = data.next_cursor || null;
+  } while (cursor);
+  return items;
+};
+
 // Authentication APIs
 export const loginUser = async (credentials: LoginCredentials): Promise<ApiResponse> => {
   const response = await api.post('/login', credentials);
@@ -227,8 +251,8 @@ export const getAutocomplete = async (input: string): Promise<ApiResponse> => {
   return response.data;
 };
 
-export const healthBuddyChat = async (message: string): Promise<ApiResponse> => {
-  const response = await api.post('/ai/health-buddy', { message });
+export const healthBuddyChat = async (message: string, sessionId?: string): Promise<ApiResponse> => {
+  const response = await api.post('/ai/health-buddy', { message, session_id: sessionId });
   return response.data;
 };
 
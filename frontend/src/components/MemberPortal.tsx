@@ -1,5 +1,5 @@
 import { useState, useEffect, useRef } from "react";
-import { API_BASE_URL } from "../api";
+import { API_BASE_URL, fetchAllPages } from "../api";
 import { Card, CardContent, CardDescription, CardHeader, CardTitle } from "@/components/ui/card";
 import { Button } from "@/components/ui/button";
 import { Input } from "@/components/ui/input";
@@ -162,6 +162,7 @@ const MemberPortal = () => {
   // AI features state
   const [aiMessage, setAiMessage] = useState("");
   const [aiResponse, setAiResponse] = useState("");
+  const [healthBuddySessionId, setHealthBuddySessionId] = useState<string | null>(null);
   const [isAiLoading, setIsAiLoading] = useState(false);
   const [autocompleteSuggestion, setAutocompleteSuggestion] = useState("");
   const [previousRequests, setPreviousRequests] = useState<any[]>([]);
@@ -175,12 +176,17 @@ const MemberPortal = () => {
     fetchMemberData();
     fetchInsurancePlans();
     fetchInsuranceSubscriptions();
-    fetchPendingRequests();
     fetchPreviousRequests();
-    // Call fetchPreviousClaims when the component loads
-    fetchPreviousClaims();
   }, []);
 
+  // Listings filtered by member_id wait for the profile
+  useEffect(() => {
+    const memberId = memberProfile?.profile.member_id;
+    if (!memberId) return;
+    fetchPendingRequests(memberId);
+    fetchPreviousClaims(memberId);
+  }, [memberProfile?.profile.member_id]);
+
   const fetchMemberData = async () => {
     try {
       const token = localStorage.getItem("authToken");
@@ -202,9 +208,11 @@ const MemberPortal = () => {
         },
       });
 
+      let memberId: string | undefined;
       if (profileResponse.ok) {
         const profileData = await profileResponse.json();
         setMemberProfile(profileData.data);
+        memberId = profileData.data?.profile?.member_id;
       } else {
         toast({
           title: "Profile Error",
@@ -213,18 +221,9 @@ const MemberPortal = () => {
         });
       }
 
-      // Fetch member prior auths
-      const priorAuthResponse = await fetch(`${API_BASE_URL}/prior-auth`, { // Updated to fetch from prior_auth
-        method: "GET",
-        headers: {
-          "Authorization": `Bearer ${token}`,
-          "Content-Type": "application/json",
-        },
-      });
-
-      if (priorAuthResponse.ok) {
-        const priorAuthData = await priorAuthResponse.json();
-        setClaims(priorAuthData.prior_auths || []);
+      // Fetch member prior auths (every page)
+      if (memberId) {
+        setClaims(await fetchAllPages(`/prior-auth?member_id=${encodeURIComponent(memberId)}`, "prior_auths", token));
       }
 
     } catch (error) {
@@ -268,18 +267,7 @@ const MemberPortal = () => {
       const token = localStorage.getItem("authToken");
       if (!token) return;
 
-      const response = await fetch(`${API_BASE_URL}/member/insurance-subscriptions`, {
-        method: "GET",
-        headers: {
-          "Authorization": `Bearer ${token}`,
-          "Content-Type": "application/json",
-        },
-      });
-
-      if (response.ok) {
-        const data = await response.json();
-        setInsuranceSubscriptions(data.data);
-      }
+      setInsuranceSubscriptions(await fetchAllPages("/member/insurance-subscriptions", "data", token));
     } catch (error) {
       console.error('Error fetching insurance subscriptions:', error);
     }
@@ -389,20 +377,14 @@ const MemberPortal = () => {
   };
 
   // New functions for pending requests and AI features
-  const fetchPendingRequests = async () => {
+  const fetchPendingRequests = async (memberId = memberProfile?.profile.member_id) => {
     try {
       const token = localStorage.getItem("authToken");
-      const response = await fetch(`${API_BASE_URL}/pending-requests`, { // Updated to fetch from pending_requests
-        headers: {
-          "Authorization": `Bearer ${token}`,
-          "Content-Type": "application/json",
-        },
-      });
+      if (!token || !memberId) return;
 
-      if (response.ok) {
-        const data = await response.json();
-        setPendingRequests(data.pending_requests || []);
-      }
+      setPendingRequests(
+        await fetchAllPages(`/pending-requests?member_id=${encodeURIComponent(memberId)}`, "pending_requests", token)
+      );
     } catch (error) {
       console.error('Error fetching pending requests:', error);
     }
@@ -518,14 +500,14 @@ const MemberPortal = () => {
     return rawInput;
   };
 
-  const handleGetAutocomplete = async (input: string) => {
+  const handleGetAutocomplete = async (input: string, field?: string) => {
     if (!input.trim()) {
       setAutocompleteSuggestion("");
       return;
     }
     try {
       const token = localStorage.getItem("authToken");
-      const response = await fetch(`${API_BASE_URL}/ai/autocomplete?input=${encodeURIComponent(input)}`, {
+      const response = await fetch(`${API_BASE_URL}/ai/autocomplete?input=${encodeURIComponent(input)}${field ? `&field=${field}` : ""}`, {
         headers: {
           "Authorization": `Bearer ${token}`,
           "Content-Type": "application/json",
@@ -546,19 +528,50 @@ const MemberPortal = () => {
     setIsAiLoading(true);
     try {
       const token = localStorage.getItem("authToken");
-      const response = await fetch(`${API_BASE_URL}/ai/health-buddy`, {
+      const response = await fetch(`${API_BASE_URL}/ai/health-buddy/stream`, {
         method: "POST",
         headers: {
           "Authorization": `Bearer ${token}`,
           "Content-Type": "application/json",
         },
-        body: JSON.stringify({ message: aiMessage }),
+        body: JSON.stringify({ message: aiMessage, session_id: healthBuddySessionId }),
       });
 
-      if (response.ok) {
-        const data = await response.json();
-        setAiResponse(data.response);
+      if (response.ok && response.body) {
+        // Render the answer as Server-Sent Events arrive
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = "";
+        let answer = "";
+        setAiResponse("");
         setAiMessage("");
+
+        while (true) {
+          const { done, value } = await reader.read();
+          if (done) break;
+          buffer += decoder.decode(value, { stream: true });
+
+          const events = buffer.split("\n\n");
+          buffer = events.pop() || "";
+          for (const raw of events) {
+            const eventLine = raw.split("\n").find((line) => line.startsWith("event: "));
+            const dataLine = raw.split("\n").find((line) => line.startsWith("data: "));
+            if (!eventLine || !dataLine) continue;
+
+            const event = eventLine.slice(7);
+            const data = JSON.parse(dataLine.slice(6));
+            if (event === "session") {
+              // Follow-up messages continue the same server-side conversation
+              setHealthBuddySessionId(data.session_id);
+            } else if (event === "token") {
+              answer += data.delta;
+              setAiResponse(answer);
+              setIsAiLoading(false);
+            } else if (event === "error") {
+              setAiResponse(data.message);
+            }
+          }
+        }
       } else {
         toast({
           title: "AI Error",
@@ -598,20 +611,12 @@ const MemberPortal = () => {
   };
 
   // Fetch previous claims
-  const fetchPreviousClaims = async () => {
+  const fetchPreviousClaims = async (memberId = memberProfile?.profile.member_id) => {
     try {
       const token = localStorage.getItem("authToken");
-      const response = await fetch(`${API_BASE_URL}/prior-auth`, {
-        headers: {
-          "Authorization": `Bearer ${token}`,
-          "Content-Type": "application/json",
-        },
-      });
+      if (!token || !memberId) return;
 
-      if (response.ok) {
-        const data = await response.json();
-        setPreviousClaims(data.prior_auths || []);
-      }
+      setPreviousClaims(await fetchAllPages(`/prior-auth?member_id=${encodeURIComponent(memberId)}`, "prior_auths", token));
     } catch (error) {
       console.error("Error fetching previous prior auths:", error);
     }
@@ -1056,7 +1061,7 @@ const MemberPortal = () => {
                     onChange={e => {
                       setAuthRequest({ ...authRequest, procedure: e.target.value });
                       if (autocompleteTimeout.current) clearTimeout(autocompleteTimeout.current);
-                      autocompleteTimeout.current = setTimeout(() => handleGetAutocomplete(e.target.value), 400);
+                      autocompleteTimeout.current = setTimeout(() => handleGetAutocomplete(e.target.value, "procedure"), 400);
                     }}
                     className="border-gray-200 focus:border-blue-500 focus:ring-blue-500"
                   />
@@ -1080,7 +1085,7 @@ const MemberPortal = () => {
                     onChange={e => {
                       setAuthRequest({ ...authRequest, diagnosis: e.target.value });
                       if (autocompleteTimeout.current) clearTimeout(autocompleteTimeout.current);
-                      autocompleteTimeout.current = setTimeout(() => handleGetAutocomplete(e.target.value), 400);
+                      autocompleteTimeout.current = setTimeout(() => handleGetAutocomplete(e.target.value, "diagnosis"), 400);
                     }}
                     className="border-gray-200 focus:border-blue-500 focus:ring-blue-500"
                   />
@@ -1135,7 +1140,7 @@ const MemberPortal = () => {
                   onChange={e => {
                     setAuthRequest({ ...authRequest, additionalNotes: e.target.value });
                     if (autocompleteTimeout.current) clearTimeout(autocompleteTimeout.current);
-                    autocompleteTimeout.current = setTimeout(() => handleGetAutocomplete(e.target.value), 400);
+                    autocompleteTimeout.current = setTimeout(() => handleGetAutocomplete(e.target.value, "additional_notes"), 400);
                   }}
                   rows={3}
                   className="border-gray-200 focus:border-blue-500 focus:ring-blue-500"
@@ -37,6 +37,8 @@ interface PriorAuth {
 const PriorAuthAIStatus = () => {
   const [auths, setAuths] = useState<PriorAuth[]>([]);
   const [loading, setLoading] = useState(true);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [selectedAuth, setSelectedAuth] = useState<PriorAuth | null>(null);
   const [decisionNotes, setDecisionNotes] = useState("");
   const { toast } = useToast();
@@ -46,10 +48,16 @@ const PriorAuthAIStatus = () => {
     fetchPriorAuths();
   }, []);
 
-  const fetchPriorAuths = async () => {
+  // Pages are newest first; a cursor continues after the last loaded request
+  const fetchPriorAuths = async (cursor?: string) => {
     try {
-      setLoading(true);
-      const response = await fetch(`${API_BASE_URL}/prior-auth`, { // Updated to fetch from prior_auth
+      if (cursor) {
+        setLoadingMore(true);
+      } else {
+        setLoading(true);
+      }
+      const query = cursor ? `?cursor=${encodeURIComponent(cursor)}` : "";
+      const response = await fetch(`${API_BASE_URL}/prior-auth${query}`, { // Updated to fetch from prior_auth
         headers: {
           Authorization: `Bearer ${token}`,
           "Content-Type": "application/json",
@@ -61,7 +69,9 @@ const PriorAuthAIStatus = () => {
       }
 
       const data = await response.json();
-      setAuths(data.prior_auths || []);
+      const page = data.prior_auths || [];
+      setAuths((previous) => (cursor ? [...previous, ...page] : page));
+      setNextCursor(data.next_cursor || null);
     } catch (error) {
       console.error("Error fetching prior auths:", error);
       toast({
@@ -71,6 +81,7 @@ const PriorAuthAIStatus = () => {
       });
     } finally {
       setLoading(false);
+      setLoadingMore(false);
     }
   };
 
@@ -318,6 +329,17 @@ const PriorAuthAIStatus = () => {
                 </CardContent>
               </Card>
             ))}
+            {nextCursor && (
+              <div className="text-center">
+                <Button
+                  variant="outline"
+                  onClick={() => fetchPriorAuths(nextCursor)}
+                  disabled={loadingMore}
+                >
+                  {loadingMore ? "Loading..." : "Load more"}
+                </Button>
+              </div>
+            )}
           </div>
         )}
 
@@ -1,5 +1,5 @@
 import { useState, useEffect } from "react";
-import { API_BASE_URL } from "../api";
+import { API_BASE_URL, fetchAllPages } from "../api";
 import { Card, CardContent, CardDescription, CardHeader, CardTitle } from "@/components/ui/card";
 import { Button } from "@/components/ui/button";
 import { Input } from "@/components/ui/input";
@@ -171,29 +171,15 @@ const ProviderPortal = () => {
     setIsLoadingClaims(true);
     try {
       const token = localStorage.getItem("authToken");
-      const response = await fetch(`${API_BASE_URL}/prior-auth`, { // Updated to fetch from prior_auth
-        headers: {
-          "Authorization": `Bearer ${token}`,
-          "Content-Type": "application/json",
-        },
-      });
-
-      if (response.ok) {
-        const data = await response.json();
-        setPriorAuthHistory(data.prior_auths || []);
-      } else {
-        console.error('Failed to fetch prior auth history');
-        toast({
-          title: "Error",
-          description: "Failed to load prior auth history.",
-          variant: "destructive",
-        });
-      }
+      if (!token) return;
+      const providerId = encodeURIComponent(providerProfile.profile.provider_id);
+      // Every page of the provider's prior auths
+      setPriorAuthHistory(await fetchAllPages(`/prior-auth?provider_id=${providerId}`, "prior_auths", token));
     } catch (error) {
       console.error('Error fetching prior auth history:', error);
       toast({
-        title: "Connection Error",
-        description: "Unable to fetch prior auth history.",
+        title: "Error",
+        description: "Failed to load prior auth history.",
         variant: "destructive",
       });
     } finally {